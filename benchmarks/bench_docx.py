@@ -0,0 +1,77 @@
+"""
+Benchmark: python-docx `Document().paragraphs` vs. the streaming OOXML reader.
+
+Usage: python benchmarks/bench_docx.py [--paragraphs 20000] [--tables 200]
+
+Builds a synthetic notice with body paragraphs, tables and a header/footer,
+then reports wall time, peak Python memory (tracemalloc) and how much text
+each path actually returns.
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+from pathlib import Path
+
+from docx import Document
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from wordingcheck.docx_stream import iter_docx_paragraphs  # noqa: E402
+
+
+def make_docx(n_paragraphs, n_tables):
+    doc = Document()
+    section = doc.sections[0]
+    section.header.paragraphs[0].text = "品川学園PTA 令和7年度 お知らせ"
+    section.footer.paragraphs[0].text = "問い合わせ先: 広報委員会 (連絡先は担当者まで)"
+    per_table = max(1, n_paragraphs // max(1, n_tables))
+    for i in range(n_paragraphs):
+        doc.add_paragraph(f"{i}: 保護者の皆様へ。行事のお知らせです。子供達の参加を宜しくお願い致します。")
+        if n_tables and i % per_table == 0:
+            table = doc.add_table(rows=3, cols=3)
+            for r, row in enumerate(table.rows):
+                for c, cell in enumerate(row.cells):
+                    cell.text = f"日時{r}-{c} 10:00〜 場所: 体育館"
+    buf = BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+
+def python_docx_path(data):
+    doc = Document(BytesIO(data))
+    return "\n".join(p.text for p in doc.paragraphs)
+
+
+def stream_path(data):
+    return "\n".join(p.text for p in iter_docx_paragraphs(data))
+
+
+def measure(fn, data):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    text = fn(data)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paragraphs", type=int, default=20000)
+    parser.add_argument("--tables", type=int, default=200)
+    args = parser.parse_args()
+
+    data = make_docx(args.paragraphs, args.tables)
+    print(f"docx: {len(data) / 1024:.0f} KiB, {args.paragraphs} paragraphs, {args.tables} tables")
+    print(f"{'path':>12} {'time[s]':>8} {'peak[MiB]':>10} {'chars':>9} {'table/header text':>18}")
+    for label, fn in (("python-docx", python_docx_path), ("stream", stream_path)):
+        elapsed, peak, text = measure(fn, data)
+        extra = "yes" if ("体育館" in text and "問い合わせ先" in text) else "no"
+        print(f"{label:>12} {elapsed:>8.3f} {peak / 2**20:>10.1f} {len(text):>9} {extra:>18}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark: per-rule `typo in haystack` loop vs. the compiled RuleMatcher.
+
+Usage: python benchmarks/bench_matcher.py [--rules 5000] [--chars 200000]
+
+The base rule table (data/df_word_rule.pkl) is padded with synthetic rules to
+simulate school-wide / ward-wide style guides. "automaton" always walks the
+Aho-Corasick automaton; "match" is RuleMatcher.check as shipped, which uses
+one str.find per pattern up to matcher.SMALL_TABLE patterns.
+
+On a 1-CPU container with 200k characters (best of 3):
+
+      rules   loop[s]  automaton[s]  match[s]  speedup
+         48    0.0046        0.0219    0.0009     5.4x
+        500    0.1252        0.0465    0.0599     2.1x
+       2000    0.5900        0.1036    0.0961     6.1x
+       5000    1.4831        0.1213    0.0989    15.0x
+
+Timings vary by up to 2x between runs. The automaton alone is about 5x
+slower than the loop at 48 rules, which is why small tables don't use it.
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from wordingcheck import RuleMatcher  # noqa: E402
+from wordingcheck import matcher as matcher_module  # noqa: E402
+
+KANA = "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん"
+KANJI = "学校保護者会行事連絡運動会参加申込締切日時場所持物担当委員長副部書記会計"
+
+
+def make_rules(n_rules, rng):
+    base = pd.read_pickle(BASE_DIR / "data" / "df_word_rule.pkl")
+    rows = list(zip(base["誤表記"].astype(str), base["正表記"].astype(str)))
+    while len(rows) < n_rules:
+        typo = "".join(rng.choice(KANJI + KANA) for _ in range(rng.randint(2, 6)))
+        rows.append((typo, typo + "（synthetic）"))
+    return pd.DataFrame(rows[:n_rules], columns=["誤表記", "正表記"])
+
+
+def make_text(n_chars, df, rng):
+    words = df["誤表記"].tolist()[:48]
+    parts = []
+    size = 0
+    while size < n_chars:
+        if rng.random() < 0.05:
+            w = rng.choice(words)
+        else:
+            w = "".join(rng.choice(KANA + KANJI + "、。\n") for _ in range(rng.randint(5, 30)))
+        parts.append(w)
+        size += len(w)
+    return "".join(parts)
+
+
+def loop_check(df_wr, haystack):
+    # The analysis loop from 文章確認ツール.py before the matcher was introduced
+    out_lines = []
+    for _, row in df_wr.iterrows():
+        typo = str(row.get("誤表記", ""))
+        corr = str(row.get("正表記", ""))
+        if not typo:
+            continue
+        if typo in haystack:
+            out_lines.append(f"{typo} → {corr}")
+    return out_lines
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rules", type=int, nargs="+", default=[48, 500, 2000, 5000])
+    parser.add_argument("--chars", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(16355)
+    print(f"{'rules':>7} {'loop[s]':>9} {'build[s]':>9} {'automaton[s]':>13} {'match[s]':>9} {'speedup':>8}")
+    for n_rules in args.rules:
+        df = make_rules(n_rules, rng)
+        text = make_text(args.chars, df, rng)
+        t_loop, expected = best_of(lambda: loop_check(df, text), args.repeat)
+        t_build, matcher = best_of(lambda: RuleMatcher.from_frame(df), 1)
+        small_table = matcher_module.SMALL_TABLE
+        matcher_module.SMALL_TABLE = 0
+        try:
+            t_automaton, got = best_of(lambda: matcher.check(text), args.repeat)
+        finally:
+            matcher_module.SMALL_TABLE = small_table
+        assert got == expected, "automaton and loop disagree"
+        t_match, got = best_of(lambda: matcher.check(text), args.repeat)
+        assert got == expected, "matcher and loop disagree"
+        print(
+            f"{n_rules:>7} {t_loop:>9.4f} {t_build:>9.4f} {t_automaton:>13.4f} {t_match:>9.4f} {t_loop / t_match:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
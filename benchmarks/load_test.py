@@ -0,0 +1,164 @@
+"""
+Load test for the local HTTP service (python -m wordingcheck serve).
+
+Usage: python benchmarks/load_test.py [--url http://127.0.0.1:8765] [--concurrency 8]
+                                      [--requests 400] [--chars 2000] [--batch 0]
+
+Without --url a server is started as a subprocess on a free port (using the
+default rule store) and stopped afterwards. Each client thread keeps one
+connection open and sends POST /check (or /check/batch with --batch N
+texts per request); the script reports p50/p99 latency, requests/sec, and
+how many texts the server scanned per shared pass.
+"""
+import argparse
+import http.client
+import json
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+KANA = "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん"
+KANJI = "学校保護者会行事連絡運動会参加申込締切日時場所持物担当委員長副部書記会計"
+TYPOS = ["子供達", "宜しく", "お願い致します", "頂きます", "有難う"]
+
+
+def make_text(n_chars, rng):
+    parts = []
+    size = 0
+    while size < n_chars:
+        if rng.random() < 0.05:
+            w = rng.choice(TYPOS)
+        else:
+            w = "".join(rng.choice(KANA + KANJI + "、。\n") for _ in range(rng.randint(5, 30)))
+        parts.append(w)
+        size += len(w)
+    return "".join(parts)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "wordingcheck", "serve", "--port", str(port)],
+        cwd=BASE_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            get_json("127.0.0.1", port, "/health")
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise SystemExit("server did not start")
+
+
+def get_json(host, port, path):
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    try:
+        conn.request("GET", path)
+        return json.loads(conn.getresponse().read())
+    finally:
+        conn.close()
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return float("nan")
+    k = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def client(host, port, bodies, path, latencies, errors):
+    conn = http.client.HTTPConnection(host, port, timeout=120)
+    try:
+        for body in bodies:
+            t0 = time.perf_counter()
+            try:
+                conn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+                resp = conn.getresponse()
+                resp.read()
+                ok = resp.status == 200
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=120)
+                ok = False
+            latencies.append(time.perf_counter() - t0)
+            if not ok:
+                errors.append(1)
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="running server (default: start one)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--chars", type=int, default=2000, help="characters per text")
+    parser.add_argument("--batch", type=int, default=0, help="texts per /check/batch request (0: /check)")
+    args = parser.parse_args()
+
+    proc = None
+    if args.url:
+        url = urlparse(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        host, port = "127.0.0.1", free_port()
+        proc = start_server(port)
+    try:
+        rng = random.Random(16355)
+        if args.batch:
+            path = "/check/batch"
+            bodies = [
+                json.dumps({"items": [{"text": make_text(args.chars, rng)} for _ in range(args.batch)]}).encode("utf-8")
+                for _ in range(args.requests)
+            ]
+        else:
+            path = "/check"
+            bodies = [json.dumps({"text": make_text(args.chars, rng)}).encode("utf-8") for _ in range(args.requests)]
+
+        before = get_json(host, port, "/health")
+        latencies, errors = [], []
+        threads = [
+            threading.Thread(target=client, args=(host, port, bodies[i :: args.concurrency], path, latencies, errors))
+            for i in range(args.concurrency)
+        ]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - t0
+        after = get_json(host, port, "/health")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    latencies.sort()
+    scans = after["scans"] - before["scans"]
+    texts = after["texts"] - before["texts"]
+    print(f"rules v{after['rule_version']} ({after['rules']} rows), {args.concurrency} clients, {path}, {args.chars} chars/text")
+    print(f"requests   {len(latencies):>8}   errors {len(errors)}")
+    print(f"p50        {percentile(latencies, 0.50) * 1000:>8.1f} ms")
+    print(f"p99        {percentile(latencies, 0.99) * 1000:>8.1f} ms")
+    print(f"throughput {len(latencies) / wall:>8.1f} req/s")
+    print(f"batching   {texts / max(1, scans):>8.1f} texts per shared scan ({scans} scans)")
+
+
+if __name__ == "__main__":
+    main()
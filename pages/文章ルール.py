@@ -1,14 +1,18 @@
 import streamlit as st
-import pandas as pd
-from pathlib import Path
+import json
+from uuid import uuid4
+from wordingcheck.cache import content_digest, csv_payload
+from wordingcheck.matcher import rules_from_frame
+from wordingcheck.ruledelta import diff_rules
+from wordingcheck.rulebook import GREETING_SHEET, LETTER_SHEET, RuleSchemaError, format_timings, import_rule_workbook
+from wordingcheck.regexrules import validate_rules
+from wordingcheck.registry import rule_registry
+from wordingcheck.store import GREETING_TABLE, LETTER_TABLE, WORD_TABLE
 
-# Storage location (per-app)
-BASE_DIR = Path(__file__).resolve().parents[1]
-DATA_DIR = BASE_DIR / "data"
-DATA_DIR.mkdir(parents=True, exist_ok=True)
-PERSIST_PATH = DATA_DIR / "df_word_rule.pkl"
-PERSIST_LETTER = DATA_DIR / "df_rule_letter.pkl"
-PERSIST_GREETING = DATA_DIR / "df_rule_greeting.pkl"
+# One published rule version per process, shared by every session; backed by
+# the versioned rule store under data/
+registry = rule_registry()
+store = registry.store
 
 st.set_page_config(
         page_title="文章ルール",
@@ -28,32 +32,64 @@ st.markdown("""
             :green_heart: 変更が必要の場合のみ、編集又はファイルのインポートを行ってください。</br>
         """, unsafe_allow_html=True)
 
-def load_persisted():
-    if PERSIST_PATH.exists():
-        try:
-            return pd.read_pickle(PERSIST_PATH)
-        except Exception as e:
-            st.error(f"Failed to load persisted DB: {e}")
-            return None
-    return None
+def published_rules():
+    """(frame, version) of the published rule table; the frame is shared by all sessions."""
+    try:
+        snap = registry.current()
+    except Exception as e:
+        st.error(f"Failed to load persisted DB: {e}")
+        return None, None
+    return (None, None) if snap is None else (snap.frame, snap.version)
 
-if "df_word_rule" not in st.session_state:
-    st.session_state["df_word_rule"] = load_persisted()
 
-# load persisted auxiliary sheets if present
-if "df_rule_letter" not in st.session_state:
-    if PERSIST_LETTER.exists():
-        try:
-            st.session_state["df_rule_letter"] = pd.read_pickle(PERSIST_LETTER)
-        except Exception as e:
-            st.error(f"Failed to load persisted df_rule_letter: {e}")
+def publish(df, note):
+    # Save as a new version for every session (the registry compiles and stores
+    # its matcher once), then restart this session's editor from it
+    snap = registry.publish(df, note)
+    if snap is not None and snap.error:
+        st.warning(f"ルールの事前準備に失敗しました: {snap.error}")
+    set_rule_base(*published_rules())
+
+
+def set_table(name, df, token=None):
+    # Every replacement gets a new token; download payloads are cached per token
+    st.session_state[name] = df
+    st.session_state[f"{name}_token"] = token or uuid4().hex
 
-if "df_rule_greeting" not in st.session_state:
-    if PERSIST_GREETING.exists():
+
+def set_rule_base(df, version=None):
+    # The editor always starts from this frame and its edits are tracked as
+    # deltas on top of it, so the table itself is never compared cell by cell.
+    # Published frames are shared as-is; only an edited table is session-owned.
+    token = f"rules-v{version}" if version is not None else None
+    set_table("df_word_rule", df, token)
+    st.session_state["df_word_rule_base"] = df
+    st.session_state["rule_base_token"] = st.session_state["df_word_rule_token"]
+    st.session_state["rule_version"] = version
+    st.session_state["rule_editor_token"] = uuid4().hex
+    st.session_state["rule_edit_token"] = ""
+
+
+published_df, published_version = published_rules()
+if "df_word_rule" not in st.session_state or "df_word_rule_base" not in st.session_state:
+    set_rule_base(published_df, published_version)
+elif st.session_state.get("rule_version") != published_version:
+    # Someone else saved (or rolled back) the rules since this session loaded them
+    if st.session_state.get("rule_edit_token"):
+        st.warning(f"他の画面で新しいルール（v{published_version}）が保存されました。編集内容破棄で最新版を表示します。")
+    else:
+        set_rule_base(published_df, published_version)
+        st.toast(f"最新のルール（v{published_version}）を表示しています")
+
+# load persisted auxiliary sheets if present
+for key, table_name in (("df_rule_letter", LETTER_TABLE), ("df_rule_greeting", GREETING_TABLE)):
+    if key not in st.session_state:
         try:
-            st.session_state["df_rule_greeting"] = pd.read_pickle(PERSIST_GREETING)
+            table = store.load_frame(table_name)
+            if table is not None:
+                set_table(key, table)
         except Exception as e:
-            st.error(f"Failed to load persisted df_rule_greeting: {e}")
+            st.error(f"Failed to load persisted {key}: {e}")
 
 # st.subheader("現在のルールDB (df_word_rule)")
 # if st.session_state.get("df_word_rule") is None:
@@ -74,43 +110,56 @@ st.subheader("2. 文章ルールの保存・操作")
 col1, col3, col4 = st.columns(3)
 with col1:
     if st.button("(1)ファイル読込み", icon="💿", width=200):
+        book = None
         if uploaded is None:
             st.warning("アップロードされたファイルがありません")
         else:
             try:
-                df = pd.read_excel(uploaded)
-                st.session_state["df_word_rule"] = df
-                df.to_pickle(PERSIST_PATH)
-                st.success("ファイル読込みました")
+                data = uploaded.getvalue()
+                # Fresh look at the store head: another session (or the CLI)
+                # may have published since this session's last import
+                head = registry.refresh()
+                unchanged = (
+                    content_digest(data) == st.session_state.get("rule_book_digest")
+                    and not st.session_state.get("rule_edit_token")
+                    and head is not None
+                    and head.version == st.session_state.get("rule_book_version")
+                )
+                if unchanged:
+                    # Same workbook as the last import, which is still the published version
+                    st.info("前回読み込んだファイルと同じ内容のため、再読込みを省略しました。")
+                else:
+                    book = import_rule_workbook(data, uploaded.name)
+            except RuleSchemaError as e:
+                st.error(str(e))
             except Exception:
                 st.error("cannot read the file, please check you link or the file behind your link")
-                
+
+        if book is not None:
             try:
-                df_rule_letter = pd.read_excel(uploaded, sheet_name="2.書式と運用ルール")
-                # save to session so it can be displayed elsewhere and persist to disk
-                st.session_state["df_rule_letter"] = df_rule_letter
-                try:
-                    df_rule_letter.to_pickle(PERSIST_LETTER)
-                    st.success("シート '2.書式と運用ルール' を読み込み、永続化しました。")
-                except Exception as e:
-                    st.error(f"df_rule_letter を永続化できませんでした: {e}")
-            except ValueError:
-                print("ファイルに「2.書式と運用ルール」というTabが見つかりませんでした。 シート名を確認してください。")
+                publish(book.word, uploaded.name)
+                st.session_state["rule_book_version"] = st.session_state.get("rule_version")
+                st.success("ファイル読込みました")
             except Exception as e:
-                print("Failed to read Excel:", e)
-                
-            try:
-                df_rule_greeting = pd.read_excel(uploaded, sheet_name="3.時候の挨拶")
-                st.session_state["df_rule_greeting"] = df_rule_greeting
+                st.session_state.pop("rule_book_version", None)
+                st.error(f"保存に失敗しました: {e}")
+
+            for key, sheet, table, table_name in (
+                ("df_rule_letter", LETTER_SHEET, book.letter, LETTER_TABLE),
+                ("df_rule_greeting", GREETING_SHEET, book.greeting, GREETING_TABLE),
+            ):
+                if table is None:
+                    print(f"ファイルに「{sheet}」というTabが見つかりませんでした。 シート名を確認してください。")
+                    continue
+                # save to session so it can be displayed elsewhere and persist to disk
+                set_table(key, table)
                 try:
-                    df_rule_greeting.to_pickle(PERSIST_GREETING)
-                    st.success("シート '3.時候の挨拶' を読み込み、永続化しました。")
+                    store.save_frame(table_name, table, note=uploaded.name)
+                    st.success(f"シート '{sheet}' を読み込み、永続化しました。")
                 except Exception as e:
-                    st.error(f"df_rule_greeting を永続化できませんでした: {e}")
-            except ValueError:
-                print("ファイルに「3.時候の挨拶」というTabが見つかりませんでした。 シート名を確認してください。")
-            except Exception as e:
-                print("Failed to read Excel:", e)
+                    st.error(f"{key} を永続化できませんでした: {e}")
+            st.session_state["rule_book_digest"] = book.digest
+            st.caption(f"読込み時間 {format_timings(book.timings)}")
 with col3:
     if st.button("(2)システム保存", icon="💾", width=200):
         df = st.session_state.get("df_word_rule")
@@ -118,7 +167,8 @@ with col3:
             st.warning("保存する df_word_rule がありません")
         else:
             try:
-                df.to_pickle(PERSIST_PATH)
+                publish(df, "システム保存")
+                st.session_state.pop("rule_book_digest", None)
                 st.success("保存しました")
             except Exception as e:
                 st.error(f"保存に失敗しました: {e}")
@@ -126,13 +176,29 @@ with col3:
 with col4:
     if st.button("(3)データ削除", icon="🗑️", width=200):
         try:
-            if PERSIST_PATH.exists():
-                PERSIST_PATH.unlink()
-            st.session_state["df_word_rule"] = None
+            # Only the current version is cleared; it can be restored from the history below
+            registry.delete()
+            set_rule_base(None)
+            st.session_state.pop("rule_book_digest", None)
             st.success("データを削除しました")
         except Exception as e:
             st.error(f"削除に失敗しました: {e}")
 
+with st.expander("保存履歴（以前のルールに戻す）", expanded=False):
+    history = store.history(WORD_TABLE)
+    if not history:
+        st.info("保存履歴はありません")
+    else:
+        chosen = st.selectbox("バージョン", history, format_func=lambda v: v.label())
+        if st.button("このバージョンに戻す", icon="⏪", disabled=chosen.current):
+            try:
+                registry.rollback(chosen.version)
+                set_rule_base(*published_rules())
+                st.session_state.pop("rule_book_digest", None)
+                st.success(f"v{chosen.version} に戻しました")
+            except Exception as e:
+                st.error(f"戻せませんでした: {e}")
+
 st.markdown("---")
 st.subheader("3. 文章ルールの確認・編集・ダウンロード")
 with st.expander("文章ルールの説明と注意点", expanded=False):
@@ -140,6 +206,9 @@ with st.expander("文章ルールの説明と注意点", expanded=False):
                 :green_heart: 現状の文章ルール表。スクロールして確認可能。</br>
                 :green_heart: 直接セルを編集できます。</br>
                 :green_heart: 編集後必ず最後の【編集内容保存】をボタンを押してください。</br>
+                :green_heart: 「種別」列に「正規表現」と書いた行は、誤表記を正規表現として扱います（例: 令和[0-9０-９]+年）。</br>
+                :green_heart: 正規表現は1行の中だけで照合します。後方参照・入れ子の繰り返し・時間のかかりすぎるパターンは保存できません。</br>
+                :green_heart: 誤表記を含んでいても正しい語（例: 誤表記「供」に対する「供給」）は「許容表記」列に「、」区切りで書くと指摘されません。正表記そのものは自動的に許容されます。</br>
             """, unsafe_allow_html=True)
 df = st.session_state.get("df_word_rule")
 
@@ -156,14 +225,14 @@ else:
                 st.warning("保存するデータがありません")
             else:
                 try:
-                    df_to_save.to_pickle(PERSIST_PATH)
+                    publish(df_to_save, "編集内容保存")
+                    st.session_state.pop("rule_book_digest", None)
                     st.success("変更をディスクに保存しました")
                 except Exception as e:
                     st.error(f"保存に失敗しました: {e}")
     with col_revert:
         if st.button("編集内容破棄",icon="🗑️", width=200):
-            persisted = load_persisted()
-            st.session_state["df_word_rule"] = persisted
+            set_rule_base(*published_rules())
             # Try to trigger a rerun; if the Streamlit runtime doesn't expose experimental_rerun,
             # fall back to instructing the user to refresh the page.
             try:
@@ -178,26 +247,51 @@ else:
             
     
     # Use Streamlit's data editor (fall back to experimental name if needed)
+    base = st.session_state.get("df_word_rule_base")
+    editor_key = f"rule_editor_{st.session_state['rule_editor_token']}"
     try:
-        edited = st.data_editor(df, num_rows="dynamic")
+        edited = st.data_editor(base, num_rows="dynamic", key=editor_key)
     except Exception:
-        edited = st.experimental_data_editor(df, num_rows="dynamic")
+        edited = st.experimental_data_editor(base, num_rows="dynamic", key=editor_key)
 
-    # If edited differs, update session state (but don't persist until user saves)
-    try:
-        changed = not edited.equals(df)
-    except Exception:
-        # If equals fails due to dtype differences, assume changed
-        changed = True
+    # The editor's own delta record (edited/added/deleted rows) tells whether
+    # anything changed; no full-table comparison on every rerun
+    deltas = st.session_state.get(editor_key) or {}
+    changed = any(deltas.get(k) for k in ("edited_rows", "added_rows", "deleted_rows"))
+    edit_token = json.dumps(deltas, sort_keys=True, default=str) if changed else ""
+
+    if edit_token != st.session_state.get("rule_edit_token", ""):
+        # Only when the edits themselves changed since the previous rerun
+        st.session_state["rule_edit_token"] = edit_token
+        if changed:
+            set_table("df_word_rule", edited)
+            try:
+                # Row-level delta (by row hash) so the check page can re-evaluate only these rules
+                edited_rules = rules_from_frame(edited)
+                summary = diff_rules(rules_from_frame(base), edited_rules).summary()
+                # Regex rows are checked here too, so problems show before saving
+                errors = validate_rules(edited_rules)
+            except KeyError:
+                summary, errors = None, []
+            st.session_state["rule_edit_summary"] = summary
+            st.session_state["rule_edit_errors"] = errors
+        else:
+            # All edits undone in the editor: back to the base table and its version
+            st.session_state["df_word_rule"] = base
+            st.session_state["df_word_rule_token"] = st.session_state["rule_base_token"]
 
     if changed:
-        st.session_state["df_word_rule"] = edited
-        st.info("編集をセッションに反映しました。保存するには保存ボタンを押してください。")
+        summary = st.session_state.get("rule_edit_summary")
+        detail = f"（{summary}）" if summary else ""
+        st.info(f"編集をセッションに反映しました{detail}。保存するには保存ボタンを押してください。")
+        for error in st.session_state.get("rule_edit_errors") or []:
+            st.error(f"正規表現ルール {error}")
 
-    csv = st.session_state.get("df_word_rule").to_csv(index=False).encode("utf-8")
-    # st.download_button("ダウンロード(CSV)", data=csv, file_name="df_word_rule.csv", mime="text/csv")
+    # The CSV is encoded only when the button is clicked, once per table version
+    current = st.session_state.get("df_word_rule")
+    token = st.session_state["df_word_rule_token"]
     with col_download:
-            st.download_button("ダウンロード(CSV)", data=csv, file_name="df_word_rule.csv", mime="text/csv", icon="📥", width=200)
+            st.download_button("ダウンロード(CSV)", data=lambda: csv_payload(token, current), file_name="df_word_rule.csv", mime="text/csv", icon="📥", width=200)
 
 
 st.markdown("---")
@@ -216,8 +310,8 @@ df_rule_letter = st.session_state.get("df_rule_letter")
 if df_rule_letter is not None:
     try:
         st.dataframe(df_rule_letter)
-        csv = df_rule_letter.to_csv(index=False).encode("utf-8")
-        st.download_button("Download this table (CSV)", data=csv, file_name="df_rule_letter.csv", mime="text/csv")
+        token = st.session_state.get("df_rule_letter_token")
+        st.download_button("Download this table (CSV)", data=lambda: csv_payload(token, df_rule_letter), file_name="df_rule_letter.csv", mime="text/csv")
     except Exception as e:
         st.error(f"Failed to display df_rule_letter: {e}")
 
@@ -238,7 +332,7 @@ df_rule_greeting = st.session_state.get("df_rule_greeting")
 if df_rule_greeting is not None:
     try:
         st.dataframe(df_rule_greeting)
-        csv = df_rule_greeting.to_csv(index=False).encode("utf-8")
-        st.download_button("Download this table (CSV)", data=csv, file_name="df_rule_greeting.csv", mime="text/csv")
+        token = st.session_state.get("df_rule_greeting_token")
+        st.download_button("Download this table (CSV)", data=lambda: csv_payload(token, df_rule_greeting), file_name="df_rule_greeting.csv", mime="text/csv")
     except Exception as e:
         st.error(f"Failed to display df_rule_greeting: {e}")
@@ -4,6 +4,10 @@ import numpy as np
 from docx import Document
 import requests
 from io import BytesIO, StringIO
+from wordingcheck.cache import get_matcher
+from wordingcheck.parsers import decode_text, read_table
+from wordingcheck.regexrules import RegexRuleError
+from wordingcheck.registry import rule_registry
 
 # Optional PDF parsing
 try:
@@ -149,10 +153,7 @@ if mode == "1.リンクから開く (クラウド)":
                     # Text fallback
                     if not read_success:
                         try:
-                            try:
-                                text = content.decode("utf-8")
-                            except Exception:
-                                text = content.decode("latin-1", errors="ignore")
+                            text = decode_text(content)
                             lines = text.splitlines()
                             df = pd.DataFrame({"text": lines})
                             df_full = pd.DataFrame({"full_text": [text]})
@@ -194,7 +195,7 @@ elif mode == "2.ローカルから開く":
             # 簡易プレビュー
             try:
                 if uploaded_file.name.endswith(".csv"):
-                    df = pd.read_csv(uploaded_file)
+                    df = read_table(uploaded_file.getvalue(), uploaded_file.name)
                     st.dataframe(df.head())
                     st.session_state["current_df"] = df
                     st.session_state.pop("current_full_text", None)
@@ -204,7 +205,7 @@ elif mode == "2.ローカルから開く":
                     st.session_state["current_df"] = df
                     st.session_state.pop("current_full_text", None)
                 elif uploaded_file.name.endswith(".txt"):
-                            text = uploaded_file.getvalue().decode("utf-8")
+                            text = decode_text(uploaded_file.getvalue())
                             lines = text.splitlines()
                             df = pd.DataFrame({"text": lines})
                             df_full = pd.DataFrame({"full_text": [text]})
@@ -251,21 +252,17 @@ analysis_val = st.session_state.get("analysis_output", "")
 # Read-only analysis output box (disabled=True); DO NOT bind to the same session_state key to allow updates
 analysis_box = st.text_area("Analysis output", value=analysis_val, height=900, disabled=True)
 
-from pathlib import Path
-
 def load_df_word_rule():
     # Try session-state first
     df_wr = st.session_state.get("df_word_rule")
     if df_wr is not None:
         return df_wr
-    # Try persisted file under Streamlit/data
-    p = Path(__file__).resolve().parent / "data" / "df_word_rule.pkl"
+    # Published rule version, shared by every session of the process
     try:
-        if p.exists():
-            return pd.read_pickle(p)
+        snap = rule_registry().current()
     except Exception:
         return None
-    return None
+    return None if snap is None else snap.frame
 
 if st.button("analysis"):
     # Run analysis
@@ -293,20 +290,17 @@ if st.button("analysis"):
                 st.warning("解析対象のデータがありません。ファイルを開くかテキストを貼り付けてください。")
                 haystack = None
 
+            matcher = None
             if haystack is not None:
-                out_lines = []
-                for _, row in df_wr.iterrows():
-                    typo = str(row.get("誤表記", ""))
-                    corr = str(row.get("正表記", ""))
-                    if not typo:
-                        continue
-                    try:
-                        if typo in haystack:
-                            out_lines.append(f"{typo} → {corr}")
-                    except Exception:
-                        # fallback to simple substring test on stringified haystack
-                        if str(typo) in str(haystack):
-                            out_lines.append(f"{typo} → {corr}")
+                # One pass over the text for all rules (Aho-Corasick automaton),
+                # compiled once per rule-table content and shared across sessions
+                try:
+                    matcher = get_matcher(df_wr)
+                except RegexRuleError as e:
+                    st.error(f"正規表現ルールに問題があります: {e}")
+
+            if matcher is not None:
+                out_lines = matcher.check(str(haystack))
 
                 if out_lines:
                     prev = st.session_state.get("analysis_output", "")
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Run from anywhere: the package lives at the repository root, not installed
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,23 @@
+from wordingcheck.checker import check_file
+from wordingcheck.encoding import CHUNK_SIZE
+from wordingcheck.matcher import Rule, RuleMatcher
+from wordingcheck.normalize import DEFAULT_NORMALIZER
+
+RULES = [Rule("宜しく", "よろしく"), Rule("お願い致します", "お願いいたします"), Rule(r"^第\d+条", "条番号は漢数字で", regex=True)]
+
+
+def test_check_file_finds_a_typo_across_the_cut_of_an_overlong_line(tmp_path):
+    # One line longer than a chunk is split; 誤表記 straddling the cut are still found
+    cut = CHUNK_SIZE
+    line = "あ" * (cut - 3) + "お願い致します" + "い" * (cut - 10) + "宜しく"
+    path = tmp_path / "long.txt"
+    path.write_text("第1条 前文\n" + line + "\n最後の行\n", encoding="cp932")
+    matcher = RuleMatcher(RULES, DEFAULT_NORMALIZER)
+    assert not matcher.multiline
+    assert check_file(path, matcher) == RULES
+
+
+def test_check_file_line_by_line(tmp_path):
+    path = tmp_path / "notice.txt"
+    path.write_text("宜しくお願いします\n第1条\n", encoding="utf-16")
+    assert check_file(path, RuleMatcher(RULES, DEFAULT_NORMALIZER)) == [RULES[0], RULES[2]]
@@ -0,0 +1,100 @@
+import codecs
+
+import pytest
+
+from wordingcheck.encoding import SAMPLE_SIZE, detect_encoding, iter_decode, line_chunks
+
+KANJI = "東京都千代田区霞が関一丁目本日会議資料配布予定参加者全員確認願"
+MIXED = "子どもたちの運動会は、十月十日に行います。よろしくお願いします。\n"
+LATIN = "Résumé, café and naïve: déjà vu.\n"
+
+
+def _reads_back(text, data):
+    encoding = detect_encoding(data[:SAMPLE_SIZE])
+    return data.decode(encoding, errors="replace") == text
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "cp932", "euc_jp", "utf-16-le", "utf-16-be"])
+@pytest.mark.parametrize("text", [KANJI, KANJI * 3, MIXED * 20, "令和六年度 第一回理事会議事録\n" * 5, "東京都千代田区"])
+def test_japanese_text_is_read_back(encoding, text):
+    assert _reads_back(text, text.encode(encoding))
+
+
+@pytest.mark.parametrize("encoding", ["utf-16-le", "utf-16-be"])
+def test_kanji_only_utf16_without_bom(encoding):
+    assert detect_encoding(KANJI.encode(encoding)) == encoding
+    assert detect_encoding("会議資料配布予定".encode(encoding)) == encoding
+
+
+@pytest.mark.parametrize("text", ["会議", "会議資料", "日本", "東京都千代田区"])
+def test_short_kanji_only_euc_jp(text):
+    assert detect_encoding(text.encode("euc_jp")) == "euc_jp"
+
+
+def test_ascii_heavy_utf16_without_bom():
+    text = "Notice 2026-10-18: PTA meeting\n" * 10
+    assert detect_encoding(text.encode("utf-16-le")) == "utf-16-le"
+    assert detect_encoding(text.encode("utf-16-be")) == "utf-16-be"
+
+
+def test_utf8():
+    assert detect_encoding(LATIN.encode("utf-8") * 5) == "utf-8"
+    assert detect_encoding(b"plain ascii\n") == "utf-8"
+    assert detect_encoding(b"") == "utf-8"
+    # A sample cut in the middle of a character is still UTF-8
+    assert detect_encoding((MIXED * 5).encode("utf-8")[:-1]) == "utf-8"
+
+
+def test_bom_and_charset_come_first():
+    assert detect_encoding(codecs.BOM_UTF8 + KANJI.encode("utf-8")) == "utf-8-sig"
+    assert detect_encoding(codecs.BOM_UTF16_LE + KANJI.encode("utf-16-le")) == "utf-16"
+    assert detect_encoding(codecs.BOM_UTF16_BE + KANJI.encode("utf-16-be")) == "utf-16"
+    assert detect_encoding(MIXED.encode("utf-8"), "text/plain; charset=Shift_JIS") == "shift_jis"
+    # An unknown charset falls back to detection
+    assert detect_encoding(MIXED.encode("cp932"), "text/plain; charset=x-unknown") == "cp932"
+
+
+def _pieces(data, size):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "cp932", "euc_jp", "utf-16-le"])
+@pytest.mark.parametrize("size", [1, 3, 1000])
+def test_iter_decode_detects_from_the_head_and_joins_split_characters(encoding, size):
+    text = MIXED * 50 + KANJI
+    data = text.encode(encoding)
+    assert "".join(iter_decode(_pieces(data, size))) == text
+
+
+def test_iter_decode_with_a_known_encoding():
+    data = (MIXED * 3).encode("cp932")
+    assert "".join(iter_decode(_pieces(data, 5), encoding="cp932")) == MIXED * 3
+    assert "".join(iter_decode([b"\xef\xbb\xbf", "本文".encode("utf-8")])) == "本文"
+    assert list(iter_decode([])) == []
+
+
+def test_iter_decode_replaces_a_truncated_tail():
+    assert "".join(iter_decode(["会議".encode("utf-8")[:-1]], encoding="utf-8")) == "会�"
+
+
+def test_line_chunks_end_at_line_breaks():
+    texts = ["一行目\n二行", "目の続き", "\n三行目\n四", "行目"]
+    chunks = list(line_chunks(texts))
+    assert chunks == ["一行目\n", "二行目の続き\n三行目\n", "四行目"]
+
+
+def test_line_chunks_cut_an_overlong_line():
+    line = "あ" * 25
+    chunks = list(line_chunks([line[:7], line[7:], "\n", "い\n"], max_chars=10))
+    assert chunks == ["あ" * 10, "あ" * 10, "あ" * 5 + "\n", "い\n"]
+    # A single chunk longer than the limit is cut too
+    assert list(line_chunks(["う" * 23], max_chars=10)) == ["う" * 10, "う" * 10, "う" * 3]
+
+
+@pytest.mark.parametrize("mark", ["ﾞ", "゙", "́", "️"])
+def test_line_chunks_keep_marks_with_their_character(mark):
+    text = "ｶ" * 9 + "ｶ" + mark + "ｶ" * 5
+    chunks = list(line_chunks([text], max_chars=10))
+    assert "".join(chunks) == text
+    assert all(not chunk.startswith(mark) for chunk in chunks)
+    assert chunks[0] == "ｶ" * 9
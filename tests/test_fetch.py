@@ -0,0 +1,158 @@
+"""fetch() against a local http.server stand-in."""
+import io
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from wordingcheck.fetch import FetchError, UrlCache, fetch, limit_size
+
+ETAG = '"v1"'
+LAST_MODIFIED = "Wed, 01 Apr 2026 00:00:00 GMT"
+
+
+def _docx_bytes():
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("[Content_Types].xml", "<Types/>")
+        zf.writestr("word/document.xml", "<w:document/>")
+    return buf.getvalue()
+
+
+# path -> (body, headers)
+ROUTES = {
+    "/download?id=1": (b"%PDF-1.4\n%...", {"Content-Type": "application/octet-stream"}),
+    "/attachment": (_docx_bytes(), {"Content-Type": "application/octet-stream"}),
+    "/list": ("学年,行事\n1,遠足\n".encode("utf-8"), {"Content-Type": "text/csv; charset=utf-8"}),
+    "/notice": ("宜しくお願い致します".encode("utf-8"), {"Content-Type": "text/plain; charset=utf-8"}),
+    "/etag": (b"etag body", {"Content-Type": "text/plain", "ETag": ETAG}),
+    "/modified": (b"modified body", {"Content-Type": "text/plain", "Last-Modified": LAST_MODIFIED}),
+}
+BIG = b"x" * (256 * 1024)
+
+
+class StandIn(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.seen.append((self.path, dict(self.headers)))
+        if self.path == "/big-declared":
+            return self._send(BIG, {"Content-Type": "text/plain"})
+        if self.path == "/big-chunked":
+            # No Content-Length: the size is only known while reading
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i in range(0, len(BIG), 8192):
+                piece = BIG[i : i + 8192]
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(piece), piece))
+            self.wfile.write(b"0\r\n\r\n")
+            return
+        body, headers = ROUTES[self.path]
+        etag, modified = headers.get("ETag"), headers.get("Last-Modified")
+        if (etag and self.headers.get("If-None-Match") == etag) or (
+            modified and self.headers.get("If-Modified-Since") == modified
+        ):
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self._send(body, headers)
+
+    def _send(self, body, headers):
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # The client hangs up on purpose when a body is too large
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = StandInServer(("127.0.0.1", 0), StandIn)
+    httpd.seen = []
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def session():
+    with requests.Session() as s:
+        yield s
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        ("/download?id=1", ".pdf"),  # magic bytes beat a generic Content-Type
+        ("/attachment", ".docx"),  # ZIP contents decide between Word and Excel
+        ("/list", ".csv"),  # no signature: Content-Type decides
+        ("/notice", ".txt"),
+    ],
+)
+def test_format_is_sniffed(server, session, tmp_path, path, expected):
+    result = fetch(server.url + path, cache=UrlCache(tmp_path), session=session)
+    assert result.format == expected
+    assert result.content == ROUTES[path][0]
+    assert not result.from_cache
+
+
+@pytest.mark.parametrize("path, header", [("/etag", "If-None-Match"), ("/modified", "If-Modified-Since")])
+def test_unchanged_file_is_revalidated(server, session, tmp_path, path, header):
+    cache = UrlCache(tmp_path)
+    first = fetch(server.url + path, cache=cache, session=session)
+    second = fetch(server.url + path, cache=cache, session=session)
+    assert not first.from_cache
+    assert second.from_cache
+    assert second.content == first.content == ROUTES[path][0]
+    assert second.content_type == "text/plain"
+    assert header not in server.seen[0][1]
+    assert header in server.seen[1][1]
+
+
+def test_uncacheable_response_is_not_kept(server, session, tmp_path):
+    cache = UrlCache(tmp_path)
+    fetch(server.url + "/notice", cache=cache, session=session)
+    again = fetch(server.url + "/notice", cache=cache, session=session)
+    assert not again.from_cache
+    assert "If-None-Match" not in server.seen[1][1]
+    assert not list(tmp_path.glob("*.body"))
+
+
+@pytest.mark.parametrize("path", ["/big-declared", "/big-chunked"])
+def test_size_limit(server, session, tmp_path, path):
+    with pytest.raises(FetchError):
+        fetch(server.url + path, cache=UrlCache(tmp_path), session=session, max_bytes=64 * 1024)
+    assert not list(tmp_path.iterdir())
+
+
+def test_limit_stops_reading_at_the_limit():
+    read = []
+
+    def chunks():
+        for i in range(100):
+            read.append(i)
+            yield b"x" * 10
+
+    with pytest.raises(FetchError):
+        list(limit_size(chunks(), 25))
+    assert len(read) == 3
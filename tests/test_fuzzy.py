@@ -0,0 +1,112 @@
+import pytest
+
+from wordingcheck.fuzzy import FuzzyIndex, _distances, fuzzy_cache, fuzzy_index
+from wordingcheck.matcher import Rule, RuleMatcher
+from wordingcheck.normalize import DEFAULT_NORMALIZER
+
+RULES = [
+    Rule("宜しく", "よろしくお願いします"),
+    Rule("打ち合せ", "打ち合わせ"),
+    Rule("会義", "会議資料", allow=("打ち会わせ",)),
+    Rule("ガッコー", "ガッコウだより"),
+    Rule("子供", "子ども"),
+]
+
+
+def _found(index, text):
+    return [(text[h.start : h.end], h.term, h.distance) for h in index.scan(text)]
+
+
+def test_short_terms_are_not_indexed():
+    assert FuzzyIndex(RULES).terms == ["よろしくお願いします", "打ち合わせ", "会議資料", "ガッコウだより"]
+
+
+def test_distances_of_every_prefix():
+    assert _distances("abcd", "abxd", 0, 4, 1) == [3, 2, 2, 1]
+    assert _distances("abcd", "xabcd", 1, 5, 1) == [3, 2, 1, 0]
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("打ち会わせの日程", [("打ち会わせ", "打ち合わせ", 1)]),  # a wrong kanji
+        ("会儀資料です", [("会儀資料", "会議資料", 1)]),
+        ("よろしくお原いします", [("よろしくお原いします", "よろしくお願いします", 1)]),
+        ("よろしくお願しします", [("よろしくお願しします", "よろしくお願いします", 1)]),
+        ("よろしくおねがいします", [("よろしくおねがいします", "よろしくお願いします", 2)]),  # long terms allow two edits
+    ],
+)
+def test_near_misses_are_reported(text, expected):
+    # Without the allow column, which would make 打ち会わせ a known word
+    assert _found(FuzzyIndex([Rule(r.typo, r.correct) for r in RULES]), text) == expected
+
+
+def test_two_edits_only_for_long_terms():
+    index = FuzzyIndex(RULES)
+    assert _found(index, "打ち会あせ") == []  # 5 characters: one edit at most
+    assert _found(index, "よろしくおねがいします") == [("よろしくおねがいします", "よろしくお願いします", 2)]
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "打ち合わせの日程",  # the 正表記 itself
+        "よろしくお願いします",
+        "打ち合せの日程",  # a listed 誤表記 is reported by its rule
+        "打ち会わせの日程",  # an allowed context
+        "",
+        "短い",
+    ],
+)
+def test_exact_and_known_words_are_not_near_misses(text):
+    assert _found(FuzzyIndex(RULES), text) == []
+
+
+def test_first_and_last_character_must_match():
+    index = FuzzyIndex(RULES)
+    assert _found(index, "討ち合わせ") == []
+    assert _found(index, "会議資科") == []  # a different ending is usually conjugation
+    assert _found(index, "会儀資料") == [("会儀資料", "会議資料", 1)]
+
+
+def test_excluded_spans_are_skipped():
+    index = FuzzyIndex(RULES)
+    assert index.scan("会儀資料です", exclude=[(1, 2)]) == []
+    assert len(index.scan("会儀資料です", exclude=[(4, 6)])) == 1
+
+
+def test_hits_do_not_cross_lines():
+    assert _found(FuzzyIndex(RULES), "打ち\n合わせ") == []
+
+
+@pytest.mark.parametrize(
+    "text, original",
+    [
+        ("お知らせｶﾞｯｺｳのだより", "ｶﾞｯｺｳのだより"),  # the voiced mark composes into one character
+        ("ｶﾞｯｺｳの会儀資料", "会儀資料"),  # the span shifts after a shorter rewrite
+        ("会​儀資料", "会​儀資料"),  # a dropped zero-width space stays inside the span
+    ],
+)
+def test_spans_map_back_to_the_original(text, original):
+    hits = FuzzyIndex(RULES, DEFAULT_NORMALIZER).scan(text)
+    assert [text[h.start : h.end] for h in hits] == [original]
+
+
+def test_index_is_rebuilt_only_when_the_rule_version_changes():
+    fuzzy_cache.clear()
+    matcher = RuleMatcher(RULES, DEFAULT_NORMALIZER)
+    matcher.version = "v1"
+    first = fuzzy_index(matcher)
+    assert fuzzy_index(matcher) is first
+    same_rules = RuleMatcher(RULES, DEFAULT_NORMALIZER)
+    same_rules.version = "v1"
+    assert fuzzy_index(same_rules) is first
+    assert fuzzy_index(matcher, limit=1) is not first
+
+    edited = RuleMatcher(RULES + [Rule("連絡帳", "連絡ノート")], DEFAULT_NORMALIZER)
+    edited.version = "v2"
+    second = fuzzy_index(edited)
+    assert second is not first
+    assert "連絡ノート" in second.terms
+    assert fuzzy_index(edited) is second
+    fuzzy_cache.clear()
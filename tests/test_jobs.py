@@ -0,0 +1,83 @@
+import threading
+
+from wordingcheck.jobs import CANCELLED, DONE, JobCancelled, JobRunner
+
+
+def _waiting_work(release):
+    def work(job):
+        for done in range(1000):
+            job.report(done, 1000, "件")
+            if release.wait(0.01):
+                return "result"
+        raise AssertionError("never released")
+
+    return work
+
+
+def test_one_subscriber_cancelling_leaves_the_shared_job_running():
+    runner = JobRunner(max_workers=1)
+    release = threading.Event()
+    work = _waiting_work(release)
+    first = runner.submit("parse", work)
+    second = runner.submit("parse", work)
+    assert first.job is second.job
+    assert first.job.subscribers == 2
+
+    first.cancel()
+    assert first.cancelled and first.finished and first.status == CANCELLED
+    assert not second.cancelled and not second.finished
+    assert not first.job.cancelled
+
+    release.set()
+    assert second.wait(5)
+    assert second.status == DONE and second.result == "result"
+    assert first.status == CANCELLED
+
+
+def test_the_last_subscriber_cancelling_stops_the_job():
+    runner = JobRunner(max_workers=1)
+    release = threading.Event()
+    work = _waiting_work(release)
+    first = runner.submit("parse", work)
+    second = runner.submit("parse", work)
+    first.cancel()
+    first.cancel()  # withdrawing twice counts once
+    assert not second.job.cancelled
+    second.cancel()
+    assert second.job.cancelled
+    assert second.job.wait(5)
+    assert second.job.status == CANCELLED
+
+
+def test_a_cancelled_key_starts_a_new_job():
+    runner = JobRunner(max_workers=1)
+    release = threading.Event()
+    work = _waiting_work(release)
+    first = runner.submit("parse", work)
+    first.cancel()
+    again = runner.submit("parse", work)
+    assert again.job is not first.job
+    release.set()
+    assert again.wait(5) and again.status == DONE
+
+
+def test_report_raises_once_cancelled():
+    runner = JobRunner(max_workers=1)
+    started = threading.Event()
+    seen = []
+
+    def work(job):
+        started.set()
+        try:
+            while True:
+                job.report(0)
+                threading.Event().wait(0.01)
+        except JobCancelled:
+            seen.append("cancelled")
+            raise
+
+    handle = runner.submit("k", work)
+    assert started.wait(5)
+    handle.cancel()
+    assert handle.job.wait(5)
+    assert seen == ["cancelled"]
@@ -0,0 +1,68 @@
+import pytest
+
+from wordingcheck.fuzzy import correct_terms
+from wordingcheck.matcher import Rule, RuleMatcher, allow_contexts, correct_forms
+from wordingcheck.normalize import DEFAULT_NORMALIZER
+
+
+@pytest.mark.parametrize(
+    "cell, forms",
+    [
+        ("日時・場所（見出し）", ["日時・場所"]),
+        ("「子ども」と表記", ["子ども"]),
+        ("よろしくお願いします、よろしくお願いいたします", ["よろしくお願いします", "よろしくお願いいたします"]),
+        ("～いたします", ["いたします"]),
+        ("（削除）", []),
+    ],
+)
+def test_correct_forms(cell, forms):
+    assert correct_forms(cell) == forms
+
+
+def test_fuzzy_terms_are_long_correct_forms():
+    assert correct_terms("日時・場所（見出し）") == ["日時・場所"]
+    assert correct_terms("子ども、こどもたち") == ["こどもたち"]
+
+
+@pytest.mark.parametrize("normalizer", [None, DEFAULT_NORMALIZER])
+def test_annotated_correct_form_is_allowed(normalizer):
+    rule = Rule("日時", "日時・場所（見出し）")
+    assert allow_contexts(rule) == ["日時・場所"]
+    matcher = RuleMatcher([rule], normalizer)
+    assert matcher.check("日時・場所") == []
+    assert matcher.check("日時は未定") == ["日時 → 日時・場所（見出し）"]
+
+
+def test_allow_column_and_correct_form_together():
+    matcher = RuleMatcher([Rule("致します", "「いたします」（補助動詞）", allow=("感謝致します",))])
+    assert matcher.check("感謝致します") == []
+    assert matcher.check("お願い致します") == ["致します → 「いたします」（補助動詞）"]
+
+
+def _random_rules(rng):
+    alphabet = "あいうかきく子供達"
+    rules = []
+    for _ in range(rng.randint(1, 8)):
+        typo = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 3)))
+        allow = tuple(
+            "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 2))) + typo + "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 2)))
+            for _ in range(rng.randint(0, 2))
+        )
+        rules.append(Rule(typo, typo + "（正）", allow=allow))
+    return rules
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_small_table_path_matches_automaton(monkeypatch, seed):
+    import random
+
+    from wordingcheck import matcher as matcher_module
+
+    rng = random.Random(seed)
+    for _ in range(200):
+        matcher = RuleMatcher(_random_rules(rng))
+        text = "".join(rng.choice("あいうかきく子供達。") for _ in range(rng.randint(0, 60)))
+        monkeypatch.setattr(matcher_module, "SMALL_TABLE", 0)
+        expected = (list(matcher.literal_matches(text)), matcher.hit_rules(text))
+        monkeypatch.setattr(matcher_module, "SMALL_TABLE", 10_000)
+        assert (list(matcher.literal_matches(text)), matcher.hit_rules(text)) == expected
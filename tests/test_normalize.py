@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from wordingcheck.normalize import DEFAULT_NORMALIZER, Normalizer
+
+PIECES = ["子供", "ｶﾞｯｺｳ", "ﾊﾟﾝ", "１２３", "ＡＢＣ", "㍿", "ﬁ", "​", "—", "〜", "が", "\n", "é", "。", "ｱ", "ﾞ", "abc", "①"]
+
+
+def test_unchanged_text_maps_to_itself():
+    normalized = DEFAULT_NORMALIZER.normalize("子どもたちの運動会\nよろしくお願いします")
+    assert normalized.identity
+    assert normalized.span(2, 5) == (2, 5)
+
+
+@pytest.mark.parametrize(
+    "text, target, original",
+    [
+        ("ｶﾞｯｺｳだより", "ガッコウ", "ｶﾞｯｺｳ"),  # voiced mark composed into one character
+        ("明日のﾊﾟﾝ", "パン", "ﾊﾟﾝ"),
+        ("会費は１２３円", "123", "１２３"),  # 1:1 rewrites map character by character
+        ("会費は１２３円", "2", "２"),
+        ("弊社㍿から", "株式", "㍿"),  # part of an expansion widens to the whole character
+        ("子​供達", "子供", "子​供"),  # a dropped zero-width space stays inside the span
+        ("10時〜12時", "10時~12時", "10時〜12時"),
+        ("ＰＴＡ—会", "PTA-会", "ＰＴＡ—会"),
+    ],
+)
+def test_span_maps_back_to_the_original(text, target, original):
+    normalized = DEFAULT_NORMALIZER.normalize(text)
+    start = normalized.text.index(target)
+    a, b = normalized.span(start, start + len(target))
+    assert text[a:b] == original
+
+
+def test_spans_after_a_rewrite_shift():
+    text = "ｶﾞｯｺｳの子供"
+    normalized = DEFAULT_NORMALIZER.normalize(text)
+    start = normalized.text.index("子供")
+    assert normalized.span(start, start + 2) == (text.index("子供"), len(text))
+
+
+@pytest.mark.parametrize("normalizer", [DEFAULT_NORMALIZER, Normalizer(kana=True, case=True)])
+def test_every_span_covers_its_normalized_text(normalizer):
+    rng = random.Random(17)
+    for _ in range(300):
+        text = "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 8)))
+        normalized = normalizer.normalize(text)
+        assert normalized.text == normalizer.fold(text)
+        for s in range(len(normalized.text)):
+            for e in range(s + 1, len(normalized.text) + 1):
+                a, b = normalized.span(s, e)
+                assert 0 <= a <= b <= len(text)
+                assert normalized.text[s:e] in normalizer.fold(text[a:b])
+
+
+def test_stable_prefix_keeps_a_base_character_with_its_marks():
+    norm = DEFAULT_NORMALIZER
+    assert norm.stable_prefix("学校ｶ") == 2  # a following ﾞ could still change ｶ
+    assert norm.stable_prefix("学校ｶﾞ") == 2
+    assert norm.stable_prefix("学校\n") == 3
+    assert norm.stable_prefix("ﾞ") == 0
@@ -0,0 +1,84 @@
+import pytest
+
+from wordingcheck.checker import check_document
+from wordingcheck.document import TextDocument
+from wordingcheck.findings import Findings
+from wordingcheck.matcher import Rule, RuleMatcher
+from wordingcheck.parsers import pypdf
+from wordingcheck import pdf
+
+pytestmark = pytest.mark.skipif(pypdf is None, reason="pypdf not installed")
+
+
+def make_pdf(pages):
+    """A minimal PDF with one line of Helvetica text per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for n, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{n} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return out
+
+
+PAGES = [f"page {i} teh notice, recieve it" for i in range(12)] + ["", "ends with rec", "ieve and teh"]
+RULES = [Rule("teh", "the"), Rule("recieve", "receive"), Rule("rec\nieve", "receive")]
+
+
+@pytest.fixture(scope="module")
+def data():
+    return make_pdf(PAGES)
+
+
+@pytest.mark.parametrize("workers", [1, None])
+def test_check_pdf_equals_checking_the_extracted_text(data, workers):
+    matcher = RuleMatcher(RULES)
+    pdf._page_cache.clear()
+    seen = []
+    text, findings = pdf.check_pdf(data, matcher, progress=lambda done, total: seen.append((done, total)), workers=workers)
+    assert text == pdf.extract_pdf_text(data, workers=1)
+    expected = Findings.from_document(TextDocument(text), matcher)
+    assert list(findings.rule_ids) == list(expected.rule_ids)
+    assert list(findings.starts) == list(expected.starts)
+    assert list(findings.lines) == list(expected.lines)
+    # The 誤表記 split across the page break is found
+    assert 2 in findings.rule_ids
+    assert seen[-1] == (len(PAGES), len(PAGES))
+    assert [done for done, _ in seen] == list(range(1, len(PAGES) + 1))
+
+
+def test_check_document_reports_what_check_pdf_finds(data):
+    # The CLI / batch path and the page's check agree, including the 誤表記
+    # across the page break
+    matcher = RuleMatcher(RULES)
+    _, findings = pdf.check_pdf(data, matcher, workers=1)
+    assert check_document("notice.pdf", data, matcher) == [matcher.rules[i] for i in sorted(set(findings.rule_ids))]
+    assert check_document("notice.pdf", data, matcher) == RULES
+
+
+def test_chunks_follow_page_order(data):
+    pdf._page_cache.clear()
+    chunks = list(pdf.iter_pdf_chunks(data))
+    assert "".join(chunks) == pdf.extract_pdf_text(data, workers=1)
+    assert chunks[0].startswith("page 0")
+
+
+def test_parallel_extraction_uses_the_spawn_pool(data):
+    pdf._page_cache.clear()
+    assert len(PAGES) >= pdf.MIN_PARALLEL_PAGES
+    list(pdf.iter_pdf_pages(data))
+    assert pdf._pool is not None
+    assert pdf._pool._mp_context.get_start_method() == "spawn"
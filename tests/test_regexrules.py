@@ -0,0 +1,29 @@
+import pytest
+
+from wordingcheck.regexrules import MatchBudget, RegexRuleError, RegexRules, validate_pattern
+
+
+def test_anchors_match_at_every_line():
+    rules = RegexRules([(0, r"^[0-9]+月"), (1, r"です$")])
+    text = "10月の行事です\n3月の予定\n予定です"
+    assert list(rules.scan(text)) == [(0, 0, 3), (1, 6, 8), (0, 9, 11), (1, 17, 19)]
+
+
+def test_no_match_across_lines():
+    rules = RegexRules([(0, r"行事\s*予定")])
+    assert list(rules.scan("行事\n予定")) == []
+    assert list(rules.scan("行事 予定")) == [(0, 0, 5)]
+
+
+@pytest.mark.parametrize("pattern", ["", "(a)\\1", "(?i)abc", "a*", "(a+)+b", "("])
+def test_rejected_patterns(pattern):
+    with pytest.raises(RegexRuleError):
+        validate_pattern(pattern)
+
+
+def test_budget_stops_the_scan():
+    rules = RegexRules([(0, "予定")])
+    budget = MatchBudget(0)
+    hits = list(rules.scan("予定\n" * 10, budget))
+    assert budget.exceeded
+    assert len(hits) < 10
@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from wordingcheck.document import TextDocument
+from wordingcheck.findings import Findings
+from wordingcheck.matcher import Rule, RuleMatcher
+from wordingcheck.normalize import DEFAULT_NORMALIZER
+from wordingcheck.ruledelta import DocumentIndex, diff_rules, patch_findings
+
+TEXT = (
+    "12月の子供会のお知らせ\n"
+    "ｶﾞｯｺｳ行事に子供服で参加して頂きますよう、宜しくお願い致します。\n"
+    "子供達の送迎はＰＴＡ  会で担当します。有難うございます。\n"
+)
+RULES = [
+    Rule("子供", "子ども", allow=("子供服",)),
+    Rule("頂きます", "いただきます"),
+    Rule("宜しく", "よろしく"),
+    Rule(r"^[0-9]+月", "（月は漢数字）", regex=True),
+]
+CANDIDATES = [
+    Rule("致します", "いたします"),
+    Rule("有難う", "ありがとう"),
+    Rule("ガッコウ", "学校"),
+    Rule("子供達", "子どもたち"),
+    Rule("お知らせ", "おしらせ", allow=("のお知らせ",)),
+    Rule(r"ＰＴＡ\s+会", "PTA会", regex=True),
+    Rule("子供", "こども"),  # same 誤表記, different 正表記
+]
+
+
+def as_rows(findings):
+    return list(zip(findings.rule_ids, findings.starts, findings.ends, findings.lines))
+
+
+def check_patch(old_rules, new_rules, normalizer):
+    doc = TextDocument(TEXT)
+    before = Findings.from_document(doc, RuleMatcher(old_rules, normalizer))
+    patched = patch_findings(before, new_rules, DocumentIndex(doc, normalizer))
+    expected = Findings.from_document(doc, RuleMatcher(new_rules, normalizer))
+    assert sorted(as_rows(patched)) == sorted(as_rows(expected))
+    assert list(patched.ends) == sorted(patched.ends)
+    assert patched.rules == list(new_rules)
+
+
+@pytest.mark.parametrize("normalizer", [None, DEFAULT_NORMALIZER])
+@pytest.mark.parametrize(
+    "edit",
+    [
+        lambda rules: rules + CANDIDATES[:2],  # added rows
+        lambda rules: rules[1:],  # removed row
+        lambda rules: [Rule("宜しく", "よろしく（ひらがな）")] + rules[:2] + rules[3:],  # changed 正表記
+        lambda rules: list(reversed(rules)),  # reordered only
+        lambda rules: rules + [CANDIDATES[5]],  # added regex rule
+        lambda rules: rules + [CANDIDATES[4]],  # added rule with an allowed context
+        lambda rules: [rules[0]._replace(allow=())] + rules[1:],  # context removed
+    ],
+)
+def test_patch_equals_full_recheck(edit, normalizer):
+    check_patch(RULES, edit(RULES), normalizer)
+
+
+def test_random_edits_equal_full_recheck():
+    rng = random.Random(5)
+    pool = RULES + CANDIDATES
+    for _ in range(200):
+        old = rng.sample(pool, rng.randint(0, len(pool)))
+        new = [r for r in old if rng.random() < 0.7] + rng.sample(pool, rng.randint(0, 3))
+        rng.shuffle(new)
+        check_patch(old, new, DEFAULT_NORMALIZER)
+
+
+def test_diff_pairs_duplicates_in_order():
+    old = [Rule("子供", "子ども"), Rule("子供", "子ども"), Rule("宜しく", "よろしく")]
+    new = [Rule("宜しく", "よろしく"), Rule("子供", "子ども")]
+    delta = diff_rules(old, new)
+    assert delta.kept == {0: 1, 2: 0}
+    assert delta.removed == [1]
+    assert delta.added == []
@@ -0,0 +1,111 @@
+import json
+import random
+import socket
+import threading
+
+import pandas as pd
+import pytest
+
+from wordingcheck.cache import get_matcher
+from wordingcheck.registry import RuleRegistry
+from wordingcheck.server import SEPARATOR, ScanBatcher, make_server, scan_texts
+from wordingcheck.store import RuleStore
+
+RULES = pd.DataFrame(
+    {
+        "誤表記": ["子供", "致します", "ab", "\nです", r"^[0-9]+月", r"ＰＴＡ\s+会"],
+        "正表記": ["子ども", "いたします", "AB", "です", "（月は漢数字）", "PTA会"],
+        "種別": ["", "", "", "", "正規表現", "正規表現"],
+    }
+)
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return get_matcher(RULES)
+
+
+def per_text(matcher, texts):
+    return [list(matcher.iter_matches(text)) for text in texts]
+
+
+def test_hits_map_back_to_each_text(matcher):
+    texts = [
+        "子供",  # hit is the whole text
+        "子供会のお知らせ。よろしくお願い致します",  # hits at both edges
+        "",
+        "10月の行事\n3月の予定",  # regex anchored at line starts
+        "ａ",  # with the next text would read "ａ\x00\nb"
+        "b　ＰＴＡ  会",
+    ]
+    results = scan_texts(matcher, texts)
+    assert [r.hits for r in results] == per_text(matcher, texts)
+    assert results[0].hits == [(0, 0, 2)]
+    assert results[1].hits[-1][2] == len(texts[1])
+    assert [rule_id for rule_id, _, _ in results[3].hits] == [4, 4]
+    assert not any(r.incomplete for r in results)
+
+
+def test_no_hit_across_the_separator(matcher):
+    # "a" + "b" and a 誤表記 starting with a line break must not join texts
+    texts = ["xa", "by", "これ", "です"]
+    results = scan_texts(matcher, texts)
+    assert [r.hits for r in results] == [[], [], [], []]
+    joined = list(matcher.iter_matches(SEPARATOR.join(texts)))
+    assert joined == [] or all("\x00" not in SEPARATOR.join(texts)[s:e] for _, s, e in joined)
+
+
+def test_random_batches_match_per_text_scans(matcher):
+    rng = random.Random(7)
+    alphabet = ["子", "供", "致", "し", "ま", "す", "a", "b", "\n", "で", "1", "月", "Ｐ", "Ｔ", "Ａ", " ", "会"]
+    for _ in range(300):
+        texts = ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 20))) for _ in range(rng.randint(1, 6))]
+        assert [r.hits for r in scan_texts(matcher, texts)] == per_text(matcher, texts)
+
+
+def test_batcher_counts_texts(matcher):
+    batcher = ScanBatcher()
+    futures = [batcher.submit(matcher, "子供") for _ in range(5)]
+    assert all(f.result(timeout=10).hits == [(0, 0, 2)] for f in futures)
+    scans, texts = batcher.stats()
+    assert texts == 5 and 1 <= scans <= 5
+
+
+@pytest.fixture
+def server(tmp_path):
+    registry = RuleRegistry(RuleStore(tmp_path / "rules.sqlite3"))
+    registry.publish(RULES)
+    httpd = make_server(registry, port=0)
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield httpd.server_address
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def raw_request(address, head: bytes, body: bytes = b"") -> bytes:
+    with socket.create_connection(address, timeout=5) as sock:
+        sock.sendall(head + b"\r\n\r\n" + body)
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+
+@pytest.mark.parametrize("length", [b"-1", b"abc", b"+5", b"\xef\xbc\x95"])
+def test_bad_content_length_is_rejected(server, length):
+    head = b"POST /check HTTP/1.1\r\nHost: x\r\nContent-Type: text/plain\r\nContent-Length: " + length
+    response = raw_request(server, head, "子供".encode("utf-8"))
+    status, _, body = response.partition(b"\r\n\r\n")
+    assert status.startswith(b"HTTP/1.1 400")
+    assert "Content-Length" in json.loads(body)["error"]
+
+
+def test_check_over_http(server):
+    body = "子供会".encode("utf-8")
+    head = b"POST /check HTTP/1.1\r\nHost: x\r\nConnection: close\r\nContent-Type: text/plain; charset=utf-8\r\nContent-Length: %d" % len(body)
+    result = json.loads(raw_request(server, head, body).partition(b"\r\n\r\n")[2])
+    assert result["count"] == 1
+    assert result["findings"][0]["start"] == 0
@@ -0,0 +1,67 @@
+import random
+
+import pytest
+
+from wordingcheck.document import TextDocument
+from wordingcheck.findings import Findings
+from wordingcheck.matcher import Rule, RuleMatcher
+from wordingcheck.normalize import DEFAULT_NORMALIZER
+from wordingcheck.stream import StreamScanner, iter_stream
+
+RULES = [
+    Rule("子供", "子ども", allow=("子供服",)),
+    Rule("ガッコウ", "学校"),  # half-width ｶﾞｯｺｳ in the text
+    Rule("致します", "いたします"),
+    Rule("です\nます", "です。ます"),  # spans a line break
+    Rule(r"^[0-9]+月", "（月は漢数字）", regex=True),
+    Rule(r"ＰＴＡ\s+会", "PTA会", regex=True),
+]
+PIECES = ["子供", "子供服", "ｶﾞｯｺｳ", "ｶ", "ﾞ", "致します", "です", "\n", "ます", "12月", "ＰＴＡ", " ", "会", "。", "あ"]
+
+
+def whole_text_hits(matcher, text):
+    doc = TextDocument(text)
+    return [(rule_id, start, end, doc.line_of(start)) for rule_id, start, end in matcher.iter_matches(text)]
+
+
+def random_split(text, rng):
+    cuts = sorted(rng.sample(range(len(text) + 1), min(len(text) + 1, rng.randint(0, 6))))
+    bounds = [0, *cuts, len(text)]
+    return [text[a:b] for a, b in zip(bounds, bounds[1:])]
+
+
+@pytest.mark.parametrize("normalizer", [None, DEFAULT_NORMALIZER])
+def test_stream_equals_whole_text_for_any_split(normalizer):
+    matcher = RuleMatcher(RULES, normalizer)
+    rng = random.Random(3)
+    for _ in range(500):
+        text = "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 15)))
+        chunks = random_split(text, rng)
+        assert [tuple(hit) for hit in iter_stream(chunks, matcher)] == whole_text_hits(matcher, text), chunks
+
+
+def test_split_inside_a_voiced_kana_and_a_typo():
+    matcher = RuleMatcher(RULES, DEFAULT_NORMALIZER)
+    chunks = ["明日はｶ", "ﾞｯｺｳで子", "供服と子", "供"]
+    hits = list(iter_stream(chunks, matcher))
+    text = "".join(chunks)
+    assert [(h.rule_id, text[h.start : h.end]) for h in hits] == [(1, "ｶﾞｯｺｳ"), (0, "子供")]
+    assert hits[-1].start == text.rindex("子供")
+
+
+def test_hits_are_released_before_the_stream_ends():
+    matcher = RuleMatcher([Rule("子供", "子ども")])
+    scanner = StreamScanner(matcher)
+    assert [h.rule_id for h in scanner.feed("子供達の")] == [0]
+    assert scanner.feed("行事") == []
+    assert scanner.close() == []
+
+
+def test_findings_from_stream_match_from_document():
+    matcher = RuleMatcher(RULES, DEFAULT_NORMALIZER)
+    text = "12月の子供会\nｶﾞｯｺｳからです\nます。ＰＴＡ  会で宜しくお願い致します"
+    streamed = Findings.from_stream([text[:7], text[7:20], text[20:]], matcher)
+    whole = Findings.from_document(TextDocument(text), matcher)
+    for name in ("rule_ids", "starts", "ends", "lines"):
+        assert list(getattr(streamed, name)) == list(getattr(whole, name))
+    assert len(whole) == 6
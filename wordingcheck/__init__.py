@@ -0,0 +1,50 @@
+"""
+Headless wording-check engine used by the Streamlit pages.
+"""
+from .cache import LRUCache, cache_stats, get_matcher, load_rule_file, rules_digest
+from .checker import check_document, check_text, load_rules
+from .document import LineView, TextDocument
+from .findings import Findings
+from .fuzzy import FuzzyIndex, fuzzy_index
+from .matcher import ALLOW_COLUMN, CORRECT_COLUMN, RULE_TYPE_COLUMN, TYPO_COLUMN, Rule, RuleMatcher, rules_from_frame
+from .normalize import DEFAULT_NORMALIZER, Normalizer
+from .parsers import SUPPORTED_EXTENSIONS, UnsupportedFormat, extract_text
+from .registry import RuleRegistry, RuleSnapshot, rule_registry
+from .store import RuleStore, default_store
+from .stream import StreamHit, StreamScanner, iter_stream
+
+__all__ = [
+    "ALLOW_COLUMN",
+    "CORRECT_COLUMN",
+    "DEFAULT_NORMALIZER",
+    "RULE_TYPE_COLUMN",
+    "TYPO_COLUMN",
+    "SUPPORTED_EXTENSIONS",
+    "Findings",
+    "FuzzyIndex",
+    "LineView",
+    "LRUCache",
+    "Normalizer",
+    "Rule",
+    "RuleMatcher",
+    "RuleRegistry",
+    "RuleSnapshot",
+    "RuleStore",
+    "StreamHit",
+    "StreamScanner",
+    "TextDocument",
+    "UnsupportedFormat",
+    "cache_stats",
+    "check_document",
+    "check_text",
+    "default_store",
+    "extract_text",
+    "fuzzy_index",
+    "get_matcher",
+    "iter_stream",
+    "load_rule_file",
+    "load_rules",
+    "rules_digest",
+    "rule_registry",
+    "rules_from_frame",
+]
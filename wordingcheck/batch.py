@@ -0,0 +1,129 @@
+"""
+Checking several uploaded documents at once.
+
+A notice usually comes with attachments. Each file is parsed and checked in
+a worker process, like the CLI does for a folder: the compiled matcher is
+handed to every worker once when the pool starts, never per file, so a
+batch takes about as long as its slowest file. Results keep the per-file
+document and findings so the page can group them by file, and one combined
+report covers the whole batch. Workers are spawned rather than forked, since
+the pool is started from a background job thread (see pdf.py).
+"""
+import csv
+import io
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from .document import TextDocument
+from .excel import iter_cells
+from .findings import Findings
+from .matcher import RuleMatcher
+from .parsers import extract_text
+from .regexrules import MatchBudget
+
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+REPORT_FIELDS = ["ファイル", "場所", "誤表記", "正表記", "前後の文", "エラー"]
+
+
+class FileResult(NamedTuple):
+    name: str
+    doc: Optional[TextDocument]  # None for workbooks (findings keep their cells) and failed files
+    findings: Optional[Findings]
+    error: Optional[str]
+    seconds: float
+
+
+def check_bytes(name: str, data: bytes, matcher: RuleMatcher, budget: Optional[MatchBudget] = None) -> Tuple[Optional[TextDocument], Findings]:
+    """Parse and check one document: (document, findings); workbooks are checked cell by cell."""
+    if name.lower().endswith((".xlsx", ".xls")):
+        return None, Findings.from_cells(iter_cells(data, name), matcher, budget)
+    doc = TextDocument(extract_text(name, data), name)
+    return doc, Findings.from_document(doc, matcher, budget)
+
+
+# Set once per worker process by _init_worker
+_worker_matcher: Optional[RuleMatcher] = None
+
+
+def _init_worker(matcher: RuleMatcher) -> None:
+    global _worker_matcher
+    _worker_matcher = matcher
+
+
+def _check_one(name: str, data: bytes, matcher: Optional[RuleMatcher] = None) -> FileResult:
+    t0 = time.perf_counter()
+    try:
+        doc, findings = check_bytes(name, data, matcher or _worker_matcher)
+        return FileResult(name, doc, findings, None, time.perf_counter() - t0)
+    except Exception as e:
+        return FileResult(name, None, None, f"{type(e).__name__}: {e}", time.perf_counter() - t0)
+
+
+def check_many(
+    files: Sequence[Tuple[str, bytes]],
+    matcher: RuleMatcher,
+    workers: Optional[int] = None,
+    progress: Optional[Callable[[int, Optional[int]], None]] = None,
+) -> List[FileResult]:
+    """FileResult per (name, bytes), in input order; a file that fails gets its error, the rest still run.
+
+    `progress(files done, total)` is called as files finish; if it raises
+    (a cancelled job), files not yet started are dropped and the error propagates.
+    """
+    n = len(files)
+    workers = min(workers or MAX_WORKERS, n)
+    if workers <= 1:
+        results = []
+        for name, data in files:
+            results.append(_check_one(name, data, matcher))
+            if progress is not None:
+                progress(len(results), n)
+        return results
+
+    results: List[Optional[FileResult]] = [None] * n
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(matcher,),
+    )
+    try:
+        futures = {pool.submit(_check_one, name, data): i for i, (name, data) in enumerate(files)}
+        for done, fut in enumerate(as_completed(futures), 1):
+            results[futures[fut]] = fut.result()
+            if progress is not None:
+                progress(done, n)
+    finally:
+        # After a cancel, files still queued are dropped rather than checked
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+def report_rows(results: Sequence[FileResult]) -> List[dict]:
+    """One row per hit, grouped by file in upload order; failed files get one row with the error."""
+    rows = []
+    for result in results:
+        if result.error:
+            rows.append({"ファイル": result.name, "場所": "", "誤表記": "", "正表記": "", "前後の文": "", "エラー": result.error})
+            continue
+        findings = result.findings
+        for row in findings.rows(findings.order(), result.doc):
+            rows.append({"ファイル": result.name, **row, "エラー": ""})
+    return rows
+
+
+def report_csv(results: Sequence[FileResult]) -> bytes:
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=REPORT_FIELDS)
+    writer.writeheader()
+    writer.writerows(report_rows(results))
+    # BOM so Excel opens the Japanese text correctly
+    return out.getvalue().encode("utf-8-sig")
+
+
+def report_json(results: Sequence[FileResult]) -> bytes:
+    return json.dumps(report_rows(results), ensure_ascii=False, indent=1).encode("utf-8")
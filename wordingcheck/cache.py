@@ -0,0 +1,214 @@
+"""
+Process-wide caches shared by every Streamlit session.
+
+Streamlit reruns the page script on each widget interaction, so anything
+expensive (compiled matchers, rule files read from disk, parsed uploads) is kept here, keyed
+by content rather than by session.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from .matcher import Rule, RuleMatcher, rules_from_frame
+from .normalize import DEFAULT_NORMALIZER, Normalizer
+
+
+class LRUCache:
+    """Thread-safe LRU mapping with an optional TTL and hit/miss counters."""
+
+    def __init__(self, maxsize: int = 8, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, object]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._building: Dict[Hashable, threading.Lock] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return self._lookup(key, count=False) is not _MISSING
+
+    def _lookup(self, key, count=True):
+        entry = self._data.get(key)
+        if entry is not None and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+            del self._data[key]
+            self.evictions += 1
+            entry = None
+        if entry is None:
+            if count:
+                self.misses += 1
+            return _MISSING
+        # TTL counts from the last use, so files a user is working on stay cached
+        self._data[key] = (time.monotonic(), entry[1])
+        self._data.move_to_end(key)
+        if count:
+            self.hits += 1
+        return entry[1]
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._lookup(key)
+            return default if value is _MISSING else value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_build(self, key, build: Callable[[], object]):
+        """Return the cached value for `key`, building (and storing) it on a miss.
+
+        Concurrent callers asking for the same key wait for a single build;
+        other keys stay readable while it runs.
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                return value
+            key_lock = self._building.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                value = self._lookup(key, count=False)
+            if value is not _MISSING:
+                return value
+            try:
+                value = build()
+                self.put(key, value)
+            finally:
+                with self._lock:
+                    self._building.pop(key, None)
+            return value
+
+    def discard(self, key) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
+
+
+_MISSING = object()
+
+
+def rules_digest(rules: Iterable[Tuple[str, str]]) -> str:
+    """SHA-256 of the rule contents; identical tables share one matcher."""
+    h = hashlib.sha256()
+    for rule in rules:
+        h.update(rule[0].encode("utf-8"))
+        h.update(b"\x1f")
+        h.update(rule[1].encode("utf-8"))
+        # Only regex rows and allow lists add bytes, so digests of plain tables stay as they were
+        if len(rule) > 2 and rule[2]:
+            h.update(b"\x1dre")
+        if len(rule) > 3 and rule[3]:
+            h.update(b"\x1dallow\x1f" + "\x1c".join(rule[3]).encode("utf-8"))
+        h.update(b"\x1e")
+    return h.hexdigest()
+
+
+def matcher_key(rules: Iterable[Tuple[str, str]], normalizer: Optional[Normalizer] = DEFAULT_NORMALIZER) -> str:
+    """Version of the matcher built from `rules`: rule contents plus normalization."""
+    digest = rules_digest(rules)
+    return digest if normalizer is None else f"{digest}:{normalizer.key}"
+
+
+# A few recent rule versions are kept so switching back (e.g. 編集内容破棄) is free
+matcher_cache = LRUCache(maxsize=4)
+
+
+def get_matcher(rules_or_df, normalizer: Optional[Normalizer] = DEFAULT_NORMALIZER) -> RuleMatcher:
+    """Compiled matcher for a rule table (DataFrame or iterable of pairs), cached by content.
+
+    Rules and texts are normalized by `normalizer`; pass None for exact matching.
+    """
+    if hasattr(rules_or_df, "columns"):
+        rules = rules_from_frame(rules_or_df)
+    else:
+        rules = [Rule(*r) for r in rules_or_df]
+    digest = matcher_key(rules, normalizer)
+
+    def build():
+        matcher = RuleMatcher(rules, normalizer)
+        matcher.version = digest
+        return matcher
+
+    return matcher_cache.get_or_build(digest, build)
+
+
+_file_cache = LRUCache(maxsize=8)
+
+
+def load_rule_file(path) -> Optional[object]:
+    """Read a persisted rule pickle once per (mtime, size) instead of on every rerun.
+
+    Returns None when the file does not exist. Callers get a shared frame and
+    must copy it before mutating.
+    """
+    import pandas as pd
+
+    p = Path(path)
+    try:
+        st_ = p.stat()
+    except FileNotFoundError:
+        return None
+    key = (str(p.resolve()), st_.st_mtime_ns, st_.st_size)
+    return _file_cache.get_or_build(key, lambda: pd.read_pickle(p))
+
+
+def content_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+# Parsed uploads: a handful of recent files, dropped after 30 minutes unused
+document_cache = LRUCache(maxsize=16, ttl=30 * 60)
+
+
+def cached_parse(name: str, data: bytes, parse: Callable[..., object], **kwargs):
+    """Run `parse(name, data, **kwargs)` once per file content; reruns with the same bytes reuse it.
+
+    `kwargs` (a progress callback, say) are not part of the cache key.
+    """
+    key = (content_digest(data), Path(name).suffix.lower(), getattr(parse, "__qualname__", repr(parse)))
+    return document_cache.get_or_build(key, lambda: parse(name, data, **kwargs))
+
+
+# Encoded download payloads, keyed by the table version they were made from
+payload_cache = LRUCache(maxsize=16)
+
+
+def csv_payload(version, df) -> bytes:
+    """UTF-8 CSV of `df`, encoded at most once per `version` token."""
+    if version is None:
+        return df.to_csv(index=False).encode("utf-8")
+    return payload_cache.get_or_build(("csv", version), lambda: df.to_csv(index=False).encode("utf-8"))
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    return {
+        "matcher": matcher_cache.stats(),
+        "rule_file": _file_cache.stats(),
+        "document": document_cache.stats(),
+        "payload": payload_cache.stats(),
+    }
@@ -0,0 +1,109 @@
+"""
+誤表記 → 正表記 check without any Streamlit dependency.
+"""
+from itertools import chain
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from .encoding import iter_decode, line_chunks, read_chunks
+from .matcher import Rule, RuleMatcher, rules_from_frame
+from .normalize import DEFAULT_NORMALIZER, Normalizer
+from .parsers import extract_text, iter_csv_text
+from .regexrules import MatchBudget
+from .stream import iter_stream
+from .store import DEFAULT_STORE_PATH, open_store
+
+DEFAULT_RULE_PATH = DEFAULT_STORE_PATH
+STORE_SUFFIXES = (".sqlite3", ".sqlite", ".db")
+
+
+def load_rules(path=DEFAULT_RULE_PATH) -> List[Rule]:
+    """Rule pairs from the rule store, a legacy pickle, or an exported .csv / .xlsx table."""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix in STORE_SUFFIXES:
+        rules = open_store(path).load_rules()
+        if rules is None:
+            raise FileNotFoundError(f"ルールが保存されていません: {path}")
+        return rules
+
+    import pandas as pd
+
+    if suffix == ".csv":
+        df = pd.read_csv(path)
+    elif suffix in (".xlsx", ".xls"):
+        df = pd.read_excel(path)
+    else:
+        df = pd.read_pickle(path)
+    return rules_from_frame(df)
+
+
+def load_matcher(path=DEFAULT_RULE_PATH, normalizer: Optional[Normalizer] = DEFAULT_NORMALIZER) -> RuleMatcher:
+    """Compiled matcher for a rule file; the store hands back its prebuilt one."""
+    path = Path(path)
+    if path.suffix.lower() in STORE_SUFFIXES:
+        matcher = open_store(path).matcher(normalizer=normalizer)
+        if matcher is None:
+            raise FileNotFoundError(f"ルールが保存されていません: {path}")
+        return matcher
+    from .cache import get_matcher
+
+    return get_matcher(load_rules(path), normalizer)
+
+
+def check_text(text: str, matcher: RuleMatcher) -> List[Rule]:
+    """Rules whose 誤表記 occurs in `text`, in table order."""
+    return [matcher.rules[i] for i in matcher.hit_rules(text)]
+
+
+def check_document(name: str, data: bytes, matcher: RuleMatcher) -> List[Rule]:
+    if name.lower().endswith(".pdf"):
+        from .pdf import iter_pdf_chunks
+
+        # Pages streamed in page order, as the page's check_pdf does, so a
+        # 誤表記 across a page break is found; in-process, since the batch
+        # CLI already runs one file per worker
+        hit = {h.rule_id for h in iter_stream(iter_pdf_chunks(data, workers=1), matcher, MatchBudget())}
+        return [matcher.rules[i] for i in sorted(hit)]
+    if name.lower().endswith((".xlsx", ".xls")):
+        from .excel import check_workbook
+
+        # Every sheet, cell by cell, without building a DataFrame
+        return [matcher.rules[i] for i in check_workbook(data, name, matcher)]
+    return check_text(extract_text(name, data), matcher)
+
+
+def iter_file_text(path) -> Optional[Iterator[str]]:
+    """Line-aligned text chunks of a .txt / .csv file, read and decoded incrementally; None for other formats.
+
+    Only a line longer than encoding.CHUNK_SIZE characters is split across chunks.
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix == ".txt":
+        return line_chunks(iter_decode(read_chunks(path)))
+    if suffix == ".csv":
+        return iter_csv_text(path)
+    return None
+
+
+def check_file(path, matcher: RuleMatcher) -> List[Rule]:
+    """check_document for a file on disk; text and CSV files are checked chunk by chunk in bounded memory."""
+    chunks = iter_file_text(path)
+    if chunks is None:
+        return check_document(str(path), Path(path).read_bytes(), matcher)
+    budget = MatchBudget()
+    if matcher.multiline:
+        # A 誤表記 spanning lines can cross a chunk boundary; the stream
+        # scanner carries the matcher state over it
+        hit = {h.rule_id for h in iter_stream(chunks, matcher, budget)}
+    else:
+        hit = set()
+        chunks = iter(chunks)
+        for text in chunks:
+            if not text.endswith("\n"):
+                # An overlong line was cut (or this is the last chunk): the
+                # stream scanner carries matches over the cut from here on
+                hit.update(h.rule_id for h in iter_stream(chain([text], chunks), matcher, budget))
+                break
+            hit.update(matcher.hit_rules(text, budget))
+    return [matcher.rules[i] for i in sorted(hit)]
@@ -0,0 +1,164 @@
+"""
+Command-line entry point: python -m wordingcheck check <dir> [options]
+
+Checks every supported document under a directory tree in a process pool and
+writes one consolidated report (JSON Lines or CSV, one row per hit).
+`python -m wordingcheck serve` starts the local HTTP service (see server).
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from .checker import DEFAULT_RULE_PATH, STORE_SUFFIXES, check_file, load_matcher
+from .matcher import RuleMatcher
+from .normalize import Normalizer
+from .parsers import SUPPORTED_EXTENSIONS
+from .server import DEFAULT_HOST, DEFAULT_PORT
+
+REPORT_FIELDS = ["file", "誤表記", "正表記", "error"]
+
+# Set once per worker process by _init_worker; the matcher is compiled (or loaded
+# prebuilt from the rule store) once in the parent, never per file
+_worker_matcher: Optional[RuleMatcher] = None
+
+
+def _init_worker(matcher: RuleMatcher) -> None:
+    global _worker_matcher
+    _worker_matcher = matcher
+
+
+def _check_path(path: str) -> dict:
+    try:
+        hits = check_file(path, _worker_matcher)
+        return {"file": path, "hits": [[r.typo, r.correct] for r in hits], "error": None}
+    except Exception as e:
+        return {"file": path, "hits": [], "error": f"{type(e).__name__}: {e}"}
+
+
+def iter_documents(root: Path) -> Iterator[Path]:
+    if root.is_file():
+        yield root
+        return
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for fn in sorted(filenames):
+            # Skip Office lock files such as "~$notice.docx"
+            if fn.startswith("~$"):
+                continue
+            if fn.lower().endswith(SUPPORTED_EXTENSIONS):
+                yield Path(dirpath) / fn
+
+
+def report_rows(result: dict, root: Path) -> List[dict]:
+    try:
+        name = str(Path(result["file"]).relative_to(root))
+    except ValueError:
+        name = result["file"]
+    if result["error"]:
+        return [{"file": name, "誤表記": "", "正表記": "", "error": result["error"]}]
+    return [{"file": name, "誤表記": typo, "正表記": corr, "error": ""} for typo, corr in result["hits"]]
+
+
+def write_report(rows, out, fmt: str) -> None:
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        for row in rows:
+            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def cmd_check(args) -> int:
+    root = Path(args.path)
+    folds = {f.strip() for f in args.fold.split(",") if f.strip()}
+    unknown = folds - {"kana", "case"}
+    if unknown:
+        print(f"不明な --fold 指定です: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+    normalizer = None if args.exact else Normalizer(kana="kana" in folds, case="case" in folds)
+    matcher = load_matcher(args.rules, normalizer)
+    paths = [str(p) for p in iter_documents(root)]
+    if not paths:
+        print(f"対象ファイルが見つかりません: {root}", file=sys.stderr)
+        return 1
+
+    t0 = time.perf_counter()
+    rows = []
+    n_errors = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(matcher,)) as pool:
+        for result in pool.map(_check_path, paths, chunksize=max(1, len(paths) // 64)):
+            n_errors += bool(result["error"])
+            rows.extend(report_rows(result, root if root.is_dir() else root.parent))
+
+    if args.output == "-":
+        write_report(rows, sys.stdout, args.format)
+    else:
+        with open(args.output, "w", encoding="utf-8-sig" if args.format == "csv" else "utf-8", newline="") as f:
+            write_report(rows, f, args.format)
+    print(
+        f"{len(paths)} files, {sum(1 for r in rows if not r['error'])} hits, "
+        f"{n_errors} errors in {time.perf_counter() - t0:.2f}s",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def cmd_serve(args) -> int:
+    import logging
+
+    from .registry import RuleRegistry, rule_registry
+    from .server import make_server
+    from .store import DEFAULT_STORE_PATH, open_store
+
+    path = Path(args.rules)
+    if path.suffix.lower() not in STORE_SUFFIXES:
+        print("serve はルールストア (.sqlite3) を指定してください（公開されたルールの更新を自動で反映するため）", file=sys.stderr)
+        return 2
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    same = path.resolve() == DEFAULT_STORE_PATH.resolve()
+    registry = rule_registry() if same else RuleRegistry(open_store(path))
+    server = make_server(registry, args.host, args.port)
+    host, port = server.server_address[:2]
+    snap = registry.current()
+    print(f"http://{host}:{port} で待ち受けています（ルール v{snap.version if snap else '-'}、Ctrl+C で終了）", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m wordingcheck", description="品川学園PTA 文章確認ツール (CLI)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_check = sub.add_parser("check", help="フォルダ内の文書をまとめて確認する")
+    p_check.add_argument("path", help="確認するファイルまたはフォルダ")
+    p_check.add_argument("--rules", default=str(DEFAULT_RULE_PATH), help="ルールストア (.sqlite3) またはルールファイル (.pkl/.csv/.xlsx)")
+    p_check.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    p_check.add_argument("--exact", action="store_true", help="正規化 (NFKC・ダッシュ統一) をせず完全一致で確認する")
+    p_check.add_argument("--fold", default="", help="追加の同一視: kana (カタカナ→ひらがな), case (英字の大小) をカンマ区切りで")
+    p_check.add_argument("-o", "--output", default="-", help="レポート出力先 (既定: 標準出力)")
+    p_check.add_argument("-j", "--workers", type=int, default=None, help="並列プロセス数 (既定: CPU数)")
+    p_check.set_defaults(func=cmd_check)
+
+    p_serve = sub.add_parser("serve", help="ほかのツールから使う確認用 HTTP サーバーを起動する")
+    p_serve.add_argument("--host", default=DEFAULT_HOST, help=f"待ち受けるアドレス (既定: {DEFAULT_HOST} = このPCのみ)")
+    p_serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p_serve.add_argument("--rules", default=str(DEFAULT_RULE_PATH), help="ルールストア (.sqlite3)")
+    p_serve.set_defaults(func=cmd_serve)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,100 @@
+"""
+Compact in-memory document: one immutable text buffer plus a line index.
+
+Replaces the per-session copies the page used to keep (full text, a
+one-row-per-line DataFrame and a preview DataFrame). Line starts live in an
+`array`, so offset -> line/column lookups are a binary search, and line
+views only slice the buffer when they are turned into strings.
+"""
+from array import array
+from bisect import bisect_right
+from typing import Iterator, NamedTuple, Tuple
+
+
+def line_starts(text: str) -> array:
+    """Offsets where each line begins (line 1 starts at 0)."""
+    starts = array("q", [0])
+    find = text.find
+    i = find("\n")
+    while i != -1:
+        starts.append(i + 1)
+        i = find("\n", i + 1)
+    return starts
+
+
+class LineView(NamedTuple):
+    """Line `number` of a document as (start, end) offsets; no text is copied until str()."""
+
+    doc: "TextDocument"
+    number: int
+    start: int
+    end: int
+
+    def __str__(self) -> str:
+        return self.doc.text[self.start : self.end]
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+
+class TextDocument:
+    __slots__ = ("text", "name", "_starts")
+
+    def __init__(self, text: str, name: str = ""):
+        self.text = text
+        self.name = name
+        self._starts = None
+
+    @classmethod
+    def from_frame(cls, df, name: str = "") -> "TextDocument":
+        from .parsers import frame_to_text
+
+        return cls(frame_to_text(df), name)
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def __repr__(self) -> str:
+        return f"TextDocument(name={self.name!r}, chars={len(self.text)}, lines={self.n_lines})"
+
+    @property
+    def line_starts(self) -> array:
+        # Built on first use; a document that is only previewed never pays for it
+        if self._starts is None:
+            self._starts = line_starts(self.text)
+        return self._starts
+
+    @property
+    def n_lines(self) -> int:
+        return len(self.line_starts)
+
+    def line_of(self, offset: int) -> int:
+        """1-based line number containing `offset`."""
+        return bisect_right(self.line_starts, offset)
+
+    def position(self, offset: int) -> Tuple[int, int]:
+        """(line, column), both 1-based, for a character offset."""
+        line = self.line_of(offset)
+        return line, offset - self.line_starts[line - 1] + 1
+
+    def line_span(self, number: int) -> Tuple[int, int]:
+        """(start, end) of 1-based line `number`, excluding its newline."""
+        starts = self.line_starts
+        start = starts[number - 1]
+        end = starts[number] - 1 if number < len(starts) else len(self.text)
+        return start, end
+
+    def line(self, number: int) -> LineView:
+        start, end = self.line_span(number)
+        return LineView(self, number, start, end)
+
+    def lines(self) -> Iterator[LineView]:
+        for number in range(1, self.n_lines + 1):
+            yield self.line(number)
+
+    def snippet(self, start: int, end: int, width: int = 15) -> str:
+        """Text around [start, end) with the span wrapped in 【】 and newlines shown as ⏎."""
+        text = self.text
+        left = text[max(0, start - width) : start].replace("\n", "⏎")
+        right = text[end : end + width].replace("\n", "⏎")
+        return f"{left}【{text[start:end]}】{right}"
@@ -0,0 +1,129 @@
+"""
+Streaming .docx text extraction.
+
+Reads word/document.xml and the header, footer and note parts straight from
+the zip with an incremental XML parser, without building the python-docx
+object model. Unlike `Document(...).paragraphs` it also returns text in
+tables, headers, footers and text boxes, which is where notices tend to put
+dates and contact details.
+"""
+import re
+import zipfile
+from io import BytesIO
+from typing import Iterator, List, NamedTuple
+from xml.etree.ElementTree import iterparse
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_MC = "{http://schemas.openxmlformats.org/markup-compatibility/2006}"
+
+P, R, T, TAB, BR, CR = (_W + t for t in ("p", "r", "t", "tab", "br", "cr"))
+TBL, TR, TC, TXBX = (_W + t for t in ("tbl", "tr", "tc", "txbxContent"))
+# Text boxes are stored twice (DrawingML in mc:Choice, VML in mc:Fallback); read only the first
+FALLBACK = _MC + "Fallback"
+
+_PART_ORDER = [
+    ("document", re.compile(r"^word/document\.xml$")),
+    ("header", re.compile(r"^word/header(\d*)\.xml$")),
+    ("footer", re.compile(r"^word/footer(\d*)\.xml$")),
+    ("footnotes", re.compile(r"^word/footnotes\.xml$")),
+    ("endnotes", re.compile(r"^word/endnotes\.xml$")),
+]
+
+
+class Paragraph(NamedTuple):
+    part: str  # "document", "header1", "footer2", "footnotes", ...
+    location: str  # "body", "table1 R2C3" or "textbox"
+    text: str
+
+
+def _text_parts(names: List[str]) -> List[str]:
+    parts = []
+    for _, pattern in _PART_ORDER:
+        matched = [n for n in names if pattern.match(n)]
+        matched.sort(key=lambda n: (len(n), n))
+        parts.extend(matched)
+    return parts
+
+
+def _part_label(name: str) -> str:
+    return name.rsplit("/", 1)[-1][: -len(".xml")]
+
+
+def iter_part_paragraphs(stream, part: str) -> Iterator[Paragraph]:
+    """Paragraphs of one WordprocessingML part, read incrementally from `stream`."""
+    buffers: List[List[str]] = []  # one per open <w:p>; text-box paragraphs nest inside
+    tables: List[List[int]] = []  # [number, row, col] per open <w:tbl>
+    n_tables = 0
+    in_run = 0
+    in_textbox = 0
+    skip = 0
+
+    for event, elem in iterparse(stream, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            if tag == FALLBACK:
+                skip += 1
+            elif skip:
+                continue
+            elif tag == P:
+                buffers.append([])
+            elif tag == R:
+                in_run += 1
+            elif tag == TBL:
+                n_tables += 1
+                tables.append([n_tables, 0, 0])
+            elif tag == TR and tables:
+                tables[-1][1] += 1
+                tables[-1][2] = 0
+            elif tag == TC and tables:
+                tables[-1][2] += 1
+            elif tag == TXBX:
+                in_textbox += 1
+            continue
+
+        if tag == FALLBACK:
+            skip -= 1
+            elem.clear()
+            continue
+        if skip:
+            continue
+        if tag == T:
+            if buffers:
+                buffers[-1].append(elem.text or "")
+        elif tag == R:
+            in_run -= 1
+        elif in_run and tag == TAB:
+            # <w:tab/> inside a run is a tab character; in <w:tabs> it is a tab stop
+            if buffers:
+                buffers[-1].append("\t")
+        elif in_run and tag in (BR, CR):
+            if buffers:
+                buffers[-1].append("\n")
+        elif tag == P:
+            text = "".join(buffers.pop())
+            if in_textbox:
+                location = "textbox"
+            elif tables:
+                number, row, col = tables[-1]
+                location = f"table{number} R{row}C{col}"
+            else:
+                location = "body"
+            elem.clear()
+            yield Paragraph(part, location, text)
+        elif tag == TBL:
+            tables.pop()
+            elem.clear()
+        elif tag == TXBX:
+            in_textbox -= 1
+
+
+def iter_docx_paragraphs(data: bytes) -> Iterator[Paragraph]:
+    """Every paragraph of a .docx: body (tables inline) first, then headers, footers and notes."""
+    with zipfile.ZipFile(BytesIO(data)) as zf:
+        for name in _text_parts(zf.namelist()):
+            with zf.open(name) as f:
+                yield from iter_part_paragraphs(f, _part_label(name))
+
+
+def docx_stream_text(data: bytes) -> str:
+    return "\n".join(p.text for p in iter_docx_paragraphs(data))
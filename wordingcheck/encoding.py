@@ -0,0 +1,186 @@
+"""
+Encoding detection and incremental decoding for text and CSV inputs.
+
+Windows tools still write Shift_JIS (CP932), so .txt/.csv bytes can't simply
+be decoded as UTF-8. The encoding is picked from a BOM, a charset in the
+Content-Type, or a sample of the first bytes only: ASCII-heavy UTF-16 shows
+up as zero bytes in every other position. Otherwise UTF-8, CP932, EUC-JP
+and BOM-less UTF-16 (LE and BE) each decode the sample and are scored on
+how plausible the result is: kana and common (JIS level 1) kanji score
+high, rarer kanji and half-width katakana low, and control characters,
+characters outside JIS and undecodable sequences count against, so
+kanji-only text is recognized as well as kana-rich text. Strictly valid
+multi-byte UTF-8 gets a bonus. Decoding then runs chunk by chunk, so a
+large file never needs its bytes and its text in memory at once.
+"""
+import codecs
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from typing import FrozenSet, Iterable, Iterator, Optional, Tuple
+
+SAMPLE_SIZE = 64 * 1024
+CHUNK_SIZE = 256 * 1024
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+_CHARSET = re.compile(r"charset=[\"']?([\w.:-]+)", re.I)
+# Candidates scored when the sample is not ASCII-heavy UTF-16; on a tie the
+# earlier one wins
+_CANDIDATES = ("utf-8", "cp932", "euc_jp", "utf-16-le", "utf-16-be")
+UTF8_BONUS = 2
+# Combine with the character before them without being combining marks:
+# half-width voiced sound marks, variation selectors, joiners
+_JOINERS = frozenset("\uff9e\uff9f\u200c\u200d" + "".join(map(chr, range(0xFE00, 0xFE10))))
+
+
+@lru_cache(maxsize=None)
+def _jis_kanji() -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """(level 1, level 2) kanji of JIS X 0208, read off the EUC-JP code table."""
+
+    def rows(first: int, last: int) -> FrozenSet[str]:
+        pairs = (bytes((lead, trail)) for lead in range(first, last + 1) for trail in range(0xA1, 0xFF))
+        return frozenset(ch for ch in (pair.decode("euc_jp", errors="ignore") for pair in pairs) if ch)
+
+    return rows(0xB0, 0xCF), rows(0xD0, 0xF4)
+
+
+def _weight(ch: str) -> int:
+    """How much one decoded character says the decoding is right (negative: wrong)."""
+    if ch == "\ufffd":
+        return -10
+    if " " <= ch < "\x7f" or ch in "\t\n\r" or "\xc0" <= ch < "\u0250":
+        return 1  # ASCII and accented Latin letters
+    level1, level2 = _jis_kanji()
+    if "\u3000" <= ch <= "\u30ff" or ch in level1:
+        return 3
+    if ch in level2 or "\uff01" <= ch <= "\uff5e":
+        return 1
+    if "\uff61" <= ch <= "\uff9f":
+        return 0  # half-width katakana: rare in documents, common in mojibake
+    if ch < " " or ch == "\x7f" or "\ue000" <= ch <= "\uf8ff":
+        return -2  # controls and private use (CP932's user-defined area)
+    try:
+        ch.encode("cp932")
+    except UnicodeEncodeError:
+        return -2  # other scripts, kanji outside JIS
+    return 1
+
+
+def _score(sample: bytes, name: str) -> float:
+    """Mean weight of the characters `name` decodes the sample to."""
+    # final=False: the sample may end in the middle of a character
+    text = codecs.getincrementaldecoder(name)(errors="replace").decode(sample, final=False)
+    score = sum(_weight(ch) * n for ch, n in Counter(text).items()) / max(1, len(text))
+    if name == "utf-8" and "\ufffd" not in text:
+        # Multi-byte UTF-8 that decodes strictly is rarely an accident, and
+        # less so the more sequences there are
+        score += UTF8_BONUS * min(1.0, sum(1 for ch in text if ch > "\x7f") / 8)
+    return score
+
+
+def _utf16_without_bom(sample: bytes) -> Optional[str]:
+    if len(sample) < 4:
+        return None
+    # ASCII-heavy UTF-16 has a zero in one half of (almost) every byte pair
+    even, odd = sample[0::2], sample[1::2]
+    zeros_even, zeros_odd = even.count(0) / len(even), odd.count(0) / len(odd)
+    if zeros_odd > 0.3 and zeros_even < 0.05:
+        return "utf-16-le"
+    if zeros_even > 0.3 and zeros_odd < 0.05:
+        return "utf-16-be"
+    return None
+
+
+def detect_encoding(sample: bytes, content_type: str = "") -> str:
+    """Codec name for bytes starting with `sample` (use the first SAMPLE_SIZE bytes)."""
+    for bom, name in _BOMS:
+        if sample.startswith(bom):
+            return name
+    m = _CHARSET.search(content_type or "")
+    if m:
+        try:
+            return codecs.lookup(m.group(1)).name
+        except LookupError:
+            pass
+    utf16 = _utf16_without_bom(sample)
+    if utf16:
+        return utf16
+    # Whichever candidate reads the sample most plausibly; a sequence a codec
+    # can't decode strictly costs far more than any character earns
+    scores = {name: _score(sample, name) for name in _CANDIDATES}
+    return max(_CANDIDATES, key=scores.__getitem__)
+
+
+def decode_bytes(data: bytes, content_type: str = "") -> Tuple[str, str]:
+    """(text, encoding) for a whole file; only the first SAMPLE_SIZE bytes are inspected."""
+    encoding = detect_encoding(data[:SAMPLE_SIZE], content_type)
+    return data.decode(encoding, errors="replace"), encoding
+
+
+def iter_decode(chunks: Iterable[bytes], encoding: Optional[str] = None, content_type: str = "") -> Iterator[str]:
+    """Decode a byte stream chunk by chunk; the encoding is detected from its first SAMPLE_SIZE bytes."""
+    chunks = iter(chunks)
+    head = b""
+    if encoding is None:
+        parts, size = [], 0
+        for chunk in chunks:
+            parts.append(chunk)
+            size += len(chunk)
+            if size >= SAMPLE_SIZE:
+                break
+        head = b"".join(parts)
+        encoding = detect_encoding(head[:SAMPLE_SIZE], content_type)
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    if head:
+        yield decoder.decode(head)
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def read_chunks(path, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _safe_cut(text: str, limit: int) -> int:
+    """An offset at or before `limit` that doesn't separate a character from the marks combining with it."""
+    cut = limit
+    while cut > 0 and (unicodedata.combining(text[cut]) or text[cut] in _JOINERS):
+        cut -= 1
+    return cut or limit
+
+
+def line_chunks(texts: Iterable[str], max_chars: int = CHUNK_SIZE) -> Iterator[str]:
+    """Re-cut text chunks so each one ends at a line break (the last may not).
+
+    A line longer than `max_chars` is cut anyway, at a character boundary,
+    so the carried text stays bounded.
+    """
+    carry = ""
+    for text in texts:
+        cut = text.rfind("\n")
+        if cut == -1:
+            carry += text
+        else:
+            yield carry + text[: cut + 1]
+            carry = text[cut + 1 :]
+        while len(carry) > max_chars:
+            cut = _safe_cut(carry, max_chars)
+            yield carry[:cut]
+            carry = carry[cut:]
+    if carry:
+        yield carry
@@ -0,0 +1,137 @@
+"""
+Streaming Excel ingestion.
+
+Cells of every sheet are read straight from the workbook (openpyxl read-only
+mode for .xlsx, xlrd on-demand sheets for .xls) and checked one by one, so no
+DataFrame is built and blank cells never turn into "nan". Findings carry a
+"sheet!A1" reference.
+"""
+from collections import OrderedDict
+from io import BytesIO
+from typing import Dict, Iterator, List, NamedTuple
+
+from .matcher import RuleMatcher
+
+
+class Cell(NamedTuple):
+    sheet: str
+    row: int  # 1-based, as shown in Excel
+    col: int
+    text: str
+
+    @property
+    def coord(self) -> str:
+        return f"{column_letter(self.col)}{self.row}"
+
+    @property
+    def ref(self) -> str:
+        return f"{self.sheet}!{self.coord}"
+
+
+def column_letter(col: int) -> str:
+    """1 -> "A", 27 -> "AA"."""
+    letters = ""
+    while col:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def _cell_text(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _iter_xlsx(data: bytes) -> Iterator[Cell]:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(BytesIO(data), read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            for row in ws.iter_rows():
+                for cell in row:
+                    value = cell.value
+                    if value is None or value == "":
+                        continue
+                    yield Cell(ws.title, cell.row, cell.column, _cell_text(value))
+    finally:
+        wb.close()
+
+
+def _iter_xls(data: bytes) -> Iterator[Cell]:
+    import xlrd
+
+    book = xlrd.open_workbook(file_contents=data, on_demand=True)
+    try:
+        for idx in range(book.nsheets):
+            sh = book.sheet_by_index(idx)
+            for r in range(sh.nrows):
+                for c, value in enumerate(sh.row_values(r)):
+                    if value == "" or value is None:
+                        continue
+                    yield Cell(sh.name, r + 1, c + 1, _cell_text(value))
+            book.unload_sheet(idx)
+    finally:
+        book.release_resources()
+
+
+def iter_cells(data: bytes, name: str) -> Iterator[Cell]:
+    """Non-empty cells of every sheet, sheet by sheet, row by row."""
+    if name.lower().endswith(".xls"):
+        return _iter_xls(data)
+    return _iter_xlsx(data)
+
+
+def check_workbook(data: bytes, name: str, matcher: RuleMatcher) -> "OrderedDict[int, List[str]]":
+    """Map rule id -> cell references where its 誤表記 occurs, in table order."""
+    refs: Dict[int, List[str]] = {}
+    for cell in iter_cells(data, name):
+        for rule_id in matcher.hit_rules(cell.text):
+            refs.setdefault(rule_id, []).append(cell.ref)
+    return OrderedDict(sorted(refs.items()))
+
+
+def workbook_text(data: bytes, name: str) -> str:
+    """All cell text, one line per cell (for callers that need plain text)."""
+    return "\n".join(cell.text for cell in iter_cells(data, name))
+
+
+def preview_rows(data: bytes, name: str, n_rows: int = 6) -> List[List[str]]:
+    """First rows of the first sheet (header row included) for the upload preview."""
+    first_sheet = None
+    rows: "OrderedDict[int, Dict[int, str]]" = OrderedDict()
+    for cell in iter_cells(data, name):
+        if first_sheet is None:
+            first_sheet = cell.sheet
+        if cell.sheet != first_sheet or (cell.row not in rows and len(rows) >= n_rows):
+            break
+        rows.setdefault(cell.row, {})[cell.col] = cell.text
+    if not rows:
+        return []
+    width = max(max(r) for r in rows.values())
+    return [[r.get(c, "") for c in range(1, width + 1)] for r in rows.values()]
+
+
+def sheet_names(data: bytes, name: str) -> List[str]:
+    if name.lower().endswith(".xls"):
+        import xlrd
+
+        book = xlrd.open_workbook(file_contents=data, on_demand=True)
+        try:
+            return book.sheet_names()
+        finally:
+            book.release_resources()
+    from openpyxl import load_workbook
+
+    wb = load_workbook(BytesIO(data), read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+
+def format_refs(refs: List[str], limit: int = 10) -> str:
+    """"Sheet1!B3, Sheet1!C7 ほか12件" style summary of cell references."""
+    shown = ", ".join(refs[:limit])
+    return shown if len(refs) <= limit else f"{shown} ほか{len(refs) - limit}件"
@@ -0,0 +1,179 @@
+"""
+URL ingestion for the "2.ファイル(Link)" mode.
+
+A resource is downloaded once over a pooled, streaming requests.Session and
+kept in a small on-disk cache. Later fetches of the same URL send
+If-None-Match / If-Modified-Since, so an unchanged file costs one 304.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from .parsers import sniff_format
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[1] / "data" / "url_cache"
+DEFAULT_TIMEOUT = 15
+MAX_BYTES = 200 * 1024 * 1024
+MAX_CACHE_ENTRIES = 64
+CHUNK_SIZE = 64 * 1024
+
+
+class FetchError(IOError):
+    pass
+
+
+class FetchResult(NamedTuple):
+    url: str
+    content: bytes
+    content_type: str
+    format: str
+    from_cache: bool
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Process-wide Session so connections (and TLS handshakes) are reused."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=1)
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _session = s
+        return _session
+
+
+class UrlCache:
+    """Response bodies plus ETag/Last-Modified, one pair of files per URL."""
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_entries: int = MAX_CACHE_ENTRIES):
+        self.root = Path(root)
+        self.max_entries = max_entries
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.root / f"{key}.body", self.root / f"{key}.json"
+
+    def load(self, url: str):
+        body, meta = self._paths(url)
+        try:
+            info = json.loads(meta.read_text(encoding="utf-8"))
+            if body.stat().st_size != info.get("size"):
+                return None
+            return info
+        except (OSError, ValueError):
+            return None
+
+    def read_body(self, url: str) -> bytes:
+        body, meta = self._paths(url)
+        os.utime(meta)  # mark as recently used for pruning
+        return body.read_bytes()
+
+    def store(self, url: str, chunks, headers, max_bytes: int = MAX_BYTES) -> bytes:
+        """Stream `chunks` into the cache atomically and return the full body."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        body, meta = self._paths(url)
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".part")
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in limit_size(chunks, max_bytes):
+                    size += len(chunk)
+                    f.write(chunk)
+            os.replace(tmp, body)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        info = {
+            "url": url,
+            "size": size,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "content_type": headers.get("Content-Type", ""),
+        }
+        tmp_meta = meta.with_suffix(".json.part")
+        tmp_meta.write_text(json.dumps(info), encoding="utf-8")
+        os.replace(tmp_meta, meta)
+        self.prune()
+        return body.read_bytes()
+
+    def prune(self) -> None:
+        metas = sorted(self.root.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        for meta in metas[: max(0, len(metas) - self.max_entries)]:
+            for p in (meta, meta.with_suffix(".body")):
+                try:
+                    p.unlink()
+                except OSError:
+                    pass
+
+
+def _too_large(max_bytes: int) -> FetchError:
+    return FetchError(f"ファイルが大きすぎます (> {max_bytes // (1024 * 1024)} MB)")
+
+
+def limit_size(chunks: Iterable[bytes], max_bytes: int = MAX_BYTES) -> Iterator[bytes]:
+    """Pass `chunks` through, raising FetchError as soon as they add up to more than `max_bytes`."""
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+        if size > max_bytes:
+            raise _too_large(max_bytes)
+        yield chunk
+
+
+def fetch(
+    url: str,
+    cache: Optional[UrlCache] = None,
+    session=None,
+    timeout: float = DEFAULT_TIMEOUT,
+    max_bytes: int = MAX_BYTES,
+) -> FetchResult:
+    """Download `url` once (or revalidate the cached copy) and sniff its format.
+
+    A body over `max_bytes` raises FetchError: at once if Content-Length
+    says so, otherwise as soon as that much has been read.
+    """
+    cache = cache if cache is not None else UrlCache()
+    session = session if session is not None else get_session()
+
+    cached = cache.load(url)
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    with session.get(url, headers=headers, timeout=timeout, stream=True) as resp:
+        if resp.status_code == 304 and cached:
+            content = cache.read_body(url)
+            content_type = cached.get("content_type", "")
+            from_cache = True
+        else:
+            resp.raise_for_status()
+            content_type = resp.headers.get("Content-Type", "")
+            length = resp.headers.get("Content-Length", "")
+            if length.isdigit() and int(length) > max_bytes:
+                raise _too_large(max_bytes)
+            if resp.headers.get("ETag") or resp.headers.get("Last-Modified"):
+                content = cache.store(url, resp.iter_content(CHUNK_SIZE), resp.headers, max_bytes)
+            else:
+                # Nothing to revalidate against, so don't keep a copy
+                content = b"".join(limit_size(resp.iter_content(CHUNK_SIZE), max_bytes))
+            from_cache = False
+
+    return FetchResult(url, content, content_type, sniff_format(content, content_type, url), from_cache)
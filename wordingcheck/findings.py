@@ -0,0 +1,199 @@
+"""
+Position-aware check results.
+
+Findings are stored column-wise in `array` buffers (rule id, start, end,
+line), a few bytes per hit, instead of formatted strings. Snippets and
+exports are produced on demand from the source text, so only the rows on
+screen are ever formatted.
+"""
+import csv
+import io
+import json
+from array import array
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .document import TextDocument
+from .matcher import Rule, RuleMatcher
+from .regexrules import MatchBudget
+from .stream import StreamScanner
+
+SORT_KEYS = ("position", "rule", "count")
+# How often checks with a progress callback report (characters / cells)
+PROGRESS_CHARS = 256 * 1024
+PROGRESS_CELLS = 1000
+
+
+class Findings:
+    """Every hit of a check: rule_ids[i] matched text[starts[i]:ends[i]] on line lines[i].
+
+    For workbook checks each non-empty cell counts as one "line"; the cell's
+    reference and text are kept only for cells that have hits. `incomplete`
+    is set when the regex rules ran out of their time budget, so later text
+    was not checked against them.
+    """
+
+    def __init__(self, rules: Sequence[Rule]):
+        self.rules = list(rules)
+        self.incomplete = False
+        self.rule_ids = array("i")
+        self.starts = array("q")
+        self.ends = array("q")
+        self.lines = array("i")
+        self._cells: Dict[int, Tuple[str, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.rule_ids)
+
+    def append(self, rule_id: int, start: int, end: int, line: int) -> None:
+        self.rule_ids.append(rule_id)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lines.append(line)
+
+    @classmethod
+    def from_document(
+        cls,
+        doc: TextDocument,
+        matcher: RuleMatcher,
+        budget: Optional[MatchBudget] = None,
+        progress: Optional[Callable[[int, Optional[int]], None]] = None,
+    ) -> "Findings":
+        if progress is not None:
+            # Scanned in slices so progress (characters) can be reported
+            n = len(doc.text)
+            slices = (doc.text[i : i + PROGRESS_CHARS] for i in range(0, n, PROGRESS_CHARS))
+            return cls.from_stream(slices, matcher, budget, lambda done, _: progress(done, n))
+        found = cls(matcher.rules)
+        budget = budget or MatchBudget()
+        line_of = doc.line_of
+        for rule_id, start, end in matcher.iter_matches(doc.text, budget):
+            found.append(rule_id, start, end, line_of(start))
+        found.incomplete = budget.exceeded
+        return found
+
+    @classmethod
+    def from_stream(
+        cls,
+        chunks: Iterable[str],
+        matcher: RuleMatcher,
+        budget: Optional[MatchBudget] = None,
+        progress: Optional[Callable[[int, Optional[int]], None]] = None,
+    ) -> "Findings":
+        """Findings for text that arrives in chunks; offsets are into the chunks joined together."""
+        found = cls(matcher.rules)
+        scanner = StreamScanner(matcher, budget)
+        for chunk in chunks:
+            for hit in scanner.feed(chunk):
+                found.append(*hit)
+            if progress is not None:
+                progress(scanner.chars, None)
+        for hit in scanner.close():
+            found.append(*hit)
+        found.incomplete = scanner.incomplete
+        return found
+
+    @classmethod
+    def from_text(cls, text: str, matcher: RuleMatcher) -> "Findings":
+        return cls.from_document(TextDocument(text), matcher)
+
+    @classmethod
+    def from_cells(
+        cls,
+        cells,
+        matcher: RuleMatcher,
+        budget: Optional[MatchBudget] = None,
+        progress: Optional[Callable[[int, Optional[int]], None]] = None,
+    ) -> "Findings":
+        """Findings for an iterable of excel.Cell; offsets are within each cell."""
+        found = cls(matcher.rules)
+        # One budget for the whole workbook, not one per cell
+        budget = budget or MatchBudget()
+        for n, cell in enumerate(cells, 1):
+            hit = False
+            for rule_id, start, end in matcher.iter_matches(cell.text, budget):
+                found.append(rule_id, start, end, n)
+                hit = True
+            if hit:
+                found._cells[n] = (cell.ref, cell.text)
+            if progress is not None and n % PROGRESS_CELLS == 0:
+                progress(n, None)
+        found.incomplete = budget.exceeded
+        return found
+
+    @property
+    def per_cell(self) -> bool:
+        """True for workbook findings, whose offsets are relative to single cells."""
+        return bool(self._cells)
+
+    def rule_counts(self) -> Counter:
+        return Counter(self.rule_ids)
+
+    def summary_lines(self) -> List[str]:
+        """"誤表記 → 正表記 (n件)" per hit rule, in rule-table order."""
+        counts = self.rule_counts()
+        return [
+            f"{self.rules[i].typo} → {self.rules[i].correct}（{counts[i]}件）"
+            for i in sorted(counts)
+        ]
+
+    def order(self, key: str = "position", descending: bool = False) -> List[int]:
+        """Finding indices sorted by position, rule (table order) or rule hit count."""
+        n = len(self)
+        if key == "position":
+            idx = list(range(n))
+            idx.sort(key=lambda i: (self.lines[i], self.starts[i]), reverse=descending)
+        elif key == "rule":
+            idx = sorted(range(n), key=lambda i: (self.rule_ids[i], self.lines[i], self.starts[i]))
+            if descending:
+                idx.reverse()
+        elif key == "count":
+            counts = self.rule_counts()
+            sign = -1 if descending else 1
+            idx = sorted(range(n), key=lambda i: (sign * counts[self.rule_ids[i]], self.rule_ids[i], self.starts[i]))
+        else:
+            raise ValueError(f"unknown sort key: {key!r}")
+        return idx
+
+    def location(self, i: int) -> str:
+        cell = self._cells.get(self.lines[i])
+        return cell[0] if cell else f"{self.lines[i]}行目"
+
+    def context(self, i: int, doc: Optional[TextDocument] = None, width: int = 15) -> str:
+        """Snippet around finding i, with the hit wrapped in 【】."""
+        cell = self._cells.get(self.lines[i])
+        if cell:
+            doc = TextDocument(cell[1])
+        elif doc is None:
+            return ""
+        return doc.snippet(self.starts[i], self.ends[i], width)
+
+    def rows(self, indices: Sequence[int], doc: Optional[TextDocument] = None) -> List[dict]:
+        rows = []
+        for i in indices:
+            rule = self.rules[self.rule_ids[i]]
+            rows.append(
+                {
+                    "場所": self.location(i),
+                    "誤表記": rule.typo,
+                    "正表記": rule.correct,
+                    "前後の文": self.context(i, doc),
+                }
+            )
+        return rows
+
+    def page(self, order: Sequence[int], page: int, page_size: int, doc: Optional[TextDocument] = None) -> List[dict]:
+        """Rows for one page (1-based); snippets are built only for these rows."""
+        lo = (page - 1) * page_size
+        return self.rows(order[lo : lo + page_size], doc)
+
+    def to_csv(self, doc: Optional[TextDocument] = None) -> bytes:
+        out = io.StringIO()
+        writer = csv.DictWriter(out, fieldnames=["場所", "誤表記", "正表記", "前後の文"])
+        writer.writeheader()
+        writer.writerows(self.rows(self.order(), doc))
+        # BOM so Excel opens the Japanese text correctly
+        return out.getvalue().encode("utf-8-sig")
+
+    def to_json(self, doc: Optional[TextDocument] = None) -> bytes:
+        return json.dumps(self.rows(self.order(), doc), ensure_ascii=False, indent=1).encode("utf-8")
@@ -0,0 +1,177 @@
+"""
+Near-miss detection against the 正表記 vocabulary.
+
+Rules only catch the 誤表記 someone listed. The fuzzy check indexes the
+correct forms themselves and flags text within edit distance 1 (terms of 4+
+characters) or 2 (8+ characters) of one: a wrong kanji, a dropped or doubled
+kana. Candidates come from a bigram index (terms are short, so bigrams keep
+enough of them after an edit) with votes per alignment diagonal, and only
+those are verified with a bounded edit distance. The first and last
+character must match, since a different ending is usually conjugation or a
+particle rather than a typo, and spans overlapping an exact occurrence of a
+known term are not reported. The index is built once per rule version.
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+from .cache import LRUCache
+from .matcher import Rule, RuleMatcher, correct_forms
+
+MIN_TERM_LENGTH = 4
+# Terms this long may be two edits away
+LONG_TERM_LENGTH = 8
+MAX_TERM_LENGTH = 20
+
+
+class FuzzyHit(NamedTuple):
+    rule_id: int  # first rule whose 正表記 is `term`
+    term: str
+    start: int
+    end: int
+    distance: int
+
+
+def correct_terms(correct: str) -> List[str]:
+    """Correct forms of a 正表記 cell (matcher.correct_forms) long enough to index."""
+    return [
+        form
+        for form in correct_forms(correct)
+        if MIN_TERM_LENGTH <= len(form) <= MAX_TERM_LENGTH and not any(c.isspace() for c in form)
+    ]
+
+
+def max_distance(term: str, limit: int = 2) -> int:
+    if len(term) < MIN_TERM_LENGTH:
+        return 0
+    return min(limit, 2 if len(term) >= LONG_TERM_LENGTH else 1)
+
+
+def _distances(term: str, text: str, start: int, stop: int, k: int) -> List[int]:
+    """Edit distance between `term` and text[start:b] for every b in (start, stop]."""
+    # One DP over the text window; the last row holds the distance of every prefix
+    prev = list(range(len(term) + 1))
+    out = []
+    for j in range(start, stop):
+        ch = text[j]
+        cur = [prev[0] + 1]
+        for i, tc in enumerate(term, 1):
+            cur.append(min(prev[i] + 1, cur[i - 1] + 1, prev[i - 1] + (tc != ch)))
+        out.append(cur[-1])
+        prev = cur
+        if min(cur) > k:
+            break
+    return out
+
+
+class FuzzyIndex:
+    """Bigram index over the correct forms of a rule table."""
+
+    def __init__(self, rules: Sequence[Rule], normalizer=None, limit: int = 2):
+        self.normalizer = normalizer
+        fold = normalizer.fold if normalizer is not None else str
+        self.terms: List[str] = []
+        self.rule_ids: List[int] = []
+        self._k: List[int] = []
+        seen: Dict[str, int] = {}
+        for rule_id, rule in enumerate(rules):
+            for term in correct_terms(rule.correct):
+                folded = fold(term)
+                k = max_distance(folded, limit)
+                if k == 0 or folded in seen:
+                    continue
+                seen[folded] = len(self.terms)
+                self.terms.append(folded)
+                self.rule_ids.append(rule_id)
+                self._k.append(k)
+        self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for tid, term in enumerate(self.terms):
+            for off in range(len(term) - 1):
+                self._postings[term[off : off + 2]].append((tid, off))
+        # Exact occurrences of known words (terms, 誤表記, allowed contexts) are
+        # never near-misses; typos are reported by the rules themselves
+        known = [Rule(t, t) for t in self.terms]
+        known.extend(Rule(fold(r.typo), "") for r in rules if r.typo and not r.regex)
+        known.extend(Rule(fold(c), "") for r in rules for c in r.allow)
+        self._known = RuleMatcher(known)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def scan(self, text: str, exclude: Iterable[Tuple[int, int]] = ()) -> List[FuzzyHit]:
+        """Near-misses in `text`, in text order; spans overlapping `exclude` are skipped."""
+        if not self.terms:
+            return []
+        normalized = self.normalizer.normalize(text) if self.normalizer is not None else None
+        ntext = normalized.text if normalized is not None else text
+        # Hits overlapping a known word are dropped, so candidates starting
+        # inside one (most of them, in clean text) are not even verified
+        known = _coverage(len(ntext), ((s, e) for _, s, e in self._known.iter_matches(ntext)))
+        hits = []
+        start = 0
+        while start < len(ntext):
+            end = ntext.find("\n", start)
+            end = len(ntext) if end == -1 else end
+            if end - start >= MIN_TERM_LENGTH - 1:
+                hits.extend(self._scan_line(ntext, start, end, known))
+            start = end + 1
+        hits = [h for h in hits if not any(known[h.start : h.end])]
+        if not hits:
+            return []
+        if normalized is not None and not normalized.identity:
+            hits = [h._replace(start=s, end=e) for h in hits for s, e in [normalized.span(h.start, h.end)]]
+        excluded = _coverage(len(text), exclude)
+        return [h for h in hits if not any(excluded[h.start : h.end])]
+
+    def _scan_line(self, text: str, lo: int, hi: int, known: bytearray) -> List[FuzzyHit]:
+        votes: Dict[Tuple[int, int], int] = defaultdict(int)
+        postings = self._postings
+        for i in range(lo, hi - 1):
+            for tid, off in postings.get(text[i : i + 2], ()):
+                votes[tid, i - off] += 1
+        # Spans of the same term that overlap keep only the closest one
+        best: Dict[int, List[FuzzyHit]] = defaultdict(list)
+        tried = set()
+        for (tid, diag), _ in votes.items():
+            term, k = self.terms[tid], self._k[tid]
+            need = max(1, len(term) - 1 - 2 * k)
+            if sum(votes.get((tid, d), 0) for d in range(diag - k, diag + k + 1)) < need:
+                continue
+            for a in range(max(lo, diag - k), min(hi, diag + k + 1)):
+                if (tid, a) in tried or text[a] != term[0] or known[a]:
+                    continue
+                tried.add((tid, a))
+                stop = min(hi, a + len(term) + k)
+                found = None
+                for n, dist in enumerate(_distances(term, text, a, stop, k), 1):
+                    b = a + n
+                    if 0 < dist <= k and text[b - 1] == term[-1] and (found is None or dist < found.distance):
+                        found = FuzzyHit(self.rule_ids[tid], term, a, b, dist)
+                if found is not None:
+                    _keep_best(best[tid], found)
+        return sorted((h for hs in best.values() for h in hs), key=lambda h: (h.start, h.end))
+
+
+def _keep_best(kept: List[FuzzyHit], hit: FuzzyHit) -> None:
+    for i, other in enumerate(kept):
+        if other.start < hit.end and hit.start < other.end:
+            if (hit.distance, hit.start) < (other.distance, other.start):
+                kept[i] = hit
+            return
+    kept.append(hit)
+
+
+def _coverage(n: int, spans: Iterable[Tuple[int, int]]) -> bytearray:
+    covered = bytearray(n)
+    for s, e in spans:
+        covered[s:e] = b"\x01" * (e - s)
+    return covered
+
+
+# One index per rule version (and normalizer), like the compiled matchers
+fuzzy_cache = LRUCache(maxsize=4)
+
+
+def fuzzy_index(matcher: RuleMatcher, limit: int = 2) -> FuzzyIndex:
+    """The fuzzy index for the rules of `matcher`, built once per rule version."""
+    key = (matcher.version or id(matcher), limit)
+    return fuzzy_cache.get_or_build(key, lambda: FuzzyIndex(matcher.rules, matcher.normalizer, limit))
@@ -0,0 +1,100 @@
+"""
+Incremental re-checking of an edited draft.
+
+Hits are cached per paragraph (one line of text), keyed by a hash of the
+paragraph and the rule-set version. A re-check hashes the new text's
+paragraphs, rescans only those not seen in the previous run and stitches
+the cached hits back at their new offsets, so the cost follows the size of
+the edit rather than the size of the document.
+"""
+import hashlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .document import TextDocument
+from .findings import Findings
+from .matcher import RuleMatcher
+from .regexrules import MatchBudget
+
+Hit = Tuple[int, int, int]  # rule_id, start, end relative to the paragraph
+PROGRESS_LINES = 500
+
+
+def paragraph_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class IncrementalChecker:
+    """Keeps the previous run's per-paragraph hits for one draft (one session)."""
+
+    def __init__(self):
+        self.version: Optional[str] = None
+        self._hits: Dict[bytes, List[Hit]] = {}
+        self.scanned = 0
+        self.reused = 0
+
+    def copy(self) -> "IncrementalChecker":
+        """A checker that starts from this one's cached paragraphs; checking with it leaves this one untouched."""
+        other = IncrementalChecker()
+        # check() replaces the dict rather than changing it, so sharing it is safe
+        other.version, other._hits = self.version, self._hits
+        other.scanned, other.reused = self.scanned, self.reused
+        return other
+
+    def check(
+        self,
+        doc: TextDocument,
+        matcher: RuleMatcher,
+        budget: Optional[MatchBudget] = None,
+        progress: Optional[Callable[[int, Optional[int]], None]] = None,
+    ) -> Findings:
+        """Findings for `doc`; `progress(paragraphs done, total)` is called every PROGRESS_LINES paragraphs."""
+        budget = budget or MatchBudget()
+        if matcher.multiline:
+            # A 誤表記 spanning lines can't be checked paragraph by paragraph
+            self._hits = {}
+            self.version = None
+            self.scanned, self.reused = doc.n_lines, 0
+            by_chars = None
+            if progress is not None:
+                # The whole-text scan counts characters; report the paragraphs they cover
+                by_chars = lambda done, _: progress(doc.line_of(done) - 1, doc.n_lines)
+            return Findings.from_document(doc, matcher, budget, by_chars)
+
+        version = matcher.version or id(matcher)
+        previous = self._hits if version == self.version else {}
+        current: Dict[bytes, List[Hit]] = {}
+        found = Findings(matcher.rules)
+        scanned = reused = 0
+        text = doc.text
+        n_lines = doc.n_lines
+        for line in doc.lines():
+            if progress is not None and line.number % PROGRESS_LINES == 0:
+                progress(line.number, n_lines)
+            paragraph = text[line.start : line.end]
+            if not paragraph:
+                continue
+            key = paragraph_key(paragraph)
+            hits = current.get(key)
+            if hits is None:
+                hits = previous.get(key)
+                if hits is None:
+                    hits = list(matcher.iter_matches(paragraph, budget))
+                    scanned += 1
+                    # Once the budget is spent regex rules are skipped, so
+                    # those paragraphs are not cached
+                    if not budget.exceeded:
+                        current[key] = hits
+                else:
+                    reused += 1
+                    current[key] = hits
+            else:
+                reused += 1
+            for rule_id, start, end in hits:
+                found.append(rule_id, line.start + start, line.start + end, line.number)
+
+        # Only paragraphs of the latest text are kept, so memory follows the draft
+        self._hits = current
+        self.version = version
+        self.scanned, self.reused = scanned, reused
+        found.incomplete = budget.exceeded
+        return found
@@ -0,0 +1,212 @@
+"""
+Background jobs for long parses and checks.
+
+A Streamlit script run that parses a large PDF or checks a big workbook
+blocks the page, and every extra click queues another full run. Jobs run in
+a small process-wide thread pool instead; the page keeps the Job object in
+its session and polls it. Work reports progress through the same
+`progress(done, total)` callbacks the engine already takes, and that
+callback is also where a cancelled job stops (it raises JobCancelled).
+Submitting a key that is already in flight joins the running job, so
+double clicks and identical requests from other sessions share one run.
+Each submit returns its own JobHandle: cancelling a handle only withdraws
+that subscriber, and the job itself is cancelled once the last one leaves.
+
+Threads rather than processes: results (documents, findings) stay in this
+process without pickling, PDF pages are already extracted in a process
+pool, and the scan loop gives up the GIL often enough for the page to stay
+responsive.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = 2
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's work once cancel() was called."""
+
+
+class Job:
+    """One unit of background work and what the page needs to show about it."""
+
+    def __init__(self, key: Hashable, label: str = ""):
+        self.key = key
+        self.label = label
+        self.status = QUEUED
+        self.done = 0
+        self.total: Optional[int] = None
+        self.unit = ""
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.submitted = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.subscribers = 0
+        self._cancel = threading.Event()
+        self._finished = threading.Event()
+
+    def __repr__(self) -> str:
+        return f"Job({self.label or self.key!r}, {self.status}, {self.done}/{self.total})"
+
+    @property
+    def finished(self) -> bool:
+        return self._finished.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        """True once cancellation was requested (the work may still be winding down)."""
+        return self._cancel.is_set()
+
+    @property
+    def fraction(self) -> Optional[float]:
+        """Progress in [0, 1], or None while the total is unknown."""
+        if not self.total:
+            return None
+        return min(1.0, self.done / self.total)
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.submitted
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    def report(self, done: int, total: Optional[int] = None, unit: Optional[str] = None) -> None:
+        """Record progress; raises JobCancelled if the job was cancelled."""
+        if self._cancel.is_set():
+            raise JobCancelled(self.key)
+        self.done = done
+        self.total = total
+        if unit is not None:
+            self.unit = unit
+
+    def progress(self, unit: str) -> Callable[[int, Optional[int]], None]:
+        """A `progress(done, total)` callback for the engine, counting in `unit`."""
+        return lambda done, total=None: self.report(done, total, unit)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._finished.wait(timeout)
+
+    def _finish(self, status: str) -> None:
+        self.status = status
+        self.finished_at = time.monotonic()
+        self._finished.set()
+
+
+class JobHandle:
+    """One subscriber's view of a shared Job.
+
+    Reads through to the job, except that a handle whose subscriber has
+    withdrawn reads as cancelled (and finished) at once, whatever the shared
+    run goes on to do for the others.
+    """
+
+    def __init__(self, job: Job, runner: "JobRunner"):
+        self.job = job
+        self._runner = runner
+        self._withdrawn = False
+
+    def __getattr__(self, name):
+        return getattr(self.job, name)
+
+    def __repr__(self) -> str:
+        return f"JobHandle({self.job!r}{', withdrawn' if self._withdrawn else ''})"
+
+    @property
+    def cancelled(self) -> bool:
+        return self._withdrawn or self.job.cancelled
+
+    @property
+    def finished(self) -> bool:
+        return self._withdrawn or self.job.finished
+
+    @property
+    def status(self) -> str:
+        return CANCELLED if self._withdrawn else self.job.status
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._withdrawn or self.job.wait(timeout)
+
+    def cancel(self) -> None:
+        """Withdraw this subscriber; the job is cancelled when none are left."""
+        self._runner._release(self)
+
+
+class JobRunner:
+    """Bounded thread pool that runs each in-flight key at most once."""
+
+    def __init__(self, max_workers: int = MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="wordingcheck-job")
+        self._jobs: Dict[Hashable, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: Hashable, fn: Callable, *args, label: str = "", **kwargs) -> JobHandle:
+        """Run `fn(job, *args, **kwargs)` in the background, or join the job already running for `key`."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not job.finished and not job.cancelled:
+                job.subscribers += 1
+                return JobHandle(job, self)
+            job = Job(key, label)
+            job.subscribers = 1
+            self._jobs[key] = job
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return JobHandle(job, self)
+
+    def get(self, key: Hashable) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(key)
+
+    def in_flight(self) -> List[Job]:
+        with self._lock:
+            return [job for job in self._jobs.values() if not job.finished]
+
+    def _release(self, handle: JobHandle) -> None:
+        with self._lock:
+            if handle._withdrawn:
+                return
+            handle._withdrawn = True
+            job = handle.job
+            job.subscribers -= 1
+            if job.subscribers == 0 and not job.finished:
+                job.cancel()
+
+    def _run(self, job: Job, fn: Callable, args, kwargs) -> None:
+        status = CANCELLED
+        try:
+            if not job.cancelled:
+                job.status = RUNNING
+                job.result = fn(job, *args, **kwargs)
+                status = DONE
+        except JobCancelled:
+            pass
+        except Exception as e:
+            logger.exception("background job %r failed", job.label or job.key)
+            job.error = e
+            status = FAILED
+        finally:
+            job._finish(status)
+            # Only in-flight jobs are deduplicated; the result lives on in the Job
+            with self._lock:
+                if self._jobs.get(job.key) is job:
+                    del self._jobs[job.key]
+
+
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def job_runner() -> JobRunner:
+    """The process-wide runner shared by every session."""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
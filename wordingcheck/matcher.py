@@ -0,0 +1,479 @@
+"""
+Multi-pattern matcher for the 誤表記 → 正表記 rule table.
+
+All 誤表記 strings are compiled into one Aho-Corasick automaton, so a check
+walks the text once no matter how many rules there are (the old loop ran
+`typo in haystack` once per rule). That walk runs in Python, though, while
+each `in` / str.find is a C loop: up to SMALL_TABLE patterns one find per
+pattern is faster, so small tables (the school's own ~50 rows) take that
+path and the automaton only pays off beyond it. Chunked scans always use
+the automaton, which is what carries state between chunks. With a Normalizer, patterns are
+normalized once at build time and texts once per check; reported offsets
+always refer to the original text. Rows marked 正規表現 in the optional 種別
+column go to a separate combined regex (see regexrules) instead.
+
+A hit is suppressed when it lies inside an allowed context of its rule: the
+correct forms named in the 正表記 cell (when they contain the 誤表記) and
+anything listed in the optional 許容表記 column. Contexts are patterns of the same automaton, so the
+longer, allowed match wins during the one scan rather than in a second pass.
+"""
+import heapq
+import re
+import time
+from bisect import bisect_right
+from collections import deque
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from .regexrules import MatchBudget, RegexRules, RuleTiming, is_regex_kind
+
+if TYPE_CHECKING:
+    from .normalize import Normalizer
+
+TYPO_COLUMN = "誤表記"
+CORRECT_COLUMN = "正表記"
+# Optional; "正規表現" marks a regex rule, anything else (or no column) a literal one
+RULE_TYPE_COLUMN = "種別"
+# Optional; texts containing the 誤表記 that are not errors, separated by 、 , or line breaks
+ALLOW_COLUMN = "許容表記"
+_ALLOW_SEPARATORS = re.compile(r"[、,，\n]+")
+# A 正表記 cell may carry notes in （）, quote the form in 「」, or list alternatives
+_NOTE = re.compile(r"[（(][^）)]*[）)]")
+_QUOTED = re.compile(r"「([^」]+)」")
+_CORRECT_SEPARATORS = re.compile(r"、|または|，|,")
+# Up to this many patterns (誤表記 plus allowed contexts), one str.find per
+# pattern beats walking the automaton; see benchmarks/bench_matcher.py
+SMALL_TABLE = 256
+
+
+class Rule(NamedTuple):
+    typo: str
+    correct: str
+    regex: bool = False
+    allow: Tuple[str, ...] = ()
+
+
+def split_allow(value: str) -> Tuple[str, ...]:
+    """The contexts listed in one 許容表記 cell."""
+    return tuple(c.strip() for c in _ALLOW_SEPARATORS.split(value) if c.strip())
+
+
+def correct_forms(correct: str) -> List[str]:
+    """The forms a 正表記 cell names: notes in （） dropped, the last 「」 term if any, else each alternative."""
+    text = _NOTE.sub("", correct).strip()
+    quoted = _QUOTED.findall(text)
+    pieces = [quoted[-1]] if quoted else _CORRECT_SEPARATORS.split(text)
+    forms = []
+    for piece in pieces:
+        piece = piece.strip().lstrip("～~").strip()
+        if piece:
+            forms.append(piece)
+    return forms
+
+
+def allow_contexts(rule: Rule, fold: Callable[[str], str] = str) -> List[str]:
+    """Contexts that suppress hits of a literal rule: the correct forms of its
+    正表記 and the 許容表記 entries that contain the 誤表記 (compared after `fold`)."""
+    typo = fold(rule.typo)
+    if rule.regex or not typo:
+        return []
+    contexts = []
+    for context in (*correct_forms(rule.correct), *rule.allow):
+        folded = fold(context)
+        if len(folded) > len(typo) and typo in folded and context not in contexts:
+            contexts.append(context)
+    return contexts
+
+
+def rules_from_frame(df) -> List[Rule]:
+    """Read (誤表記, 正表記[, 種別, 許容表記]) rows from a rule DataFrame."""
+    if TYPO_COLUMN not in df.columns or CORRECT_COLUMN not in df.columns:
+        raise KeyError(f"'{TYPO_COLUMN}' または '{CORRECT_COLUMN}' 列が見つかりません")
+    n = len(df)
+    kinds = df[RULE_TYPE_COLUMN].tolist() if RULE_TYPE_COLUMN in df.columns else [None] * n
+    allows = df[ALLOW_COLUMN].tolist() if ALLOW_COLUMN in df.columns else [None] * n
+    rules = []
+    for typo, corr, kind, allow in zip(df[TYPO_COLUMN].tolist(), df[CORRECT_COLUMN].tolist(), kinds, allows):
+        rules.append(Rule(_cell_str(typo), _cell_str(corr), is_regex_kind(_cell_str(kind)), split_allow(_cell_str(allow))))
+    return rules
+
+
+def _cell_str(value) -> str:
+    # NaN / None cells come out of Excel for blank rows; treat them as empty
+    if value is None or (isinstance(value, float) and value != value):
+        return ""
+    return str(value)
+
+
+class ScanState:
+    """Where a chunked scan (RuleMatcher.scan_chunk) stands between two chunks."""
+
+    __slots__ = ("state", "offset", "pending")
+
+    def __init__(self):
+        self.state = 0  # automaton state after the last character
+        self.offset = 0  # characters scanned so far
+        self.pending = deque()  # hits still waiting on an allowed context
+
+    def __repr__(self) -> str:
+        return f"ScanState(offset={self.offset}, state={self.state}, pending={len(self.pending)})"
+
+
+class RuleMatcher:
+    """Aho-Corasick automaton built from the 誤表記 column of a rule table.
+
+    Rule ids are row positions in the table the matcher was built from, so
+    duplicate 誤表記 rows (and rows that normalize to the same 誤表記) are all
+    reported. Regex rules are not part of the automaton; their hits are
+    merged into the same stream.
+    """
+
+    def __init__(self, rules: Iterable[Tuple[str, str]], normalizer: Optional["Normalizer"] = None):
+        self.rules: List[Rule] = [Rule(*r) for r in rules]
+        # Raises RegexRuleError for a rejected pattern
+        self.regex = RegexRules([(i, r.typo) for i, r in enumerate(self.rules) if r.regex])
+        self.normalizer = normalizer
+        # Content hash of the rule set (and normalizer), filled in by cache.get_matcher
+        self.version: Optional[str] = None
+        self._goto: List[dict] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        self._lengths: List[int] = []
+        self._patterns: List[str] = []
+        self._pattern_rules: List[List[int]] = []
+        # Rules for which a pattern is an allowed context, and per rule the
+        # longest one (how far past a hit's start a covering context can end)
+        self._pattern_allows: List[List[int]] = []
+        self._allow_reach: Dict[int, int] = {}
+        self._alphabet = set()
+        self._build()
+
+    @classmethod
+    def from_frame(cls, df, normalizer: Optional["Normalizer"] = None) -> "RuleMatcher":
+        return cls(rules_from_frame(df), normalizer)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    @property
+    def multiline(self) -> bool:
+        """True if some 誤表記 or allowed context contains a line break (regex rules never span lines)."""
+        fold = self.normalizer.fold if self.normalizer is not None else str
+        contexts = (c for r in self.rules for c in allow_contexts(r, fold))
+        return any("\n" in p for p in self.patterns()) or any("\n" in c for c in contexts)
+
+    @property
+    def longest_pattern(self) -> int:
+        """Length of the longest pattern in the automaton (誤表記 or allowed context)."""
+        return max(self._lengths, default=0)
+
+    def patterns(self) -> List[str]:
+        """The 誤表記 of each rule as the automaton sees it (normalized if configured, "" for regex rules)."""
+        fold = self.normalizer.fold if self.normalizer is not None else str
+        return ["" if r.regex else fold(r.typo) for r in self.rules]
+
+    def _build(self) -> None:
+        fold = self.normalizer.fold if self.normalizer is not None else str
+        entries = []  # (pattern, rule_id, is_context)
+        for rule_id, typo in enumerate(self.patterns()):
+            if typo:
+                entries.append((typo, rule_id, False))
+                for context in allow_contexts(self.rules[rule_id], fold):
+                    entries.append((fold(context), rule_id, True))
+        pattern_ids = {}
+        for pattern, rule_id, is_context in entries:
+            pid = pattern_ids.get(pattern)
+            if pid is None:
+                pid = pattern_ids[pattern] = self._add_pattern(pattern)
+            if is_context:
+                self._pattern_allows[pid].append(rule_id)
+                self._allow_reach[rule_id] = max(self._allow_reach.get(rule_id, 0), len(pattern))
+            else:
+                self._pattern_rules[pid].append(rule_id)
+        self._link()
+
+    def _add_pattern(self, pattern: str) -> int:
+        goto, out = self._goto, self._out
+        pid = len(self._lengths)
+        self._lengths.append(len(pattern))
+        self._patterns.append(pattern)
+        self._pattern_rules.append([])
+        self._pattern_allows.append([])
+        state = 0
+        for ch in pattern:
+            nxt = goto[state].get(ch)
+            if nxt is None:
+                nxt = len(goto)
+                goto[state][ch] = nxt
+                goto.append({})
+                self._fail.append(0)
+                out.append(())
+            state = nxt
+        out[state] = out[state] + (pid,)
+        self._alphabet.update(pattern)
+        return pid
+
+    def _link(self) -> None:
+        # Breadth-first pass to set failure links and merge suffix outputs
+        goto, out = self._goto, self._out
+        fail = self._fail
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                if out[fail[nxt]]:
+                    out[nxt] = out[nxt] + out[fail[nxt]]
+
+    def iter_matches(self, text: str, budget: Optional[MatchBudget] = None) -> Iterator[Tuple[int, int, int]]:
+        """Yield (rule_id, start, end) for every occurrence, ordered by end offset.
+
+        Offsets are into `text` itself; with a normalizer, a hit is mapped
+        back to the exact original characters it came from. Regex rules stop
+        when `budget` runs out (check `budget.exceeded` afterwards).
+        """
+        literal = self.literal_matches(text)
+        if not self.regex:
+            return literal
+        return heapq.merge(literal, self.regex.scan(text, budget), key=lambda hit: hit[2])
+
+    def literal_matches(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """iter_matches without the regex rules (the automaton part only)."""
+        if self.normalizer is None:
+            return self._scan(text)
+        normalized = self.normalizer.normalize(text)
+        if normalized.identity:
+            return self._scan(text)
+        span = normalized.span
+        return ((rule_id, *span(start, end)) for rule_id, start, end in self._scan(normalized.text))
+
+    def _scan(self, text: str, carry: Optional["ScanState"] = None) -> Iterator[Tuple[int, int, int]]:
+        if carry is None and len(self._patterns) <= SMALL_TABLE:
+            return iter(self._find_hits(text, range(len(self._patterns))))
+        if self._allow_reach:
+            return self._scan_allowing(text, carry)
+        return self._scan_all(text, carry)
+
+    def scan_chunk(self, text: str, carry: "ScanState") -> Iterator[Tuple[int, int, int]]:
+        """Literal hits in one chunk of a longer (already normalized) text.
+
+        `carry` holds the automaton state between chunks, so a 誤表記 split
+        across two chunks is still found; offsets count from the start of
+        the whole text. Consume the iterator fully before the next chunk, and
+        call finish_chunks at the end for hits still waiting on a context.
+        """
+        return self._scan(text, carry)
+
+    def finish_chunks(self, carry: "ScanState") -> List[Tuple[int, int, int]]:
+        """The hits of a chunked scan still held back, once the text has ended."""
+        hits = [(rule_id, start, end) for rule_id, start, end, _, suppressed in carry.pending if not suppressed]
+        carry.pending.clear()
+        return hits
+
+    def _scan_all(self, text: str, carry: Optional["ScanState"] = None) -> Iterator[Tuple[int, int, int]]:
+        goto, fail, out = self._goto, self._fail, self._out
+        lengths, pattern_rules, alphabet = self._lengths, self._pattern_rules, self._alphabet
+        state, base = (carry.state, carry.offset) if carry is not None else (0, 0)
+        for i, ch in enumerate(text):
+            if ch not in alphabet:
+                state = 0
+                continue
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                end = base + i + 1
+                for pid in out[state]:
+                    start = end - lengths[pid]
+                    for rule_id in pattern_rules[pid]:
+                        yield rule_id, start, end
+        if carry is not None:
+            carry.state, carry.offset = state, base + len(text)
+
+    def _scan_allowing(self, text: str, carry: Optional["ScanState"] = None) -> Iterator[Tuple[int, int, int]]:
+        """_scan_all, minus hits that lie inside an allowed context of their rule.
+
+        A hit is held back until no covering context can still end (its start
+        plus the rule's longest context), then released in end order unless a
+        context match covered it meanwhile.
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        lengths, pattern_rules, alphabet = self._lengths, self._pattern_rules, self._alphabet
+        pattern_allows, reach = self._pattern_allows, self._allow_reach
+        if carry is not None:
+            state, base, pending = carry.state, carry.offset, carry.pending
+        else:
+            state, base, pending = 0, 0, deque()  # [rule_id, start, end, decided at, suppressed]
+        for i, ch in enumerate(text):
+            if ch not in alphabet:
+                state = 0
+                continue
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                end = base + i + 1
+                # Hits first, so a context ending at the same place covers them
+                for pid in out[state]:
+                    start = end - lengths[pid]
+                    for rule_id in pattern_rules[pid]:
+                        pending.append([rule_id, start, end, start + reach.get(rule_id, 0), False])
+                for pid in out[state]:
+                    if pattern_allows[pid]:
+                        start = end - lengths[pid]
+                        for hit in pending:
+                            if hit[1] >= start and hit[0] in pattern_allows[pid]:
+                                hit[4] = True
+                while pending and pending[0][3] <= end:
+                    rule_id, start, hit_end, _, suppressed = pending.popleft()
+                    if not suppressed:
+                        yield rule_id, start, hit_end
+        if carry is not None:
+            # Hits whose contexts could only have ended inside this chunk are decided
+            carry.state, carry.offset = state, base + len(text)
+            while pending and pending[0][3] <= carry.offset:
+                rule_id, start, hit_end, _, suppressed = pending.popleft()
+                if not suppressed:
+                    yield rule_id, start, hit_end
+            return
+        for rule_id, start, end, _, suppressed in pending:
+            if not suppressed:
+                yield rule_id, start, end
+
+    def _find_hits(self, text: str, pids: Iterable[int]) -> List[Tuple[int, int, int]]:
+        """What _scan yields, for the patterns `pids`, by one str.find loop per pattern.
+
+        For small tables. A hit is dropped when an occurrence of one of its
+        rule's contexts starts at or before it and ends at or after it, as in
+        _scan_allowing; hits come out in the automaton's order (end, then
+        longer pattern first, then rule id).
+        """
+        patterns, pattern_rules, pattern_allows = self._patterns, self._pattern_rules, self._pattern_allows
+        hits = []  # (end, start, rule_id)
+        covers: Dict[int, List[Tuple[int, int]]] = {}  # rule_id -> context (start, end)
+        for pid in pids:
+            rule_ids, allowed = pattern_rules[pid], pattern_allows[pid]
+            pattern = patterns[pid]
+            n = len(pattern)
+            start = text.find(pattern)
+            while start >= 0:
+                for rule_id in rule_ids:
+                    hits.append((start + n, start, rule_id))
+                for rule_id in allowed:
+                    covers.setdefault(rule_id, []).append((start, start + n))
+                start = text.find(pattern, start + 1)
+        if covers:
+            # Per rule: context starts in order, with the furthest end reached so far
+            reach = {}
+            for rule_id, spans in covers.items():
+                spans.sort()
+                ends = []
+                for _, end in spans:
+                    ends.append(max(end, ends[-1]) if ends else end)
+                reach[rule_id] = ([start for start, _ in spans], ends)
+            kept = []
+            for hit in hits:
+                end, start, rule_id = hit
+                if rule_id in reach:
+                    starts, ends = reach[rule_id]
+                    k = bisect_right(starts, start) - 1
+                    if k >= 0 and ends[k] >= end:
+                        continue
+                kept.append(hit)
+            hits = kept
+        hits.sort()
+        return [(rule_id, start, end) for end, start, rule_id in hits]
+
+    def hit_rules(self, text: str, budget: Optional[MatchBudget] = None) -> List[int]:
+        """Rule ids that occur at least once in `text`, in table order."""
+        rule_ids = {rule_id for rule_id, _, _ in self.regex.scan(text, budget)} if self.regex else set()
+        if self.normalizer is not None:
+            text = self.normalizer.fold(text)
+        if len(self._patterns) <= SMALL_TABLE:
+            # `in` answers rules without contexts; only the others need positions
+            reach = self._allow_reach
+            placed = []
+            for pid, pattern in enumerate(self._patterns):
+                ids = self._pattern_rules[pid]
+                if any(rule_id in reach for rule_id in ids):
+                    placed.append(pid)
+                elif ids and pattern in text:
+                    rule_ids.update(ids)
+            if placed:
+                placed.extend(pid for pid, allowed in enumerate(self._pattern_allows) if allowed)
+                rule_ids.update(rule_id for rule_id, _, _ in self._find_hits(text, sorted(set(placed))))
+            return sorted(rule_ids)
+        if self._allow_reach:
+            rule_ids.update(self._hit_rules_allowing(text))
+            return sorted(rule_ids)
+        goto, fail, out, alphabet = self._goto, self._fail, self._out, self._alphabet
+        # Only the set of accepting states matters here, so skip per-hit tuples
+        seen = set()
+        state = 0
+        for ch in text:
+            if ch not in alphabet:
+                state = 0
+                continue
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                seen.add(state)
+        for state in seen:
+            for pid in out[state]:
+                rule_ids.update(self._pattern_rules[pid])
+        return sorted(rule_ids)
+
+    def _hit_rules_allowing(self, text: str) -> set:
+        # Order doesn't matter here: rules without contexts count at once,
+        # and only hits of the others wait for a covering context
+        goto, fail, out = self._goto, self._fail, self._out
+        lengths, pattern_rules, alphabet = self._lengths, self._pattern_rules, self._alphabet
+        pattern_allows, reach = self._pattern_allows, self._allow_reach
+        found = set()
+        pending = []  # [rule_id, start, decided at, suppressed]
+        state = 0
+        for i, ch in enumerate(text):
+            if ch not in alphabet:
+                state = 0
+                continue
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                end = i + 1
+                for pid in out[state]:
+                    for rule_id in pattern_rules[pid]:
+                        if rule_id in found:
+                            continue
+                        if rule_id in reach:
+                            start = end - lengths[pid]
+                            pending.append([rule_id, start, start + reach[rule_id], False])
+                        else:
+                            found.add(rule_id)
+                if pending:
+                    for pid in out[state]:
+                        if pattern_allows[pid]:
+                            start = end - lengths[pid]
+                            for hit in pending:
+                                if hit[1] >= start and hit[0] in pattern_allows[pid]:
+                                    hit[3] = True
+                    if pending[0][2] <= end:
+                        found.update(h[0] for h in pending if h[2] <= end and not h[3])
+                        pending = [h for h in pending if h[2] > end and h[0] not in found]
+        found.update(h[0] for h in pending if not h[3])
+        return found
+
+    def check(self, text: str) -> List[str]:
+        """The "誤表記 → 正表記" lines shown in the analysis output."""
+        return [f"{self.rules[i].typo} → {self.rules[i].correct}" for i in self.hit_rules(text)]
+
+    def profile(self, text: str) -> List[RuleTiming]:
+        """Match time per regex rule over `text`, plus one row (rule_id -1) for all literal rules."""
+        t0 = time.perf_counter()
+        hits = sum(1 for _ in self.literal_matches(text))
+        literal = RuleTiming(-1, time.perf_counter() - t0, hits, False)
+        return [literal] + self.regex.profile(text)
@@ -0,0 +1,296 @@
+"""
+Text normalization with an offset map back to the original.
+
+Checks run on NFKC text with a few extra foldings (dash variants,
+zero-width characters, and optionally katakana → hiragana and ASCII case),
+so one rule row covers its full-width / half-width and dash variants. Only
+the characters that actually change are rewritten and recorded, and match
+offsets in the normalized text are mapped back to the exact original span.
+"""
+import re
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_right
+from typing import Dict, Iterable, Optional, Pattern, Tuple
+
+# Dash variants folded to "-" (full-width "－" already becomes "-" under NFKC)
+DASHES = "\u2010\u2011\u2012\u2013\u2014\u2015\u2212\ufe58\ufe63"  # ‐‑‒–—―−﹘﹣
+# Wave dashes folded to "~" (full-width "～" already becomes "~" under NFKC)
+WAVES = "\u301c\u223c"  # 〜∼
+ZERO_WIDTH = "\u200b\u200c\u200d\u2060\ufeff"
+
+# Marks that combine with the preceding character under NFKC: combining
+# characters plus the (half-width) voiced sound marks and Hangul vowel/final jamo
+_EXTRA_COMBINING = "\u3099\u309a\uff9e\uff9f" + "".join(map(chr, range(0x1160, 0x1200)))
+# Astral blocks with compatibility mappings that matter for text (math letters,
+# enclosed alphanumerics, CJK compatibility ideographs)
+_ASTRAL_RANGES = ((0x1D400, 0x1D800), (0x1F100, 0x1F300), (0x2F800, 0x2FA20))
+
+
+def _char_class(codepoints: Iterable[int]) -> str:
+    """Regex character class body for a sorted set of code points, as ranges."""
+    parts = []
+    run_start = prev = None
+    for cp in codepoints:
+        if prev is not None and cp == prev + 1:
+            prev = cp
+            continue
+        if run_start is not None:
+            parts.append((run_start, prev))
+        run_start = prev = cp
+    if run_start is not None:
+        parts.append((run_start, prev))
+    return "".join(
+        re.escape(chr(a)) if a == b else f"{re.escape(chr(a))}-{re.escape(chr(b))}" for a, b in parts
+    )
+
+
+_patterns: Dict[str, Pattern] = {}
+_pattern_lock = threading.Lock()
+
+
+class NormalizedText:
+    """Normalized text plus the segments that differ from the original.
+
+    Segment k turned original[os[k]:oe[k]] into text[ns[k]:ne[k]]; everything
+    between segments is unchanged, so offsets there shift by a constant.
+    Segments of equal length are runs of 1:1 rewrites and map character by
+    character.
+    """
+
+    __slots__ = ("text", "_ns", "_ne", "_os", "_oe")
+
+    def __init__(self, text: str, ns=None, ne=None, os_=None, oe=None):
+        self.text = text
+        self._ns = ns if ns is not None else array("q")
+        self._ne = ne if ne is not None else array("q")
+        self._os = os_ if os_ is not None else array("q")
+        self._oe = oe if oe is not None else array("q")
+
+    @property
+    def identity(self) -> bool:
+        return not self._ns
+
+    def _orig(self, pos: int) -> int:
+        k = bisect_right(self._ns, pos) - 1
+        if k < 0:
+            return pos
+        ns, ne = self._ns[k], self._ne[k]
+        if pos < ne:
+            # Runs of 1:1 characters map position by position; other
+            # segments (expansions, composed marks) only as a whole
+            if ne - ns == self._oe[k] - self._os[k]:
+                return self._os[k] + (pos - ns)
+            return self._os[k]
+        return self._oe[k] + (pos - ne)
+
+    def span(self, start: int, end: int) -> Tuple[int, int]:
+        """Original (start, end) covering normalized text[start:end].
+
+        A span that starts or ends inside a rewritten segment is widened to
+        the whole original segment (e.g. both characters of half-width "ｶﾞ").
+        """
+        if not self._ns:
+            return start, end
+        orig_start = self._orig(start)
+        if end <= start:
+            return orig_start, orig_start
+        last = end - 1
+        k = bisect_right(self._ns, last) - 1
+        if k >= 0 and last < self._ne[k] and self._ne[k] - self._ns[k] != self._oe[k] - self._os[k]:
+            return orig_start, self._oe[k]
+        return orig_start, self._orig(last) + 1
+
+
+class Normalizer:
+    """NFKC plus configurable folding; immutable and shared between matchers."""
+
+    def __init__(
+        self,
+        nfkc: bool = True,
+        dashes: bool = True,
+        zero_width: bool = True,
+        kana: bool = False,
+        case: bool = False,
+    ):
+        self.nfkc = nfkc
+        self.dashes = dashes
+        self.zero_width = zero_width
+        self.kana = kana
+        self.case = case
+        table: Dict[int, Optional[str]] = {}
+        if dashes:
+            table.update((ord(c), "-") for c in DASHES)
+            table.update((ord(c), "~") for c in WAVES)
+        if zero_width:
+            table.update((ord(c), None) for c in ZERO_WIDTH)
+        if kana:
+            # Katakana ァ..ヶ to the matching hiragana; ー and ヽヾ stay as they are
+            table.update((cp, chr(cp - 0x60)) for cp in range(0x30A1, 0x30F7))
+        if case:
+            table.update((cp, chr(cp + 32)) for cp in range(0x41, 0x5B))
+        self._table = table
+        self._memo: Dict[str, str] = {}
+        self._pattern: Optional[Pattern] = None
+        self._single: Dict[int, str] = {}
+        self._folded: Optional[Pattern] = None
+
+    @property
+    def key(self) -> str:
+        """Short identifier of the configuration, part of a matcher's version."""
+        flags = [name for name in ("nfkc", "dashes", "zero_width", "kana", "case") if getattr(self, name)]
+        return "+".join(flags) or "exact"
+
+    def __repr__(self) -> str:
+        return f"Normalizer({self.key})"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Normalizer) and other.key == self.key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in ("nfkc", "dashes", "zero_width", "kana", "case")}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _segment(self, seg: str) -> str:
+        out = self._memo.get(seg)
+        if out is None:
+            out = unicodedata.normalize("NFKC", seg) if self.nfkc else seg
+            out = out.translate(self._table)
+            if len(self._memo) < 8192:
+                self._memo[seg] = out
+        return out
+
+    def _compiled(self) -> Tuple[Pattern, Dict[int, str], Optional[Pattern]]:
+        if self._pattern is None:
+            with _pattern_lock:
+                # Built once per configuration (about 60ms), shared by equal normalizers
+                compiled = _patterns.get(self.key)
+                if compiled is None:
+                    compiled = _patterns[self.key] = self._compile()
+                self._pattern, self._single, self._folded = compiled
+        return self._pattern, self._single, self._folded
+
+    def _compile(self) -> Tuple[Pattern, Dict[int, str], Optional[Pattern]]:
+        """Segment regex, the 1:1 character table, and a regex for the folded characters.
+
+        Segments are: a run of combining marks (joined with the character
+        before it); a run of characters that each normalize to exactly one
+        character (full-width letters and digits, half-width katakana, ...),
+        rewritten with one str.translate and mapped back position by
+        position; or a single character that expands or disappears (㈱, …,
+        zero-width space). Characters followed by a mark are left to the
+        mark's segment.
+        """
+        combining = {cp for cp in range(0x300, 0x10000) if unicodedata.combining(chr(cp))}
+        combining.update(map(ord, _EXTRA_COMBINING))
+        codepoints = list(range(0x80, 0x10000)) + [cp for a, b in _ASTRAL_RANGES for cp in range(a, b)]
+        codepoints.extend(cp for cp in self._table if cp < 0x80)
+        single: Dict[int, str] = {}
+        multi = set()
+        for cp in codepoints:
+            if 0xD800 <= cp < 0xE000 or cp in combining:
+                continue
+            ch = chr(cp)
+            out = unicodedata.normalize("NFKC", ch) if self.nfkc else ch
+            out = out.translate(self._table)
+            if out == ch:
+                continue
+            if len(out) == 1 and not unicodedata.combining(out):
+                single[cp] = out
+            else:
+                multi.add(cp)
+        c_class = _char_class(sorted(combining))
+        alternatives = [f"(?P<mark>[{c_class}]+)"]
+        if single:
+            alternatives.append(f"(?P<run>(?:[{_char_class(sorted(single))}](?![{c_class}]))+)")
+        if multi:
+            alternatives.append(f"(?P<other>[{_char_class(sorted(multi))}](?![{c_class}]))")
+        folded = re.compile(f"[{_char_class(sorted(self._table))}]") if self._table else None
+        return re.compile("|".join(alternatives)), single, folded
+
+    def _unchanged(self, text: str, folded: Optional[Pattern]) -> bool:
+        # Both checks run in C; most Japanese prose passes them untouched
+        if self.nfkc and not unicodedata.is_normalized("NFKC", text):
+            return False
+        return folded is None or folded.search(text) is None
+
+    def fold(self, text: str) -> str:
+        """Normalized text only (no offset map), for rule patterns and hit checks.
+
+        Whole-text NFKC gives the same result as the segment-wise rewrite in
+        normalize(), entirely in C.
+        """
+        if self.nfkc and not unicodedata.is_normalized("NFKC", text):
+            text = unicodedata.normalize("NFKC", text)
+        return text.translate(self._table) if self._table else text
+
+    def stable_prefix(self, text: str) -> int:
+        """Length of the longest prefix of `text` that normalizes the same whatever follows it.
+
+        Only a combining mark can change the character before it, so the cut
+        goes before the last character that isn't one (or after a final line
+        break: marks at the start of a line are never joined with the "\\n").
+        """
+        i = len(text) - 1
+        while i >= 0 and (unicodedata.combining(text[i]) or text[i] in _EXTRA_COMBINING):
+            i -= 1
+        if i < 0:
+            return 0
+        return i + 1 if text[i] == "\n" else i
+
+    def normalize(self, text: str) -> NormalizedText:
+        """Normalized text with the map back to `text`."""
+        pattern, single, folded = self._compiled()
+        if self._unchanged(text, folded):
+            return NormalizedText(text)
+        segment = self._segment
+        pieces = []
+        ns, ne, os_, oe = array("q"), array("q"), array("q"), array("q")
+        last = 0  # end of the previous segment in the original
+        npos = 0  # length of the normalized text so far
+        line_start = 0
+        n = len(text)
+        while line_start < n:
+            # Line by line, so only lines that actually change are scanned
+            line_end = text.find("\n", line_start)
+            line_end = n if line_end == -1 else line_end + 1
+            line = text[line_start:line_end]
+            if self._unchanged(line, folded):
+                line_start = line_end
+                continue
+            for m in pattern.finditer(text, line_start, line_end):
+                start, end = m.span()
+                kind = m.lastgroup
+                if kind == "run":
+                    out = text[start:end].translate(single)
+                else:
+                    if kind == "mark" and start > line_start:
+                        start -= 1  # the base character the marks belong to
+                    seg = text[start:end]
+                    out = segment(seg)
+                    if out == seg:
+                        continue
+                pieces.append(text[last:start])
+                npos += start - last
+                pieces.append(out)
+                ns.append(npos)
+                ne.append(npos + len(out))
+                os_.append(start)
+                oe.append(end)
+                npos += len(out)
+                last = end
+            line_start = line_end
+        if not ns:
+            return NormalizedText(text)
+        pieces.append(text[last:])
+        return NormalizedText("".join(pieces), ns, ne, os_, oe)
+
+
+# Used by get_matcher, the rule store and the CLI unless told otherwise
+DEFAULT_NORMALIZER = Normalizer()
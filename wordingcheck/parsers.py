@@ -0,0 +1,140 @@
+"""
+File parsers shared by the Streamlit pages and the batch CLI.
+
+Every parser takes the raw file bytes and returns plain text (or a DataFrame
+for tabular formats), so they work the same for uploads, URLs and files on disk.
+"""
+from io import BytesIO
+from pathlib import PurePath
+from typing import Iterator
+
+from .docx_stream import docx_stream_text
+from .encoding import SAMPLE_SIZE, decode_bytes, detect_encoding
+
+# Optional PDF parsing
+try:
+    import PyPDF2 as pypdf
+except Exception:
+    try:
+        import pypdf
+    except Exception:
+        pypdf = None
+
+TEXT_EXTENSIONS = (".txt",)
+TABLE_EXTENSIONS = (".csv", ".xlsx", ".xls")
+DOCX_EXTENSIONS = (".docx",)
+PDF_EXTENSIONS = (".pdf",)
+SUPPORTED_EXTENSIONS = TEXT_EXTENSIONS + TABLE_EXTENSIONS + DOCX_EXTENSIONS + PDF_EXTENSIONS
+
+
+class UnsupportedFormat(ValueError):
+    pass
+
+
+_ZIP_MAGIC = b"PK\x03\x04"
+_OLE2_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+_PDF_MAGIC = b"%PDF"
+
+
+def sniff_format(data: bytes, content_type: str = "", name: str = "") -> str:
+    """File extension (".xlsx", ".docx", ".pdf", ".xls", ".csv", ".txt") for raw bytes.
+
+    Magic bytes win; Content-Type and the name only decide between CSV and
+    plain text, which have no signature.
+    """
+    head = data[:8]
+    if head.startswith(_PDF_MAGIC):
+        return ".pdf"
+    if head.startswith(_ZIP_MAGIC):
+        import zipfile
+
+        try:
+            with zipfile.ZipFile(BytesIO(data)) as zf:
+                names = set(zf.namelist())
+        except zipfile.BadZipFile:
+            names = set()
+        if "word/document.xml" in names:
+            return ".docx"
+        if "xl/workbook.xml" in names:
+            return ".xlsx"
+        raise UnsupportedFormat("ZIP形式ですが Word/Excel ファイルではありません")
+    if head.startswith(_OLE2_MAGIC):
+        # OLE2 is also used by legacy .doc; only .xls is supported
+        if name.lower().endswith(".doc") or "msword" in content_type.lower():
+            raise UnsupportedFormat("旧形式の .doc は未対応です (.docx で保存してください)")
+        return ".xls"
+    ctype = content_type.lower()
+    if "csv" in ctype or name.lower().split("?")[0].endswith(".csv"):
+        return ".csv"
+    return ".txt"
+
+
+def decode_text(data: bytes, content_type: str = "") -> str:
+    """Text of a .txt file in UTF-8, UTF-16, CP932 or EUC-JP (see encoding.detect_encoding)."""
+    return decode_bytes(data, content_type)[0]
+
+
+def read_table(data: bytes, name: str):
+    """DataFrame for a .csv / .xlsx / .xls file (first sheet, as pandas reads it)."""
+    import pandas as pd
+
+    if name.lower().endswith(".csv"):
+        return pd.read_csv(BytesIO(data), encoding=detect_encoding(data[:SAMPLE_SIZE]))
+    return pd.read_excel(BytesIO(data))
+
+
+def iter_csv_text(path, rows: int = 10_000) -> Iterator[str]:
+    """frame_to_text of a CSV file, a block of rows at a time (the encoding is detected from its head)."""
+    import pandas as pd
+
+    with open(path, "rb") as f:
+        encoding = detect_encoding(f.read(SAMPLE_SIZE))
+    with pd.read_csv(path, encoding=encoding, chunksize=rows) as reader:
+        for df in reader:
+            yield frame_to_text(df) + "\n"
+
+
+def frame_to_text(df) -> str:
+    """Searchable text for a table: one line per row, cells joined by spaces."""
+    try:
+        return "\n".join(df.astype(str).apply(lambda row: " ".join(row.values), axis=1).tolist())
+    except Exception:
+        return df.astype(str).to_string()
+
+
+def docx_text(data: bytes) -> str:
+    """Text of a .docx including tables, headers, footers and text boxes."""
+    return docx_stream_text(data)
+
+
+def pdf_text(data: bytes) -> str:
+    if pypdf is None:
+        raise UnsupportedFormat("PDF読み取りには pypdf のインストールが必要です (pip install pypdf)")
+    reader = pypdf.PdfReader(BytesIO(data))
+    pages = []
+    for page in reader.pages:
+        try:
+            page_text = page.extract_text()
+        except Exception:
+            page_text = None
+        if page_text:
+            pages.append(page_text)
+    return "\n".join(pages)
+
+
+def extract_text(name: str, data: bytes) -> str:
+    """Plain text of a document, dispatched on the file extension."""
+    suffix = PurePath(name).suffix.lower()
+    if suffix in TEXT_EXTENSIONS:
+        return decode_text(data)
+    if suffix in (".xlsx", ".xls"):
+        from .excel import workbook_text
+
+        return workbook_text(data, name)
+    if suffix in TABLE_EXTENSIONS:
+        return frame_to_text(read_table(data, name))
+    if suffix in DOCX_EXTENSIONS:
+        return docx_text(data)
+    if suffix in PDF_EXTENSIONS:
+        return pdf_text(data)
+    raise UnsupportedFormat(f"未対応のファイル形式です: {name}")
@@ -0,0 +1,184 @@
+"""
+Page-parallel PDF text extraction.
+
+Pages are split into contiguous batches and extracted in a shared process
+pool; results are yielded as each batch finishes so callers can check or
+report progress before the whole file is done. Extracted text is cached per
+(file hash, page index), so re-checking the same handbook with new rules
+never re-extracts it.
+
+The file goes to the workers as a temporary file path, not as bytes pickled
+into every batch. The pool uses the spawn start method: it is first needed
+from background job threads, and forking a process that has other threads
+running can leave a lock held in the child forever.
+"""
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import BytesIO
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from .cache import LRUCache, content_digest
+from .findings import Findings
+from .matcher import RuleMatcher
+from .parsers import UnsupportedFormat, pypdf
+from .regexrules import MatchBudget
+
+# Below this many pages the pool round-trip costs more than it saves
+MIN_PARALLEL_PAGES = 8
+POOL_WORKERS = min(4, os.cpu_count() or 1)
+
+_page_cache = LRUCache(maxsize=4096)
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=POOL_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _reader(stream):
+    if pypdf is None:
+        raise UnsupportedFormat("PDF読み取りには pypdf のインストールが必要です (pip install pypdf)")
+    return pypdf.PdfReader(stream)
+
+
+def _page_text(page) -> str:
+    try:
+        return page.extract_text() or ""
+    except Exception:
+        return ""
+
+
+def _extract_pages(path: str, indices: List[int]) -> List[Tuple[int, str]]:
+    # Runs in a worker process: each batch opens its own reader on the shared file
+    with open(path, "rb") as f:
+        reader = _reader(f)
+        return [(i, _page_text(reader.pages[i])) for i in indices]
+
+
+def _batches(indices: List[int], n_batches: int) -> List[List[int]]:
+    size = max(1, -(-len(indices) // n_batches))
+    return [indices[i : i + size] for i in range(0, len(indices), size)]
+
+
+def iter_pdf_pages(data: bytes, workers: Optional[int] = None) -> Iterator[Tuple[int, str, int]]:
+    """Yield (page_index, text, page_count) in completion order.
+
+    Cached pages come first. `workers=1` extracts in-process (use it inside
+    worker processes that must not start their own pool).
+    """
+    digest = content_digest(data)
+    reader = _reader(BytesIO(data))
+    total = len(reader.pages)
+    todo = []
+    for i in range(total):
+        text = _page_cache.get((digest, i))
+        if text is None:
+            todo.append(i)
+        else:
+            yield i, text, total
+    if not todo:
+        return
+
+    if workers == 1 or len(todo) < MIN_PARALLEL_PAGES:
+        for i in todo:
+            text = _page_text(reader.pages[i])
+            _page_cache.put((digest, i), text)
+            yield i, text, total
+        return
+
+    pool = _get_pool()
+    n_batches = 2 * (workers or POOL_WORKERS)
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    futures = []
+    try:
+        futures = [pool.submit(_extract_pages, path, batch) for batch in _batches(todo, n_batches)]
+        for fut in as_completed(futures):
+            for i, text in fut.result():
+                _page_cache.put((digest, i), text)
+                yield i, text, total
+    finally:
+        for fut in futures:
+            fut.cancel()
+        # A batch still running when the caller stopped early may fail to
+        # open the file now; nobody waits for its result
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def extract_pdf_text(
+    data: bytes,
+    progress: Optional[Callable[[int, int], None]] = None,
+    workers: Optional[int] = None,
+) -> str:
+    """Full text in page order (non-empty pages joined by newlines)."""
+    pages = {}
+    for i, text, total in iter_pdf_pages(data, workers=workers):
+        pages[i] = text
+        if progress is not None:
+            progress(len(pages), total)
+    return "\n".join(pages[i] for i in sorted(pages) if pages[i])
+
+
+def iter_pdf_chunks(
+    data: bytes,
+    workers: Optional[int] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Iterator[str]:
+    """The text of extract_pdf_text, page by page in page order, as each page becomes available.
+
+    For stream.StreamScanner: offsets into the joined chunks are offsets
+    into extract_pdf_text's result, and a 誤表記 crossing a page break is found.
+    `progress(pages extracted, page count)` is called as pages arrive.
+    """
+    ready = {}
+    next_page = 0
+    started = False
+    for i, text, total in iter_pdf_pages(data, workers=workers):
+        if progress is not None:
+            progress(next_page + len(ready) + 1, total)
+        ready[i] = text
+        while next_page in ready:
+            text = ready.pop(next_page)
+            next_page += 1
+            if text:
+                yield "\n" + text if started else text
+                started = True
+
+
+def check_pdf(
+    data: bytes,
+    matcher: RuleMatcher,
+    budget: Optional[MatchBudget] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    workers: Optional[int] = None,
+) -> Tuple[str, Findings]:
+    """(extract_pdf_text's text, its findings), checking each page as soon as it and the pages before it are in.
+
+    The scan keeps up with extraction instead of waiting for the last page,
+    so the findings are ready when the text is.
+    """
+    pieces = []
+
+    def chunks():
+        for chunk in iter_pdf_chunks(data, workers=workers, progress=progress):
+            pieces.append(chunk)
+            yield chunk
+
+    findings = Findings.from_stream(chunks(), matcher, budget)
+    return "".join(pieces), findings
+
+
+def page_cache_stats():
+    return _page_cache.stats()
@@ -0,0 +1,238 @@
+"""
+Regex rules.
+
+Rows whose 種別 column says 正規表現 are matched as regular expressions. All
+of them are compiled into one alternation with a named group per pattern, so
+each line is scanned once however many regex rules there are. Patterns are
+checked when rules are saved (no backreferences, named groups or global
+flags, which break the combined pattern; no empty matches; no nested
+unbounded repeats, the usual source of catastrophic backtracking; and a
+timed probe). At check time lines are scanned one by one under a time
+budget, and a check that runs out of budget stops and reports itself as
+incomplete.
+
+Regex rules see the original text, not the normalized one, so they can
+target exactly the variants normalization would hide (全角数字 etc.), and
+they never match across a line break.
+"""
+import logging
+import re
+import time
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+logger = logging.getLogger(__name__)
+
+REGEX_KINDS = {"正規表現", "regex", "re"}
+# Wall-clock seconds of regex scanning allowed per check
+DEFAULT_BUDGET = 2.0
+# A saved pattern must get through the probe strings within this time
+PROBE_LIMIT = 0.05
+PROBE_LENGTH = 2000
+# Lines are scanned with finditer(text, start, end); without MULTILINE a ^
+# would only match on the first line of the text
+LINE_FLAGS = re.MULTILINE
+
+_UNBOUNDED = sre_constants.MAXREPEAT
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+
+
+def is_regex_kind(value: str) -> bool:
+    """True if a 種別 cell marks its row as a regex rule."""
+    return value.strip().lower() in REGEX_KINDS
+
+
+class RegexRuleError(ValueError):
+    """A regex rule that can't be compiled or is rejected as unsafe."""
+
+
+class MatchBudget:
+    """Time allowance for the regex part of one check (shared across its lines)."""
+
+    __slots__ = ("seconds", "spent", "exceeded")
+
+    def __init__(self, seconds: float = DEFAULT_BUDGET):
+        self.seconds = seconds
+        self.spent = 0.0
+        self.exceeded = False
+
+    @property
+    def remaining(self) -> float:
+        return self.seconds - self.spent
+
+
+class RuleTiming(NamedTuple):
+    rule_id: int  # -1 for the literal (Aho-Corasick) rules as a whole
+    seconds: float
+    hits: int
+    timed_out: bool
+
+
+def _walk(items, in_repeat: bool, pattern: str) -> None:
+    for op, av in items:
+        if op in _REPEATS:
+            lo, hi, body = av
+            if in_repeat and hi == _UNBOUNDED:
+                raise RegexRuleError(f"繰り返しが入れ子になっています（処理が極端に遅くなるおそれ）: {pattern}")
+            _walk(body, in_repeat or hi > 1, pattern)
+        elif op in (sre_constants.GROUPREF, sre_constants.GROUPREF_EXISTS):
+            raise RegexRuleError(f"後方参照は使えません: {pattern}")
+        elif op == sre_constants.SUBPATTERN:
+            _walk(av[-1], in_repeat, pattern)
+        elif op == sre_constants.BRANCH:
+            for branch in av[1]:
+                _walk(branch, in_repeat, pattern)
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            _walk(av[1], in_repeat, pattern)
+        elif hasattr(sre_constants, "ATOMIC_GROUP") and op == sre_constants.ATOMIC_GROUP:
+            _walk(av, in_repeat, pattern)
+        elif hasattr(sre_constants, "POSSESSIVE_REPEAT") and op == sre_constants.POSSESSIVE_REPEAT:
+            # Possessive repeats never backtrack into their body
+            _walk(av[2], True, pattern)
+
+
+def _probe_alphabets(pattern: str) -> List[str]:
+    # Runs of the pattern's own characters followed by one that can't
+    # match: the input shape that makes backtracking explode
+    chars = sorted({c for c in pattern if c.isalnum() or c in " 　"})[:6] or ["a"]
+    return ["".join(chars)] + chars
+
+
+def _probe_lengths() -> Iterator[int]:
+    # Small steps while short, so an exponential pattern is caught one
+    # step after it gets slow rather than after a much longer probe
+    n = 8
+    while n < PROBE_LENGTH:
+        yield n
+        n += 4 if n < 64 else n // 4
+    yield PROBE_LENGTH
+
+
+def _too_slow(compiled: "re.Pattern", pattern: str) -> bool:
+    for alphabet in _probe_alphabets(pattern):
+        for n in _probe_lengths():
+            probe = (alphabet * (n // len(alphabet) + 1))[:n] + "\uffff"
+            t0 = time.perf_counter()
+            for _ in compiled.finditer(probe):
+                pass
+            if time.perf_counter() - t0 > PROBE_LIMIT:
+                return True
+    return False
+
+
+def validate_pattern(pattern: str) -> "re.Pattern":
+    """Compile one regex rule, or raise RegexRuleError explaining why it is rejected."""
+    if not pattern:
+        raise RegexRuleError("正規表現が空です")
+    try:
+        compiled = re.compile(pattern)
+    except re.error as e:
+        raise RegexRuleError(f"正規表現として解釈できません（{e}）: {pattern}") from None
+    if compiled.flags & ~re.UNICODE:
+        raise RegexRuleError(f"(?i) などの全体フラグは使えません。(?i:…) の形で指定してください: {pattern}")
+    if compiled.groupindex:
+        raise RegexRuleError(f"名前付きグループは使えません: {pattern}")
+    parsed = sre_parse.parse(pattern)
+    if parsed.getwidth()[0] == 0:
+        raise RegexRuleError(f"空文字列に一致するパターンです: {pattern}")
+    _walk(parsed, False, pattern)
+    if _too_slow(compiled, pattern):
+        raise RegexRuleError(f"処理に時間がかかりすぎるパターンです: {pattern}")
+    return compiled
+
+
+def validate_rules(rules) -> List[str]:
+    """Error messages ("n行目: ...") for every rejected regex rule; empty if all are fine."""
+    errors = []
+    for i, rule in enumerate(rules, 1):
+        if getattr(rule, "regex", False) and rule.typo:
+            try:
+                validate_pattern(rule.typo)
+            except RegexRuleError as e:
+                errors.append(f"{i}行目: {e}")
+    return errors
+
+
+def _lines(text: str) -> Iterator[Tuple[int, int]]:
+    start = 0
+    n = len(text)
+    while start <= n:
+        end = text.find("\n", start)
+        if end == -1:
+            end = n
+        if end > start:
+            yield start, end
+        start = end + 1
+
+
+class RegexRules:
+    """The regex rules of a table, compiled into one alternation."""
+
+    def __init__(self, entries: Sequence[Tuple[int, str]]):
+        # Rows with the same pattern share one group and are all reported
+        groups: Dict[str, List[int]] = {}
+        for rule_id, pattern in entries:
+            if pattern:
+                groups.setdefault(pattern, []).append(rule_id)
+        self._patterns = list(groups)
+        self._group_rules = [groups[p] for p in self._patterns]
+        self._singles: Dict[int, "re.Pattern"] = {}
+        for pattern in self._patterns:
+            validate_pattern(pattern)
+        self._combined = (
+            re.compile("|".join(f"(?P<g{i}>{p})" for i, p in enumerate(self._patterns)), LINE_FLAGS)
+            if self._patterns
+            else None
+        )
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def __bool__(self) -> bool:
+        return bool(self._patterns)
+
+    def scan(self, text: str, budget: Optional[MatchBudget] = None) -> Iterator[Tuple[int, int, int]]:
+        """(rule_id, start, end) of every regex hit, line by line, within the budget."""
+        if self._combined is None:
+            return
+        budget = budget or MatchBudget()
+        finditer = self._combined.finditer
+        group_rules = self._group_rules
+        for start, end in _lines(text):
+            if budget.exceeded:
+                return
+            t0 = time.perf_counter()
+            hits = [(int(m.lastgroup[1:]), m.start(), m.end()) for m in finditer(text, start, end)]
+            budget.spent += time.perf_counter() - t0
+            for g, s, e in hits:
+                for rule_id in group_rules[g]:
+                    yield rule_id, s, e
+            if budget.spent > budget.seconds:
+                budget.exceeded = True
+                logger.warning("regex rules ran out of their %.2gs budget; later lines were not checked", budget.seconds)
+
+    def profile(self, text: str, budget_per_rule: float = DEFAULT_BUDGET) -> List[RuleTiming]:
+        """Time each pattern on its own over `text` (diagnostics; the check itself runs them combined)."""
+        timings = []
+        for pattern, rule_ids in zip(self._patterns, self._group_rules):
+            compiled = self._singles.get(rule_ids[0])
+            if compiled is None:
+                compiled = self._singles[rule_ids[0]] = re.compile(pattern, LINE_FLAGS)
+            spent = 0.0
+            hits = 0
+            timed_out = False
+            for start, end in _lines(text):
+                t0 = time.perf_counter()
+                hits += sum(1 for _ in compiled.finditer(text, start, end))
+                spent += time.perf_counter() - t0
+                if spent > budget_per_rule:
+                    timed_out = True
+                    break
+            timings.extend(RuleTiming(rule_id, spent, hits, timed_out) for rule_id in rule_ids)
+        return timings
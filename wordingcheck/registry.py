@@ -0,0 +1,151 @@
+"""
+Process-wide registry of the published rule version.
+
+Every Streamlit session reads the same immutable snapshot (rule table frame
+and compiled matcher) instead of keeping its own copy. Publishing saves to
+the rule store, builds the next snapshot and swaps one reference, so readers
+never lock and never see a half-built version; a session only holds a
+private table while it has unsaved edits. Snapshots are stamped with the
+store version, which is how sessions notice that someone else published.
+"""
+import threading
+import time
+from typing import Callable, List, Optional
+
+from .matcher import Rule, RuleMatcher
+from .rulebook import validate_rule_frame
+from .store import WORD_TABLE, RuleStore, default_store
+
+
+class RuleSnapshot:
+    """One published rule version, shared read-only by every session."""
+
+    __slots__ = ("store", "version", "matcher", "error", "published")
+
+    def __init__(self, store: RuleStore, version: int):
+        self.store = store
+        self.version = version
+        self.published = time.time()
+        self.error: Optional[str] = None
+        self.matcher: Optional[RuleMatcher] = None
+        try:
+            # Process cache, then the prebuilt blob in the store, then a build
+            self.matcher = store.matcher(version)
+        except (KeyError, ValueError) as e:
+            # Missing columns, or a regex rule saved before it would have been rejected
+            self.error = str(e.args[0]) if e.args else str(e)
+
+    def __repr__(self) -> str:
+        return f"RuleSnapshot(version={self.version}, rules={len(self.rules)})"
+
+    @property
+    def rules(self) -> List[Rule]:
+        return self.matcher.rules if self.matcher is not None else []
+
+    @property
+    def digest(self) -> Optional[str]:
+        return self.matcher.version if self.matcher is not None else None
+
+    @property
+    def frame(self):
+        """The rule table as a DataFrame, one object per version. Never mutate it."""
+        return self.store.load_frame(WORD_TABLE, self.version)
+
+
+class RuleRegistry:
+    """Copy-on-write holder of the current RuleSnapshot.
+
+    `current()` also notices versions published by other processes (the CLI,
+    the HTTP service) by looking at the store's head at most every
+    `check_interval` seconds.
+    """
+
+    def __init__(self, store: RuleStore, check_interval: float = 2.0):
+        self.store = store
+        self.check_interval = check_interval
+        self._snapshot: Optional[RuleSnapshot] = None
+        self._loaded = False
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._listeners: List[Callable[[Optional[RuleSnapshot]], None]] = []
+
+    def current(self) -> Optional[RuleSnapshot]:
+        """The published snapshot (None when no rules are saved)."""
+        if not self._loaded or time.monotonic() - self._checked > self.check_interval:
+            return self.refresh()
+        return self._snapshot
+
+    @property
+    def version(self) -> Optional[int]:
+        snap = self.current()
+        return None if snap is None else snap.version
+
+    def refresh(self) -> Optional[RuleSnapshot]:
+        """Re-read the store head and swap in a new snapshot if it moved."""
+        with self._lock:
+            self._checked = time.monotonic()
+            head = self.store.head(WORD_TABLE)
+            old = self._snapshot
+            if self._loaded and (old.version if old else None) == head:
+                return old
+            snap = None if head is None else RuleSnapshot(self.store, head)
+            self._snapshot = snap
+            self._loaded = True
+            self._changed.notify_all()
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(snap)
+            except Exception:
+                pass
+        return snap
+
+    def publish(self, df, note: str = "") -> Optional[RuleSnapshot]:
+        """Save a rule table as the new version and make it current for every session.
+
+        Raises RuleSchemaError (nothing is saved) for missing columns or a
+        regex rule that validate_pattern rejects.
+        """
+        validate_rule_frame(df)
+        self.store.save_frame(WORD_TABLE, df, note)
+        return self.refresh()
+
+    def rollback(self, version: int) -> Optional[RuleSnapshot]:
+        self.store.rollback(WORD_TABLE, version)
+        return self.refresh()
+
+    def delete(self) -> None:
+        self.store.delete(WORD_TABLE)
+        self.refresh()
+
+    def subscribe(self, callback: Callable[[Optional[RuleSnapshot]], None]) -> Callable[[], None]:
+        """Call `callback(snapshot)` after every swap; returns an unsubscribe function."""
+        with self._lock:
+            self._listeners.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._listeners:
+                    self._listeners.remove(callback)
+
+        return unsubscribe
+
+    def wait_for_change(self, version: Optional[int], timeout: Optional[float] = None) -> Optional[RuleSnapshot]:
+        """Block until the published version differs from `version` (or timeout)."""
+        with self._changed:
+            self._changed.wait_for(lambda: (self._snapshot.version if self._snapshot else None) != version, timeout)
+            return self._snapshot
+
+
+_registry: Optional[RuleRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def rule_registry() -> RuleRegistry:
+    """The registry over the default rule store, shared by the whole process."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = RuleRegistry(default_store())
+        return _registry
@@ -0,0 +1,85 @@
+"""
+Rule workbook import.
+
+The PTA rule workbook holds the 誤表記/正表記 table on its first sheet plus
+two reference sheets. The workbook is opened once (read-only) and every known
+sheet is parsed from that one handle; results are cached by file hash, so
+importing the same file again does not parse anything.
+"""
+import time
+from io import BytesIO
+from typing import Dict, List, NamedTuple, Optional
+
+from .cache import LRUCache, content_digest
+from .matcher import CORRECT_COLUMN, TYPO_COLUMN, rules_from_frame
+from .regexrules import validate_rules
+
+LETTER_SHEET = "2.書式と運用ルール"
+GREETING_SHEET = "3.時候の挨拶"
+
+
+class RuleSchemaError(ValueError):
+    """The rule sheet lacks the 誤表記/正表記 columns or has a rejected regex rule."""
+
+
+class RuleBook(NamedTuple):
+    digest: str
+    word: object  # DataFrame from the first sheet
+    letter: Optional[object]  # None when the sheet is missing
+    greeting: Optional[object]
+    timings: Dict[str, float]  # sheet name -> parse seconds
+    missing: List[str]  # known sheets not found in the workbook
+
+
+def validate_rule_frame(df) -> None:
+    missing = [c for c in (TYPO_COLUMN, CORRECT_COLUMN) if c not in df.columns]
+    if missing:
+        found = "、".join(map(str, df.columns[:6])) or "なし"
+        raise RuleSchemaError(f"最初のシートに {'・'.join(missing)} 列がありません（見つかった列: {found}）")
+    errors = validate_rules(rules_from_frame(df))
+    if errors:
+        raise RuleSchemaError("使えない正規表現ルールがあります: " + " / ".join(errors))
+
+
+def read_rule_workbook(data: bytes, name: str = "") -> RuleBook:
+    """Parse the rule sheet and both reference sheets from a single open workbook."""
+    import pandas as pd
+
+    engine = "xlrd" if name.lower().endswith(".xls") else None
+    timings: Dict[str, float] = {}
+    t0 = time.perf_counter()
+    with pd.ExcelFile(BytesIO(data), engine=engine) as book:
+        timings["(open)"] = time.perf_counter() - t0
+        sheets = book.sheet_names
+        if not sheets:
+            raise RuleSchemaError("ワークブックにシートがありません")
+
+        def parse(sheet):
+            t = time.perf_counter()
+            df = book.parse(sheet)
+            timings[sheet] = time.perf_counter() - t
+            return df
+
+        word = parse(sheets[0])
+        validate_rule_frame(word)
+        letter = parse(LETTER_SHEET) if LETTER_SHEET in sheets else None
+        greeting = parse(GREETING_SHEET) if GREETING_SHEET in sheets else None
+    missing = [s for s in (LETTER_SHEET, GREETING_SHEET) if s not in sheets]
+    return RuleBook(content_digest(data), word, letter, greeting, timings, missing)
+
+
+# Parsed workbooks by content hash; re-importing an unchanged file is a lookup
+rulebook_cache = LRUCache(maxsize=4)
+
+
+def import_rule_workbook(data: bytes, name: str = "") -> RuleBook:
+    """Cached `read_rule_workbook`: the same bytes are parsed only once per process.
+
+    Callers get shared frames and should copy them before editing.
+    """
+    key = (content_digest(data), name.lower().endswith(".xls"))
+    return rulebook_cache.get_or_build(key, lambda: read_rule_workbook(data, name))
+
+
+def format_timings(timings: Dict[str, float]) -> str:
+    return " / ".join(f"{sheet}: {sec * 1000:.0f}ms" for sheet, sec in timings.items())
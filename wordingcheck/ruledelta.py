@@ -0,0 +1,165 @@
+"""
+Delta re-evaluation after rule edits.
+
+Rules are identified by a hash of the (誤表記, 正表記) row, so an edit in the
+data editor becomes a small set of added and removed rows. Hits of unchanged
+rules are kept and renumbered; only added rules are looked up in the
+document, through a per-document character index, and the findings are
+patched rather than rebuilt.
+"""
+import hashlib
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from .document import TextDocument
+from .findings import Findings
+from .matcher import Rule, allow_contexts
+from .normalize import Normalizer
+from .regexrules import MatchBudget, RegexRules
+
+
+def rule_key(rule: Rule) -> bytes:
+    kind = "\x1dre" if rule.regex else ""
+    allow = "\x1d" + "\x1c".join(rule.allow) if rule.allow else ""
+    return hashlib.blake2b(f"{rule.typo}\x1f{rule.correct}{kind}{allow}".encode("utf-8"), digest_size=12).digest()
+
+
+class RuleDelta(NamedTuple):
+    added: List[int]  # ids in the new table
+    removed: List[int]  # ids in the old table
+    kept: Dict[int, int]  # old id -> new id for unchanged rows
+
+    @property
+    def modified(self) -> int:
+        """Rows edited in place: a removal and an addition at the same position."""
+        return len(set(self.added) & set(self.removed))
+
+    def summary(self) -> str:
+        m = self.modified
+        return f"追加 {len(self.added) - m} / 変更 {m} / 削除 {len(self.removed) - m}"
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or any(o != n for o, n in self.kept.items()))
+
+
+def diff_rules(old: Sequence[Rule], new: Sequence[Rule]) -> RuleDelta:
+    """Match rows by content hash; duplicates pair up in table order."""
+    by_key: Dict[bytes, List[int]] = defaultdict(list)
+    for i, rule in enumerate(old):
+        by_key[rule_key(rule)].append(i)
+    for ids in by_key.values():
+        ids.reverse()
+    kept: Dict[int, int] = {}
+    added: List[int] = []
+    for j, rule in enumerate(new):
+        ids = by_key.get(rule_key(rule))
+        if ids:
+            kept[ids.pop()] = j
+        else:
+            added.append(j)
+    removed = sorted(i for ids in by_key.values() for i in ids)
+    return RuleDelta(added, removed, kept)
+
+
+class DocumentIndex:
+    """Character -> sorted positions index over one document.
+
+    Looking up a new 誤表記 only verifies the positions of its rarest
+    character, instead of scanning the whole text again. With a normalizer
+    (the matcher's), the index covers the normalized text and spans are
+    mapped back to the original.
+    """
+
+    def __init__(self, doc: TextDocument, normalizer: Optional[Normalizer] = None):
+        self.doc = doc
+        self.normalizer = normalizer
+        self._normalized = normalizer.normalize(doc.text) if normalizer is not None else None
+        self._text = self._normalized.text if normalizer is not None else doc.text
+        positions: Dict[str, array] = {}
+        for i, ch in enumerate(self._text):
+            arr = positions.get(ch)
+            if arr is None:
+                arr = positions[ch] = array("i")
+            arr.append(i)
+        self._positions = positions
+
+    def find_all(self, pattern: str) -> List[int]:
+        """Start offsets of every (possibly overlapping) occurrence of `pattern`."""
+        if not pattern:
+            return []
+        counts = [(len(self._positions.get(ch, ())), k) for k, ch in enumerate(pattern)]
+        n, k = min(counts)
+        if n == 0:
+            return []
+        text = self._text
+        candidates = self._positions[pattern[k]]
+        lo = bisect_left(candidates, k)
+        return [p - k for p in candidates[lo:] if text.startswith(pattern, p - k)]
+
+    def find_spans(self, typo: str) -> List[Tuple[int, int]]:
+        """(start, end) in the original text of every occurrence of a 誤表記."""
+        if self.normalizer is None:
+            return [(s, s + len(typo)) for s in self.find_all(typo)]
+        pattern = self.normalizer.fold(typo)
+        span = self._normalized.span
+        return [span(s, s + len(pattern)) for s in self.find_all(pattern)]
+
+    def find_allowed_spans(self, rule: Rule) -> List[Tuple[int, int]]:
+        """find_spans(rule.typo) minus occurrences inside one of the rule's allowed contexts."""
+        spans = self.find_spans(rule.typo)
+        fold = self.normalizer.fold if self.normalizer is not None else str
+        covers = [c for context in allow_contexts(rule, fold) for c in self.find_spans(context)]
+        if not covers:
+            return spans
+        return [(s, e) for s, e in spans if not any(cs <= s and e <= ce for cs, ce in covers)]
+
+
+def patch_findings(findings: Findings, new_rules: Sequence[Rule], index: DocumentIndex) -> Findings:
+    """Findings for `new_rules` derived from findings computed with the old rules.
+
+    Only text-document findings can be patched (workbook findings are per cell),
+    and `index` must use the same normalizer as the matcher of `findings`.
+    """
+    delta = diff_rules(findings.rules, new_rules)
+    doc = index.doc
+    remap = [-1] * len(findings.rules)
+    for old_id, new_id in delta.kept.items():
+        remap[old_id] = new_id
+
+    # Hits of added rules, sorted by end offset like the existing findings;
+    # added regex rules are scanned together over the original text
+    extra = []
+    for rule_id in delta.added:
+        rule = new_rules[rule_id]
+        if not rule.regex:
+            extra.extend((end, rule_id, start) for start, end in index.find_allowed_spans(rule))
+    budget = MatchBudget()
+    regex = RegexRules([(i, new_rules[i].typo) for i in delta.added if new_rules[i].regex])
+    extra.extend((end, rule_id, start) for rule_id, start, end in regex.scan(doc.text, budget))
+    extra.sort()
+
+    patched = Findings(new_rules)
+    patched.incomplete = findings.incomplete or budget.exceeded
+    if not extra and not delta.removed:
+        # Pure reordering: renumber rule ids, share nothing else
+        patched.rule_ids = array("i", [remap[r] for r in findings.rule_ids])
+        patched.starts = array("q", findings.starts)
+        patched.ends = array("q", findings.ends)
+        patched.lines = array("i", findings.lines)
+        return patched
+
+    append = patched.append
+    k = 0
+    for rule_id, start, end, line in zip(findings.rule_ids, findings.starts, findings.ends, findings.lines):
+        while k < len(extra) and extra[k][0] < end:
+            e, r, s = extra[k]
+            append(r, s, e, doc.line_of(s))
+            k += 1
+        new_id = remap[rule_id]
+        if new_id >= 0:
+            append(new_id, start, end, line)
+    for e, r, s in extra[k:]:
+        append(r, s, e, doc.line_of(s))
+    return patched
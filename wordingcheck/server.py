@@ -0,0 +1,364 @@
+"""
+Local HTTP checking service: python -m wordingcheck serve [--port 8765]
+
+Lets other office tools (the mail-merge script, template macros) run the
+same check as the Streamlit page, using only the standard library:
+
+    GET  /health        rule version and count
+    POST /check         one document: JSON {"text": ...} or {"name": ..., "content": <base64>},
+                        a text/plain body, or raw file bytes with ?name=notice.docx
+    POST /check/batch   JSON {"items": [<as for /check>, ...]}
+
+The compiled rules stay in the process and come from the rule registry, so
+a version published from the rules page or the CLI is picked up within a
+couple of seconds. Requests are parsed in their own threads, but the text
+scans go through one ScanBatcher thread: whatever texts are waiting when it
+becomes free are joined and walked through the automaton in a single pass,
+so under load many small requests cost one scan instead of contending for
+the GIL one by one.
+"""
+import base64
+import heapq
+import json
+import logging
+import queue
+import threading
+import time
+from bisect import bisect_right
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from .document import TextDocument
+from .encoding import decode_bytes
+from .excel import iter_cells
+from .findings import Findings
+from .matcher import RuleMatcher
+from .parsers import UnsupportedFormat, extract_text
+from .regexrules import MatchBudget
+from .registry import RuleRegistry, RuleSnapshot
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY = 50 * 1024 * 1024
+# Texts of one shared scan are joined with this; NUL never occurs in a rule,
+# so no 誤表記 can match across it, and the line break keeps each text
+# starting on a line of its own for normalization
+SEPARATOR = "\x00\n"
+MAX_BATCH_ITEMS = 64
+MAX_BATCH_CHARS = 4 * 1024 * 1024
+RESULT_TIMEOUT = 120
+
+
+class RequestError(ValueError):
+    """A request the service can't handle; `status` is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class ScanResult(NamedTuple):
+    hits: List[Tuple[int, int, int]]  # rule_id, start, end within the submitted text, ordered by end
+    incomplete: bool
+
+
+class _Pending(NamedTuple):
+    matcher: RuleMatcher
+    text: str
+    future: Future
+
+
+class ScanBatcher:
+    """One scanning thread that serves queued texts in shared passes.
+
+    There is no waiting window: a text submitted while the thread is idle is
+    scanned at once, and texts that queue up during a scan are joined into
+    the next one.
+    """
+
+    def __init__(self, max_items: int = MAX_BATCH_ITEMS, max_chars: int = MAX_BATCH_CHARS):
+        self.max_items = max_items
+        self.max_chars = max_chars
+        self.batches = 0
+        self.texts = 0
+        # Guards batches/texts so stats() never sees one updated without the other
+        self._stats_lock = threading.Lock()
+        self._queue: "queue.Queue[_Pending]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="wordingcheck-scan", daemon=True)
+        self._thread.start()
+
+    def submit(self, matcher: RuleMatcher, text: str) -> "Future[ScanResult]":
+        future: Future = Future()
+        self._queue.put(_Pending(matcher, text, future))
+        return future
+
+    def stats(self) -> Tuple[int, int]:
+        """(shared scans run, texts scanned) so far."""
+        with self._stats_lock:
+            return self.batches, self.texts
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            chars = len(batch[0].text)
+            while len(batch) < self.max_items and chars < self.max_chars:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+                chars += len(item.text)
+            # A rule version published mid-batch gives two groups
+            groups = {}
+            for item in batch:
+                groups.setdefault(id(item.matcher), []).append(item)
+            for items in groups.values():
+                try:
+                    results = scan_texts(items[0].matcher, [item.text for item in items])
+                except Exception as e:
+                    for item in items:
+                        item.future.set_exception(e)
+                    continue
+                for item, result in zip(items, results):
+                    item.future.set_result(result)
+            with self._stats_lock:
+                self.batches += 1
+                self.texts += len(batch)
+
+
+def scan_texts(matcher: RuleMatcher, texts: List[str]) -> List[ScanResult]:
+    """Hits per text, with all literal rules matched in one pass over the joined texts.
+
+    Regex rules run per text (under their own budget), since anchors and
+    line-by-line matching depend on where a text starts.
+    """
+    starts = []
+    pos = 0
+    for text in texts:
+        starts.append(pos)
+        pos += len(text) + len(SEPARATOR)
+    literal: List[List[Tuple[int, int, int]]] = [[] for _ in texts]
+    for rule_id, start, end in matcher.literal_matches(SEPARATOR.join(texts)):
+        i = bisect_right(starts, start) - 1
+        base = starts[i]
+        # Hits reaching into the separator (a 誤表記 starting with a line break) are dropped
+        if end - base <= len(texts[i]):
+            literal[i].append((rule_id, start - base, end - base))
+    results = []
+    for text, hits in zip(texts, literal):
+        budget = MatchBudget()
+        if matcher.regex:
+            hits = list(heapq.merge(hits, matcher.regex.scan(text, budget), key=lambda hit: hit[2]))
+        results.append(ScanResult(hits, budget.exceeded))
+    return results
+
+
+def finding_rows(findings: Findings, doc: Optional[TextDocument]) -> List[dict]:
+    """The page's finding rows plus offsets, in text order."""
+    order = findings.order()
+    rows = findings.rows(order, doc)
+    for i, row in zip(order, rows):
+        row.update(start=findings.starts[i], end=findings.ends[i], line=findings.lines[i])
+    return rows
+
+
+class CheckService:
+    """Request handling independent of HTTP: items in, JSON-ready results out."""
+
+    def __init__(self, registry: RuleRegistry, batcher: Optional[ScanBatcher] = None):
+        self.registry = registry
+        self.batcher = batcher or ScanBatcher()
+        self.started = time.time()
+
+    def snapshot(self) -> RuleSnapshot:
+        """The current rules; the registry swaps in a newly published version by itself."""
+        snap = self.registry.current()
+        if snap is None:
+            raise RequestError("ルールが保存されていません", 503)
+        if snap.matcher is None:
+            raise RequestError(snap.error or "ルールを読み込めません", 503)
+        return snap
+
+    def health(self) -> dict:
+        snap = self.registry.current()
+        scans, texts = self.batcher.stats()
+        return {
+            "status": "ok",
+            "rule_version": snap.version if snap else None,
+            "rules": len(snap.rules) if snap else 0,
+            "scans": scans,
+            "texts": texts,
+            "uptime": round(time.time() - self.started, 1),
+        }
+
+    def check(self, items: List[dict]) -> List[dict]:
+        """Results in item order; all texts are queued before waiting, so they can share one scan."""
+        snap = self.snapshot()
+        matcher = snap.matcher
+        prepared = []
+        for item in items:
+            try:
+                prepared.append(self._prepare(item, matcher))
+            except (RequestError, UnsupportedFormat) as e:
+                prepared.append(str(e))
+            except Exception as e:
+                # One unreadable file fails only its own item
+                prepared.append(f"{type(e).__name__}: {e}")
+        results = []
+        for item, prep in zip(items, prepared):
+            name = item.get("name", "") if isinstance(item, dict) else ""
+            if isinstance(prep, str):
+                results.append({"name": name, "error": prep, "count": 0, "findings": []})
+                continue
+            doc, found = prep
+            if isinstance(found, Future):
+                scan = found.result(timeout=RESULT_TIMEOUT)
+                found = Findings(matcher.rules)
+                for rule_id, start, end in scan.hits:
+                    found.append(rule_id, start, end, doc.line_of(start))
+                found.incomplete = scan.incomplete
+            results.append(
+                {
+                    "name": name,
+                    "error": None,
+                    "rule_version": snap.version,
+                    "count": len(found),
+                    "incomplete": found.incomplete,
+                    "summary": found.summary_lines(),
+                    "findings": finding_rows(found, doc),
+                }
+            )
+        return results
+
+    def _prepare(self, item: dict, matcher: RuleMatcher):
+        # (doc, Future of its scan), or (None, Findings) for a workbook
+        if not isinstance(item, dict):
+            raise RequestError("各項目は {\"text\": ...} または {\"name\": ..., \"content\": ...} の形式で指定してください")
+        name = str(item.get("name") or "")
+        if "text" in item:
+            doc = TextDocument(str(item["text"]), name)
+        elif "content" in item or "bytes" in item:
+            data = item["bytes"] if "bytes" in item else _b64(item["content"])
+            if name.lower().endswith((".xlsx", ".xls")):
+                # Cells are checked one by one, in this request's thread
+                return None, Findings.from_cells(iter_cells(data, name), matcher)
+            if not name:
+                raise RequestError("ファイルには name（拡張子つきのファイル名）が必要です")
+            doc = TextDocument(extract_text(name, data), name)
+        else:
+            raise RequestError("text または content を指定してください")
+        return doc, self.batcher.submit(matcher, doc.text)
+
+
+def _b64(value) -> bytes:
+    try:
+        return base64.b64decode(value, validate=True)
+    except (TypeError, ValueError):
+        raise RequestError("content は base64 で指定してください") from None
+
+
+class CheckHandler(BaseHTTPRequestHandler):
+    server_version = "wordingcheck"
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; without this, keep-alive clients
+    # wait out a delayed ACK (~40ms) on every response
+    disable_nagle_algorithm = True
+
+    @property
+    def service(self) -> CheckService:
+        return self.server.service
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/health":
+            self._send(200, self.service.health())
+        else:
+            self._send(404, {"error": f"not found: {path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        try:
+            body = self._body()
+            if url.path == "/check":
+                item = self._item(body, parse_qs(url.query))
+                self._send(200, self.service.check([item])[0])
+            elif url.path == "/check/batch":
+                payload = _json(body)
+                items = payload.get("items") if isinstance(payload, dict) else None
+                if not isinstance(items, list):
+                    raise RequestError("{\"items\": [...]} の形式で送ってください")
+                self._send(200, {"results": self.service.check(items)})
+            else:
+                self._send(404, {"error": f"not found: {url.path}"})
+        except RequestError as e:
+            self._send(e.status, {"error": str(e)})
+        except Exception as e:
+            logger.exception("request failed")
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def _body(self) -> bytes:
+        value = (self.headers.get("Content-Length") or "0").strip()
+        # int() alone would take "-1" (rfile.read(-1) waits for the client to hang up) or "+5"
+        if not (value.isascii() and value.isdigit()):
+            # The body is left unread, so the connection can't carry another request
+            self.close_connection = True
+            raise RequestError("Content-Length が不正です")
+        length = int(value)
+        if length > MAX_BODY:
+            self.close_connection = True
+            raise RequestError(f"リクエストが大きすぎます（上限 {MAX_BODY // (1024 * 1024)}MB）", 413)
+        return self.rfile.read(length)
+
+    def _item(self, body: bytes, query: dict) -> dict:
+        content_type = self.headers.get("Content-Type", "")
+        name = (query.get("name") or [self.headers.get("X-Filename", "")])[0]
+        if content_type.startswith("application/json"):
+            item = _json(body)
+            if isinstance(item, dict) and name and "name" not in item:
+                item["name"] = name
+            return item
+        if content_type.startswith("text/plain"):
+            return {"name": name, "text": decode_bytes(body, content_type)[0]}
+        if not name:
+            raise RequestError("ファイルを送るときは ?name=ファイル名 を付けてください")
+        return {"name": name, "bytes": body}
+
+    def _send(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _json(body: bytes):
+    try:
+        return json.loads(body.decode("utf-8"))
+    except (UnicodeDecodeError, ValueError):
+        raise RequestError("JSON として読み取れません") from None
+
+
+class CheckServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 refuses connections when a burst of clients connects at once
+    request_queue_size = 128
+
+    def __init__(self, address, service: CheckService):
+        super().__init__(address, CheckHandler)
+        self.service = service
+
+
+def make_server(registry: RuleRegistry, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> CheckServer:
+    """A ready-to-serve HTTP server (call serve_forever); port 0 picks a free one."""
+    service = CheckService(registry)
+    # Compile (or load) the current rules now rather than on the first request
+    registry.current()
+    return CheckServer((host, port), service)
@@ -0,0 +1,324 @@
+"""
+Versioned rule store on SQLite.
+
+Replaces the DataFrame pickles in data/. Every save of a table (the rule
+table and the two reference sheets) adds a row to `versions` in a single
+transaction, and `head` points at the current one, so earlier versions stay
+available for rollback. The compiled matcher of a rule version can be kept
+next to it, which lets a fresh process start checking without rebuilding the
+automaton. Reading rules needs only sqlite3 and json, not pandas.
+"""
+import contextlib
+import hashlib
+import json
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional, Sequence
+
+from .cache import LRUCache, matcher_cache, matcher_key
+from .matcher import (
+    ALLOW_COLUMN,
+    CORRECT_COLUMN,
+    RULE_TYPE_COLUMN,
+    TYPO_COLUMN,
+    Rule,
+    RuleMatcher,
+    _cell_str,
+    split_allow,
+)
+from .regexrules import is_regex_kind
+from .normalize import DEFAULT_NORMALIZER, Normalizer
+
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+DEFAULT_STORE_PATH = DATA_DIR / "rules.sqlite3"
+
+WORD_TABLE = "word"
+LETTER_TABLE = "letter"
+GREETING_TABLE = "greeting"
+
+# Pickles written by earlier versions of the pages; imported once into an empty store
+LEGACY_PICKLES = {
+    WORD_TABLE: DATA_DIR / "df_word_rule.pkl",
+    LETTER_TABLE: DATA_DIR / "df_rule_letter.pkl",
+    GREETING_TABLE: DATA_DIR / "df_rule_greeting.pkl",
+}
+
+# Versions kept per table; the current one is never pruned
+HISTORY_LIMIT = 50
+MATCHER_LIMIT = 8
+# Bump when RuleMatcher's attributes (or what it compiles into them) change;
+# blobs of other formats are ignored
+MATCHER_FORMAT = 7
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    created REAL NOT NULL,
+    digest TEXT NOT NULL,
+    note TEXT NOT NULL DEFAULT '',
+    n_rows INTEGER NOT NULL,
+    columns TEXT NOT NULL,
+    rows TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS versions_name ON versions (name, id);
+CREATE TABLE IF NOT EXISTS head (
+    name TEXT PRIMARY KEY,
+    version INTEGER REFERENCES versions (id)
+);
+CREATE TABLE IF NOT EXISTS matchers (
+    digest TEXT PRIMARY KEY,
+    format INTEGER NOT NULL,
+    created REAL NOT NULL,
+    blob BLOB NOT NULL
+);
+"""
+
+
+class TableVersion(NamedTuple):
+    version: int
+    name: str
+    created: float
+    digest: str
+    note: str
+    columns: List[str]
+    rows: List[list]
+
+
+class VersionInfo(NamedTuple):
+    version: int
+    created: float
+    note: str
+    n_rows: int
+    current: bool
+
+    def label(self) -> str:
+        stamp = time.strftime("%Y-%m-%d %H:%M", time.localtime(self.created))
+        mark = "（現在）" if self.current else ""
+        note = f" {self.note}" if self.note else ""
+        return f"v{self.version} {stamp}{note} {self.n_rows}行{mark}"
+
+
+def _json_cell(value):
+    # Plain JSON values; NaN/None become null, numpy scalars their Python value
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    if hasattr(value, "item") and not isinstance(value, (str, bytes)):
+        value = value.item()
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+class RuleStore:
+    """Tables stored as JSON rows per version, with a movable head per table."""
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with contextlib.closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            # Readers (other sessions, the CLI) never block on a writer
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _query(self, sql: str, params: Sequence = ()) -> list:
+        with contextlib.closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def head(self, name: str) -> Optional[int]:
+        row = self._query("SELECT version FROM head WHERE name = ?", (name,))
+        return row[0][0] if row else None
+
+    def save(self, name: str, columns: Sequence[str], rows: Sequence[Sequence], note: str = "") -> int:
+        """Store a new version and make it current; saving identical content is a no-op."""
+        columns = [str(c) for c in columns]
+        rows = [[_json_cell(v) for v in row] for row in rows]
+        columns_json = json.dumps(columns, ensure_ascii=False)
+        rows_json = json.dumps(rows, ensure_ascii=False)
+        digest = hashlib.sha256(f"{columns_json}\x1e{rows_json}".encode("utf-8")).hexdigest()
+        with self._transaction() as conn:
+            current = conn.execute(
+                "SELECT v.id, v.digest FROM head h JOIN versions v ON v.id = h.version WHERE h.name = ?", (name,)
+            ).fetchone()
+            if current and current[1] == digest:
+                return current[0]
+            version = conn.execute(
+                "INSERT INTO versions (name, created, digest, note, n_rows, columns, rows) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (name, time.time(), digest, note, len(rows), columns_json, rows_json),
+            ).lastrowid
+            conn.execute("INSERT OR REPLACE INTO head (name, version) VALUES (?, ?)", (name, version))
+            conn.execute(
+                "DELETE FROM versions WHERE name = ? AND id NOT IN "
+                "(SELECT id FROM versions WHERE name = ? ORDER BY id DESC LIMIT ?)",
+                (name, name, HISTORY_LIMIT),
+            )
+        return version
+
+    def save_frame(self, name: str, df, note: str = "") -> int:
+        return self.save(name, df.columns, df.itertuples(index=False, name=None), note)
+
+    def load(self, name: str, version: Optional[int] = None) -> Optional[TableVersion]:
+        """The current version of `name` (or a specific one); None if there is none."""
+        if version is None:
+            version = self.head(name)
+            if version is None:
+                return None
+        row = self._query(
+            "SELECT id, name, created, digest, note, columns, rows FROM versions WHERE id = ? AND name = ?",
+            (version, name),
+        )
+        if not row:
+            return None
+        vid, name, created, digest, note, columns, rows = row[0]
+        return TableVersion(vid, name, created, digest, note, json.loads(columns), json.loads(rows))
+
+    def load_frame(self, name: str, version: Optional[int] = None):
+        """Version as a DataFrame, read once per version. Callers must copy before editing."""
+        if version is None:
+            version = self.head(name)
+            if version is None:
+                return None
+
+        def build():
+            import pandas as pd
+
+            table = self.load(name, version)
+            return None if table is None else pd.DataFrame(table.rows, columns=table.columns)
+
+        return frame_cache.get_or_build((str(self.path), name, version), build)
+
+    def load_rules(self, version: Optional[int] = None) -> Optional[List[Rule]]:
+        """Rules (誤表記, 正表記, regex flag, allowed contexts) of the rule table, without pandas."""
+        table = self.load(WORD_TABLE, version)
+        if table is None:
+            return None
+        if TYPO_COLUMN not in table.columns or CORRECT_COLUMN not in table.columns:
+            raise KeyError(f"'{TYPO_COLUMN}' または '{CORRECT_COLUMN}' 列が見つかりません")
+        t, c = table.columns.index(TYPO_COLUMN), table.columns.index(CORRECT_COLUMN)
+        k = table.columns.index(RULE_TYPE_COLUMN) if RULE_TYPE_COLUMN in table.columns else None
+        a = table.columns.index(ALLOW_COLUMN) if ALLOW_COLUMN in table.columns else None
+        return [
+            Rule(
+                _cell_str(row[t]),
+                _cell_str(row[c]),
+                k is not None and is_regex_kind(_cell_str(row[k])),
+                split_allow(_cell_str(row[a])) if a is not None else (),
+            )
+            for row in table.rows
+        ]
+
+    def history(self, name: str) -> List[VersionInfo]:
+        """Stored versions of `name`, newest first."""
+        head = self.head(name)
+        rows = self._query("SELECT id, created, note, n_rows FROM versions WHERE name = ? ORDER BY id DESC", (name,))
+        return [VersionInfo(vid, created, note, n_rows, vid == head) for vid, created, note, n_rows in rows]
+
+    def rollback(self, name: str, version: int) -> None:
+        """Make an earlier version current again; later versions are kept."""
+        with self._transaction() as conn:
+            if not conn.execute("SELECT 1 FROM versions WHERE id = ? AND name = ?", (version, name)).fetchone():
+                raise KeyError(f"{name} にバージョン {version} はありません")
+            conn.execute("INSERT OR REPLACE INTO head (name, version) VALUES (?, ?)", (name, version))
+
+    def delete(self, name: str) -> None:
+        """Clear the current version; the history stays available for rollback."""
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO head (name, version) VALUES (?, NULL)", (name,))
+
+    def save_matcher(self, matcher: RuleMatcher) -> str:
+        """Store a compiled matcher under its version (rules digest and normalizer)."""
+        digest = matcher.version or matcher_key(matcher.rules, matcher.normalizer)
+        blob = pickle.dumps(matcher, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO matchers (digest, format, created, blob) VALUES (?, ?, ?, ?)",
+                (digest, MATCHER_FORMAT, time.time(), blob),
+            )
+            conn.execute(
+                "DELETE FROM matchers WHERE digest NOT IN (SELECT digest FROM matchers ORDER BY created DESC LIMIT ?)",
+                (MATCHER_LIMIT,),
+            )
+        return digest
+
+    def load_matcher(self, digest: str) -> Optional[RuleMatcher]:
+        row = self._query("SELECT blob FROM matchers WHERE digest = ? AND format = ?", (digest, MATCHER_FORMAT))
+        if not row:
+            return None
+        try:
+            matcher = pickle.loads(row[0][0])
+        except Exception:
+            return None
+        matcher.version = digest
+        return matcher
+
+    def matcher(
+        self, version: Optional[int] = None, normalizer: Optional[Normalizer] = DEFAULT_NORMALIZER
+    ) -> Optional[RuleMatcher]:
+        """Compiled matcher for a rule version: process cache, then the stored blob, then a build."""
+        rules = self.load_rules(version)
+        if rules is None:
+            return None
+        digest = matcher_key(rules, normalizer)
+
+        def build():
+            matcher = self.load_matcher(digest)
+            if matcher is None:
+                matcher = RuleMatcher(rules, normalizer)
+                matcher.version = digest
+                self.save_matcher(matcher)
+            return matcher
+
+        return matcher_cache.get_or_build(digest, build)
+
+    def import_pickles(self, paths=LEGACY_PICKLES) -> List[str]:
+        """Copy legacy pickles into tables that have no version yet; returns the names imported."""
+        imported = []
+        for name, path in paths.items():
+            if self.head(name) is not None or self.history(name) or not Path(path).exists():
+                continue
+            import pandas as pd
+
+            self.save_frame(name, pd.read_pickle(path), note=f"{Path(path).name} から移行")
+            imported.append(name)
+        return imported
+
+
+# DataFrames per (store, table, version); versions are immutable, so entries never go stale
+frame_cache = LRUCache(maxsize=8)
+
+_default_store: Optional[RuleStore] = None
+_default_lock = threading.Lock()
+
+
+def default_store() -> RuleStore:
+    """The store under data/, created (and seeded from the legacy pickles) on first use."""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            store = RuleStore(DEFAULT_STORE_PATH)
+            store.import_pickles()
+            _default_store = store
+        return _default_store
+
+
+def open_store(path=DEFAULT_STORE_PATH) -> RuleStore:
+    if Path(path).resolve() == DEFAULT_STORE_PATH.resolve():
+        return default_store()
+    return RuleStore(path)
@@ -0,0 +1,198 @@
+"""
+Streaming check over a sequence of text chunks.
+
+A file read block by block, an HTTP body or PDF pages arrive as chunks that
+can split a 誤表記 (or a half-width "ｶﾞ") anywhere. StreamScanner keeps the
+matcher's automaton state, hits still waiting on an allowed context, and the
+unfinished line for the regex rules from one chunk to the next, and hands
+back each hit with offsets into the whole text as soon as it is decided. It
+holds only a few recent chunks plus the current line, so memory stays flat
+however long the input is.
+
+Chunks are normalized separately, each cut where normalization can't depend
+on what follows (see Normalizer.stable_prefix); a hit spanning two chunks is
+mapped back through both of them.
+"""
+import heapq
+from bisect import bisect_right
+from collections import deque
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+
+from .matcher import RuleMatcher, ScanState
+from .regexrules import MatchBudget
+
+
+class StreamHit(NamedTuple):
+    rule_id: int
+    start: int  # offsets into the whole streamed text
+    end: int
+    line: int  # 1-based line of `start`
+
+
+class _Piece(NamedTuple):
+    nstart: int  # offsets of the piece in the normalized stream
+    nend: int
+    ostart: int  # offset of the piece in the original stream
+    normalized: object  # NormalizedText, or None when the piece is unchanged
+
+
+class StreamScanner:
+    """Incremental check: feed() chunks in order, then close(); both return the hits decided so far.
+
+    Hits come out ordered by end offset, as from RuleMatcher.iter_matches on
+    the joined text. With regex rules, hits are released once their line is
+    complete (regex rules are matched line by line).
+    """
+
+    def __init__(self, matcher: RuleMatcher, budget: Optional[MatchBudget] = None):
+        self.matcher = matcher
+        self.budget = budget or MatchBudget()
+        self.chars = 0  # original characters scanned so far
+        self.lines = 0  # line breaks seen so far
+        self._normalizer = matcher.normalizer
+        self._scan = ScanState()
+        self._reach = matcher.longest_pattern
+        self._tail = ""  # not yet scanned: may still combine with the next chunk
+        self._pieces: deque = deque()
+        self._line_starts = [0]  # recent line starts; _lines_before come before them
+        self._lines_before = 0
+        self._regex = matcher.regex if matcher.regex else None
+        self._line_parts: List[str] = []
+        self._line_start = 0
+        self._held: deque = deque()  # literal hits waiting for the regex hits of their line
+        self._regex_hits: deque = deque()
+        self._closed = False
+
+    @property
+    def incomplete(self) -> bool:
+        """True if the regex rules ran out of their time budget."""
+        return self.budget.exceeded
+
+    def feed(self, chunk: str) -> List[StreamHit]:
+        if self._closed:
+            raise ValueError("StreamScanner is closed")
+        text = self._tail + chunk
+        cut = self._normalizer.stable_prefix(text) if self._normalizer is not None else len(text)
+        self._tail = text[cut:]
+        if cut:
+            self._scan_piece(text[:cut])
+        return self._release(final=False)
+
+    def close(self) -> List[StreamHit]:
+        """Scan what is left and return the remaining hits."""
+        if self._closed:
+            return []
+        self._closed = True
+        if self._tail:
+            self._scan_piece(self._tail)
+            self._tail = ""
+        self._held.extend(self._map(h) for h in self.matcher.finish_chunks(self._scan))
+        if self._regex is not None and self._line_parts:
+            self._scan_line("".join(self._line_parts))
+            self._line_parts = []
+        return self._release(final=True)
+
+    def _scan_piece(self, piece: str) -> None:
+        ostart = self.chars
+        self._track_lines(piece, ostart)
+        self.chars += len(piece)
+        normalized = self._normalizer.normalize(piece) if self._normalizer is not None else None
+        if normalized is not None and normalized.identity:
+            normalized = None
+        ntext = piece if normalized is None else normalized.text
+        nstart = self._scan.offset
+        self._pieces.append(_Piece(nstart, nstart + len(ntext), ostart, normalized))
+        self._held.extend(self._map(h) for h in self.matcher.scan_chunk(ntext, self._scan))
+        # Keep only the pieces a later hit can still start in
+        low = self._scan.offset - self._reach
+        while len(self._pieces) > 1 and self._pieces[0].nend <= low:
+            self._pieces.popleft()
+        self._trim_lines(min(self._pieces[0].ostart, self._line_start))
+
+    def _track_lines(self, piece: str, ostart: int) -> None:
+        pos = 0
+        while True:
+            i = piece.find("\n", pos)
+            if i == -1:
+                break
+            if self._regex is not None:
+                self._line_parts.append(piece[pos:i])
+                self._scan_line("".join(self._line_parts))
+                self._line_parts = []
+            self.lines += 1
+            self._line_starts.append(ostart + i + 1)
+            self._line_start = ostart + i + 1
+            pos = i + 1
+        if self._regex is not None and pos < len(piece):
+            self._line_parts.append(piece[pos:])
+
+    def _scan_line(self, line: str) -> None:
+        base, number = self._line_start, self.lines + 1
+        self._regex_hits.extend(
+            StreamHit(rule_id, base + start, base + end, number) for rule_id, start, end in self._regex.scan(line, self.budget)
+        )
+
+    def _trim_lines(self, low: int) -> None:
+        k = bisect_right(self._line_starts, low) - 1
+        if k > 0:
+            del self._line_starts[:k]
+            self._lines_before += k
+
+    def _line_of(self, offset: int) -> int:
+        return self._lines_before + bisect_right(self._line_starts, offset)
+
+    def _map(self, hit) -> StreamHit:
+        rule_id, start, end = hit
+        first = last = None
+        for piece in self._pieces:
+            if first is None and start < piece.nend:
+                first = piece
+            if end <= piece.nend and end > piece.nstart:
+                last = piece
+                break
+        ostart = self._orig_start(first, start)
+        oend = self._orig_end(last, end)
+        return StreamHit(rule_id, ostart, oend, self._line_of(ostart))
+
+    @staticmethod
+    def _orig_start(piece: _Piece, pos: int) -> int:
+        local = pos - piece.nstart
+        if piece.normalized is None:
+            return piece.ostart + local
+        return piece.ostart + piece.normalized.span(local, piece.nend - piece.nstart)[0]
+
+    @staticmethod
+    def _orig_end(piece: _Piece, pos: int) -> int:
+        local = pos - piece.nstart
+        if piece.normalized is None:
+            return piece.ostart + local
+        return piece.ostart + piece.normalized.span(0, local)[1]
+
+    def _release(self, final: bool) -> List[StreamHit]:
+        # Literal hits ending after the unfinished line wait, since a regex
+        # hit on that line may still end before them; regex hits wait for
+        # literal hits still held back by an allowed context
+        held, regex_hits = self._held, self._regex_hits
+        literal_frontier = regex_frontier = None
+        if not final:
+            if self._regex is not None:
+                literal_frontier = self._line_start
+            if self._scan.pending:
+                regex_frontier = self._map(self._scan.pending[0][:3]).end
+        literal = []
+        while held and (literal_frontier is None or held[0].end <= literal_frontier):
+            literal.append(held.popleft())
+        if not regex_hits:
+            return literal
+        regex = []
+        while regex_hits and (regex_frontier is None or regex_hits[0].end < regex_frontier):
+            regex.append(regex_hits.popleft())
+        return list(heapq.merge(literal, regex, key=lambda h: h.end))
+
+
+def iter_stream(chunks: Iterable[str], matcher: RuleMatcher, budget: Optional[MatchBudget] = None) -> Iterator[StreamHit]:
+    """Hits over the concatenation of `chunks`, yielded as soon as each is decided."""
+    scanner = StreamScanner(matcher, budget)
+    for chunk in chunks:
+        yield from scanner.feed(chunk)
+    yield from scanner.close()
@@ -1,17 +1,23 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from docx import Document
-import requests
-from io import BytesIO, StringIO
-# Optional PDF parsing
-try:
-    import PyPDF2 as pypdf
-except Exception:
-    try:
-        import pypdf
-    except Exception:
-        pypdf = None
+from io import StringIO
+from uuid import uuid4
+from wordingcheck.batch import check_many, report_csv, report_json
+from wordingcheck.cache import cache_stats, cached_parse, content_digest, get_matcher
+from wordingcheck.registry import rule_registry
+from wordingcheck.fetch import fetch
+from wordingcheck.document import TextDocument
+from wordingcheck.encoding import decode_bytes
+from wordingcheck.parsers import UnsupportedFormat, decode_text, docx_text, read_table
+from wordingcheck.excel import iter_cells, preview_rows, sheet_names
+from wordingcheck.findings import Findings
+from wordingcheck.fuzzy import fuzzy_index
+from wordingcheck.incremental import IncrementalChecker
+from wordingcheck.jobs import CANCELLED, FAILED, job_runner
+from wordingcheck.ruledelta import DocumentIndex, diff_rules, patch_findings
+from wordingcheck.pdf import check_pdf, extract_pdf_text
+from wordingcheck.regexrules import DEFAULT_BUDGET, RegexRuleError
 
 st.set_page_config(
         page_title="文章確認ツール",
@@ -47,7 +53,7 @@ st.subheader("2. 文章確認対象")
 st.markdown("""
                :green_heart: 想定される確認対象は、配信文章そのもの、又は添付ファイル。</br>
                :green_heart: 配信文章は、[3.テキスト貼りつけ] もしくは、WORDに入れて[1.ファイル(PC)]、両方OK。</br>
-               :green_heart: ファイル(PC)は、ローカルPC保存のText/Word/Excelファイルなどを想定。</br>
+               :green_heart: ファイル(PC)は、ローカルPC保存のText/Word/Excel/PDFファイルなどを想定。</br>
                :broken_heart: ファイル(Link)は、Teamsにあるファイルの文章確認を想定だが、未対応。難しいかも。</br>
             """, unsafe_allow_html=True)
 
@@ -75,6 +81,143 @@ mode = st.radio(
 # st.write("    * 受付できるファイル形式：CSV, Excel, Word, PDF, テキストファイル")
 # st.write("    ")
 
+def pdf_text_with_progress(data, matcher=None):
+    # Pages are extracted in parallel; the bar advances as each page arrives.
+    # With a matcher, pages are also checked as they come in: (text, prechecked)
+    bar = st.progress(0.0, text="PDFを読み込み中...")
+    progress = lambda done, total: bar.progress(done / total, text=f"PDFを読み込み中... {done}/{total}ページ")
+    if matcher is None:
+        text, prechecked = extract_pdf_text(data, progress=progress), None
+    else:
+        text, findings = check_pdf(data, matcher, progress=progress)
+        prechecked = (matcher.version, findings)
+    bar.empty()
+    return text, prechecked
+
+
+def make_unique(header):
+    # Preview column labels: blank or repeated header cells would break st.dataframe
+    seen = {}
+    out = []
+    for i, h in enumerate(header):
+        h = h or f"列{i + 1}"
+        seen[h] = seen.get(h, 0) + 1
+        out.append(h if seen[h] == 1 else f"{h}.{seen[h] - 1}")
+    return out
+
+
+def parse_upload(name, data, progress=None, matcher=None):
+    # One check target per file: a TextDocument, or the workbook bytes for Excel.
+    # Runs in a background job for uploads, so it must not call st.* itself
+    if name.endswith((".xlsx", ".xls")):
+        # Workbooks are not loaded into a DataFrame: the check streams every
+        # sheet's cells at analysis time; only a few rows are read for preview
+        rows = preview_rows(data, name)
+        preview = pd.DataFrame(rows[1:], columns=make_unique(rows[0])) if rows else pd.DataFrame()
+        return {"doc": None, "workbook": (name, data), "sheets": sheet_names(data, name), "preview": preview}
+    if name.endswith(".csv"):
+        # The table is flattened to text; only its first rows are kept for preview
+        df = read_table(data, name)
+        return {"doc": TextDocument.from_frame(df, name), "workbook": None, "preview": df.head()}
+    if name.endswith(".txt"):
+        # Shift_JIS from Notepad/Excel and UTF-16 are detected from the first bytes
+        text, encoding = decode_bytes(data)
+        return {"doc": TextDocument(text, name), "workbook": None, "preview": None, "encoding": encoding}
+    elif name.endswith(".docx"):
+        text = docx_text(data)
+    elif name.endswith(".pdf"):
+        if matcher is not None:
+            # Each page is checked as soon as it is extracted, so the check
+            # button finds the findings ready instead of scanning afterwards
+            text, findings = check_pdf(data, matcher, progress=progress)
+            doc = TextDocument(text, name)
+            return {"doc": doc, "workbook": None, "preview": None, "prechecked": (matcher.version, findings)}
+        text = extract_pdf_text(data, progress=progress)
+    else:
+        raise ValueError(f"未対応のファイル形式です: {name}")
+    return {"doc": TextDocument(text, name), "workbook": None, "preview": None}
+
+
+def rules_for_check():
+    """(matcher, error message) for this session.
+
+    Unsaved edits on the rules page get their own matcher; otherwise every
+    session uses the one published snapshot shared by the process.
+    """
+    if st.session_state.get("rule_edit_token"):
+        df_wr = st.session_state.get("df_word_rule")
+        if df_wr is not None:
+            if "誤表記" not in df_wr.columns or "正表記" not in df_wr.columns:
+                return None, "df_word_rule に '誤表記' または '正表記' 列が見つかりません"
+            try:
+                return get_matcher(df_wr), None
+            except RegexRuleError as e:
+                return None, f"正規表現ルールに問題があります: {e}"
+    try:
+        snap = rule_registry().current()
+    except Exception:
+        snap = None
+    if snap is None:
+        return None, "df_word_rule が見つかりません。'Wording Rules' ページでルールを読み込んでください。"
+    if snap.matcher is None:
+        return None, snap.error or "df_word_rule に '誤表記' または '正表記' 列が見つかりません"
+    return snap.matcher, None
+
+def set_current(doc=None, workbook=None, batch=None, prechecked=None):
+    # The session keeps exactly one check target: a TextDocument, a workbook,
+    # or several uploaded files as (name, bytes) pairs. `prechecked` is
+    # (rule version, findings) for a PDF checked while it was read
+    st.session_state["current_doc"] = doc
+    st.session_state["current_workbook"] = workbook
+    st.session_state["current_batch"] = batch
+    st.session_state["current_prechecked"] = prechecked
+
+
+def start_job(slot, key, fn, *args, label=""):
+    # Jobs run in a shared thread pool; the session only keeps its handle to poll.
+    # A key already in flight (a second click, another session) joins that run,
+    # and cancelling a handle only stops the run once no other session needs it
+    old = st.session_state.get(slot)
+    job = job_runner().submit(key, fn, *args, label=label)
+    if old is not None and old is not job and not old.finished:
+        old.cancel()
+    st.session_state[slot] = job
+    # Quick jobs finish within this run, without flashing a progress bar
+    job.wait(0.3)
+    return job
+
+
+@st.fragment(run_every=0.5)
+def show_job_progress(slot, text):
+    # Polls the job on its own; the whole page reruns once it has finished
+    job = st.session_state.get(slot)
+    if job is None:
+        return
+    if job.finished:
+        st.rerun()
+    if job.total:
+        label = f"{text}... {job.done}/{job.total}{job.unit}"
+    elif job.done:
+        label = f"{text}... {job.done:,}{job.unit}"
+    else:
+        label = f"{text}..."
+    st.progress(job.fraction or 0.0, text=label)
+    if st.button("中止", key=f"{slot}_cancel"):
+        # Withdraws this session at once; other sessions sharing the run keep it
+        job.cancel()
+        st.rerun()
+
+
+def parse_job(job, name, data, matcher):
+    # Parsed once per file content (SHA-256); reruns and other sessions reuse the result
+    return cached_parse(name, data, parse_upload, progress=job.progress("ページ"), matcher=matcher)
+
+
+def show_text_preview(doc, **kwargs):
+    # Built per render from the shared buffer; not stored in the session
+    st.dataframe(pd.DataFrame({"full_text": [doc.text]}),width=700,hide_index=True,row_height=100, **kwargs)
+
+
 if mode == "1.ファイル(PC)":
     st.write("**PCローカルに保存されているファイルを選択してください**")
     # col1, col2 = st.columns([3, 1])
@@ -85,165 +228,105 @@ if mode == "1.ファイル(PC)":
     # if st.button("Click! (選択したファイルを読み込む)"):
     st.session_state["show_uploader"] = True
     # if st.session_state.get("show_uploader", False):
-    uploaded_file = st.file_uploader(
-        "ファイルを選択してください",
-        type=["txt", "csv", "xlsx", "xls", "docx"],
+    uploaded_files = st.file_uploader(
+        "ファイルを選択してください（複数選択できます）",
+        type=["txt", "csv", "xlsx", "xls", "docx", "pdf"],
+        accept_multiple_files=True,
         label_visibility="collapsed"
     )
+    uploaded_file = uploaded_files[0] if len(uploaded_files) == 1 else None
+    if len(uploaded_files) > 1:
+        # Several files (a notice and its attachments): parsed and checked
+        # together in worker processes when the check runs
+        st.session_state["local_file_path"] = ", ".join(f.name for f in uploaded_files)
+        st.success(f"選択されたファイル: {len(uploaded_files)}件")
+        st.caption("、".join(f.name for f in uploaded_files))
+        set_current(batch=[(f.name, f.getvalue()) for f in uploaded_files])
     if uploaded_file is not None:
         st.session_state["local_file_path"] = uploaded_file.name
         st.success(f"選択されたファイル: {uploaded_file.name}")
+        data = uploaded_file.getvalue()
+        key = ("parse", content_digest(data), uploaded_file.name)
+        job = st.session_state.get("parse_job")
+        if job is None or job.key != key:
+            # PDFs are checked with the current rules while their pages are read
+            job = start_job("parse_job", key, parse_job, uploaded_file.name, data, rules_for_check()[0], label=uploaded_file.name)
         # 簡易プレビュー
-        try:
-            if uploaded_file.name.endswith(".csv"):
-                df = pd.read_csv(uploaded_file)
-                st.dataframe(df.head())
-                st.session_state["current_df"] = df
-                st.session_state.pop("current_full_text", None)
-            elif uploaded_file.name.endswith((".xlsx", ".xls")):
-                df = pd.read_excel(uploaded_file)
-                st.dataframe(df.head())
-                st.session_state["current_df"] = df
-                st.session_state.pop("current_full_text", None)
-            elif uploaded_file.name.endswith(".txt"):
-                text = uploaded_file.getvalue().decode("utf-8")
-                lines = text.splitlines()
-                df = pd.DataFrame({"text": lines})
-                df_full = pd.DataFrame({"full_text": [text]})
-                # st.dataframe(df.head())
-                st.dataframe(df_full,width=700,height="stretch",hide_index=True,row_height=100)
-                st.session_state["current_df"] = df
-                st.session_state["current_full_text"] = text
-            elif uploaded_file.name.endswith(".docx"):
-                doc = Document(uploaded_file)
-                text = "\n".join(p.text for p in doc.paragraphs)
-                lines = text.splitlines()
-                df = pd.DataFrame({"text": lines})
-                df_full = pd.DataFrame({"full_text": [text]})
-                # st.dataframe(df.head())
-                st.dataframe(df_full,width=700,hide_index=True,row_height=100)
-                st.session_state["current_df"] = df
-                st.session_state["current_full_text"] = text
-        except Exception as e:
-            st.error(f"ファイルのプレビューに失敗しました: {e}")
+        if not job.finished:
+            show_job_progress("parse_job", "ファイルを読み込み中")
+        elif job.status == CANCELLED:
+            st.info("ファイルの読み込みを中止しました。")
+            if st.button("もう一度読み込む"):
+                start_job("parse_job", key, parse_job, uploaded_file.name, data, rules_for_check()[0], label=uploaded_file.name)
+                st.rerun()
+        elif job.status == FAILED:
+            st.error(f"ファイルのプレビューに失敗しました: {job.error}")
+        else:
+            try:
+                parsed = job.result
+                if parsed["workbook"] is not None:
+                    st.caption(f"シート: {', '.join(parsed['sheets'])}（全シートを確認します）")
+                    st.dataframe(parsed["preview"])
+                elif parsed["preview"] is not None:
+                    st.dataframe(parsed["preview"])
+                elif uploaded_file.name.endswith(".txt"):
+                    st.caption(f"文字コード: {parsed['encoding']}")
+                    show_text_preview(parsed["doc"], height="stretch")
+                else:
+                    show_text_preview(parsed["doc"])
+                set_current(parsed["doc"], parsed["workbook"], prechecked=parsed.get("prechecked"))
+            except Exception as e:
+                st.error(f"ファイルのプレビューに失敗しました: {e}")
 
 elif mode == "2.ファイル(Link)":
     st.write("**オンラインファイルのリンクを貼り付けて、読込みボタンを押してください。**")
     url = st.text_input("ファイルのURLを貼り付け",label_visibility="collapsed")
     if st.button("読込み"):
         if url:
-            # Try to read the URL into a DataFrame (CSV or Excel), or as text fallback.
+            # Download once (revalidated against the local cache), then pick the
+            # parser from the file's magic bytes / Content-Type
             read_success = False
-            # Try CSV
             try:
-                df = pd.read_csv(url)
-                st.success("ファイルを読み込みました (CSV)")
-                st.dataframe(df.head())
-                # store current data for analysis
-                st.session_state["current_df"] = df
-                st.session_state.pop("current_full_text", None)
-                read_success = True
-            except Exception:
-                pass
-
-            # Try Excel
-            if not read_success:
-                try:
-                    df = pd.read_excel(url)
+                fetched = fetch(url)
+                fmt = fetched.format
+                content = fetched.content
+                if fmt in (".xlsx", ".xls"):
+                    parsed = cached_parse("download" + fmt, content, parse_upload)
                     st.success("ファイルを読み込みました (Excel)")
-                    st.dataframe(df.head())
-                    st.session_state["current_df"] = df
-                    st.session_state.pop("current_full_text", None)
+                    st.caption(f"シート: {', '.join(parsed['sheets'])}（全シートを確認します）")
+                    st.dataframe(parsed["preview"])
+                    set_current(workbook=parsed["workbook"])
                     read_success = True
-                except Exception:
-                    pass
-
-            # Fetch raw bytes and try format-specific parsers (Excel, Word, PDF, text)
-            if not read_success:
-                try:
-                    resp = requests.get(url, timeout=15)
-                    resp.raise_for_status()
-                    content = resp.content
-                    ctype = (resp.headers.get("content-type") or "").lower()
-                    lower = url.lower()
-
-                    # Excel by content-type/extension or by attempting to read
-                    try:
-                        df = pd.read_excel(BytesIO(content))
-                        st.success("ファイルを読み込みました (Excel)")
-                        st.dataframe(df.head())
+                elif fmt == ".csv":
+                    parsed = cached_parse("download" + fmt, content, parse_upload)
+                    st.success("ファイルを読み込みました (CSV)")
+                    st.dataframe(parsed["preview"])
+                    # store current data for analysis
+                    set_current(parsed["doc"])
+                    read_success = True
+                else:
+                    prechecked = None
+                    if fmt == ".docx":
+                        text = docx_text(content)
+                        label = "ファイルを読み込みました (Word .docx)"
+                    elif fmt == ".pdf":
+                        text, prechecked = pdf_text_with_progress(content, rules_for_check()[0])
+                        label = "ファイルを読み込みました (PDF)"
+                    else:
+                        text = decode_text(content, fetched.content_type)
+                        label = "テキストファイルを読み込みました"
+                    if text.strip():
+                        doc = TextDocument(text, url)
+                        st.success(label)
+                        show_text_preview(doc)
+                        set_current(doc, prechecked=prechecked)
                         read_success = True
-                    except Exception:
-                        pass
-
-                    # Word (.docx) - try to parse as docx
-                    if not read_success:
-                        try:
-                            doc = Document(BytesIO(content))
-                            text = "\n".join(p.text for p in doc.paragraphs)
-                            if text.strip():
-                                lines = text.splitlines()
-                                df = pd.DataFrame({"text": lines})
-                                df_full = pd.DataFrame({"full_text": [text]})
-                                st.success("ファイルを読み込みました (Word .docx)")
-                                # st.dataframe(df.head())
-                                st.dataframe(df_full,width=700,hide_index=True,row_height=100)
-                                # store for analysis
-                                st.session_state["current_df"] = df
-                                st.session_state["current_full_text"] = text
-                                read_success = True
-                        except Exception:
-                            pass
-
-                    # PDF - try parsing if pypdf is available
-                    if not read_success:
-                        try:
-                            if pypdf is None:
-                                st.warning("PDF読み取りには pypdf のインストールが必要です (pip install pypdf)")
-                            else:
-                                reader = pypdf.PdfReader(BytesIO(content))
-                                pages = []
-                                for page in reader.pages:
-                                    try:
-                                        page_text = page.extract_text()
-                                    except Exception:
-                                        page_text = None
-                                    if page_text:
-                                        pages.append(page_text)
-                                if pages:
-                                    text = "\n".join(pages)
-                                    lines = text.splitlines()
-                                    df = pd.DataFrame({"text": lines})
-                                    df_full = pd.DataFrame({"full_text": [text]})
-                                    st.success("ファイルを読み込みました (PDF)")
-                                    # st.dataframe(df.head())
-                                    st.dataframe(df_full,width=700,hide_index=True,row_height=100)
-                                    st.session_state["current_df"] = df
-                                    st.session_state["current_full_text"] = text
-                                    read_success = True
-                        except Exception:
-                            pass
-
-                    # Text fallback
-                    if not read_success:
-                        try:
-                            try:
-                                text = content.decode("utf-8")
-                            except Exception:
-                                text = content.decode("latin-1", errors="ignore")
-                            lines = text.splitlines()
-                            df = pd.DataFrame({"text": lines})
-                            df_full = pd.DataFrame({"full_text": [text]})
-                            st.success("テキストファイルを読み込みました")
-                            # st.dataframe(df.head())
-                            st.dataframe(df_full,width=700,hide_index=True,row_height=100)
-                            st.session_state["current_df"] = df
-                            st.session_state["current_full_text"] = text
-                            read_success = True
-                        except Exception:
-                            read_success = False
-                except Exception:
-                    read_success = False
+                if read_success and fetched.from_cache:
+                    st.caption("前回から変更がないため、保存済みのコピーを使用しました")
+            except UnsupportedFormat as e:
+                st.warning(str(e))
+            except Exception:
+                read_success = False
 
             if not read_success:
                 st.error("cannot read the file, please check you link or the file behind your link")
@@ -255,15 +338,10 @@ else:  # テキストを貼り付け
     pasted = st.text_area("テキストをここに貼り付け", height=150, label_visibility="collapsed")
     if st.button("読込み"):
         if pasted.strip():
-            # Put pasted text into both line-based DataFrame and full_text DataFrame
-            lines = pasted.splitlines()
-            df = pd.DataFrame({"text": lines})
-            df_full = pd.DataFrame({"full_text": [pasted]})
+            doc = TextDocument(pasted, "貼り付けテキスト")
             st.success("テキストを読み込めました。プレビュー：")
-            # st.dataframe(df.head())
-            st.dataframe(df_full,width=700,hide_index=True,row_height=100)
-            st.session_state["current_df"] = df
-            st.session_state["current_full_text"] = pasted
+            show_text_preview(doc)
+            set_current(doc)
         else:
             st.warning("テキストを入力してください。")
 
@@ -277,77 +355,300 @@ st.subheader("3. 文章確認実行")
 #     st.session_state.setdefault("analysis_output", "")
 # Text area will be shown below after analysis runs so updates appear in the same click
 
-from pathlib import Path
+def is_rule_edit_only(doc, matcher):
+    # Previous findings are for this very document but an older rule table
+    prev = st.session_state.get("findings")
+    return (
+        prev is not None
+        and not prev.per_cell
+        and st.session_state.get("findings_doc") is doc
+        and prev.rules != matcher.rules
+    )
+
+
+# Tell the user when another session published rules after this session's last check
+_published = rule_registry().version
+_checked = st.session_state.get("checked_rule_version")
+if st.session_state.get("findings") is not None and _checked is not None and _checked != _published:
+    st.info(f"ルールが更新されました（v{_published}）。もう一度確認すると新しいルールで確認します。")
+
+fuzzy_on = st.checkbox("正表記に似た表記も確認する（あいまい検索）", key="fuzzy_check", help="誤字・脱字で正表記と1〜2文字違う箇所を指摘します。テキスト・Word・PDF が対象です。")
+
+def run_check(job, matcher, current_doc, current_wb, prev, index, fuzzy_on, inc, prechecked=None):
+    """Background part of a check; returns what the page stores in the session.
+
+    Runs in a job thread: no st.* calls here, and progress goes through `job`.
+    The session's IncrementalChecker is only read: the job checks with a copy,
+    which the page swaps in once the check has finished, so a cancelled job
+    still winding down can't mix its paragraphs into the next run.
+    """
+    notes = []
+    inc = inc.copy()
+    # One pass over the text for all rules (Aho-Corasick automaton),
+    # compiled once per published version and shared across sessions
+    if current_wb is not None:
+        # Excel: every sheet's cells, reported as sheet!cell
+        wb_name, wb_data = current_wb
+        findings = Findings.from_cells(iter_cells(wb_data, wb_name), matcher, progress=job.progress("セル"))
+    elif prechecked is not None:
+        # A PDF whose pages were checked with these rules while it was read
+        findings = prechecked
+        notes.append("PDFはページの読み込みと同時に確認した結果を表示しています")
+    elif prev is not None:
+        # Same document, edited rules: keep hits of unchanged rules and
+        # look up only the added rules through the document's index
+        if index is None or index.doc is not current_doc or index.normalizer != matcher.normalizer:
+            index = DocumentIndex(current_doc, matcher.normalizer)
+        findings = patch_findings(prev, matcher.rules, index)
+        notes.append(f"ルール変更分のみ再評価しました（{diff_rules(prev.rules, matcher.rules).summary()}）")
+    else:
+        # Re-checks of an edited draft only rescan paragraphs that changed
+        findings = inc.check(current_doc, matcher, progress=job.progress("段落"))
+        if inc.reused:
+            notes.append(f"再確認: 変更のあった {inc.scanned} 段落のみ確認し、{inc.reused} 段落は前回の結果を再利用しました")
+
+    # Near-misses of the 正表記 vocabulary; the index is built once per rule version
+    fuzzy_rows = None
+    if fuzzy_on and current_wb is None:
+        job.report(0, None, "")
+        near = fuzzy_index(matcher).scan(current_doc.text, zip(findings.starts, findings.ends))
+        fuzzy_rows = [
+            {
+                "場所": f"{current_doc.line_of(h.start)}行目",
+                "本文": current_doc.text[h.start : h.end],
+                "近い正表記": h.term,
+                "違い(文字)": h.distance,
+                "前後の文": current_doc.snippet(h.start, h.end),
+            }
+            for h in near
+        ]
+    return {"findings": findings, "fuzzy_rows": fuzzy_rows, "notes": notes, "index": index, "checker": inc}
+
+
+def run_batch_check(job, matcher, batch):
+    # Background part of a multi-file check: files are parsed and checked in
+    # a process pool that receives the compiled matcher once per worker
+    return {"batch": check_many(batch, matcher, progress=job.progress("ファイル"))}
+
+
+def batch_summary(results):
+    lines = []
+    for r in results:
+        lines.append(f"■ {r.name}" + (f"（読み込めませんでした: {r.error}）" if r.error else f"（{len(r.findings)}件）"))
+        if not r.error:
+            lines.extend(r.findings.summary_lines())
+    return lines
+
+
+def apply_check(job):
+    # Store a finished check's results in the session (once) and report on it
+    target = st.session_state.pop("check_target", None)
+    st.session_state.pop("check_job", None)
+    if job.status == CANCELLED:
+        st.info("確認を中止しました。")
+        return
+    if job.status == FAILED:
+        st.error(f"確認中にエラーが発生しました: {job.error}")
+        return
+    current_doc, current_wb, rule_version = target
+    result = job.result
+    st.session_state["checked_rule_version"] = rule_version
+    for key in ("findings_page", "findings_export", "batch_export"):
+        st.session_state.pop(key, None)
+    if "batch" in result:
+        results = result["batch"]
+        st.session_state["batch_results"] = results
+        st.session_state["findings"] = None
+        st.session_state["fuzzy_rows"] = None
+        st.session_state["analysis_output"] = "\n".join(batch_summary(results))
+        n_hits = sum(len(r.findings) for r in results if not r.error)
+        n_errors = sum(1 for r in results if r.error)
+        st.success(f"Analysis done — {len(results)} files, {n_hits} issues found")
+        if n_errors:
+            st.warning(f"{n_errors}件のファイルを読み込めませんでした。下の一覧を確認してください。")
+        if any(r.findings.incomplete for r in results if not r.error):
+            st.warning(f"正規表現ルールの確認が制限時間（{DEFAULT_BUDGET:.0f}秒）を超えたファイルがあります。")
+        slowest = max(r.seconds for r in results)
+        st.caption(f"処理時間: {job.elapsed:.1f}秒（最も時間のかかったファイル {slowest:.1f}秒）")
+        return
+    st.session_state["batch_results"] = None
+    findings = result["findings"]
+    for note in result["notes"]:
+        st.caption(note)
+    if result["index"] is not None:
+        st.session_state["doc_index"] = result["index"]
+    st.session_state["incremental_checker"] = result["checker"]
+    # Only the compact arrays and the document they point into are kept;
+    # rows, snippets and exports are built from them when needed
+    st.session_state["findings"] = findings
+    st.session_state["findings_doc"] = current_doc if current_wb is None else None
+    st.session_state["analysis_output"] = "\n".join(findings.summary_lines())
+    st.session_state["fuzzy_rows"] = result["fuzzy_rows"]
+
+    if len(findings):
+        st.success(f"Analysis done — {len(findings)} issues found")
+    else:
+        st.success("Analysis done — no issues found")
+    if findings.incomplete:
+        st.warning(
+            f"正規表現ルールの確認が制限時間（{DEFAULT_BUDGET:.0f}秒）を超えたため、途中から先は正規表現ルールを確認していません。"
+            "下の「ルール別の処理時間」で時間のかかっているルールを確認してください。"
+        )
+    st.caption(f"処理時間: {job.elapsed:.1f}秒")
+    mc = cache_stats()["matcher"]
+    st.caption(f"ルールキャッシュ: hit {mc['hits']} / miss {mc['misses']} (保持 {mc['size']}/{mc['maxsize']})")
 
-def load_df_word_rule():
-    # Try session-state first
-    df_wr = st.session_state.get("df_word_rule")
-    if df_wr is not None:
-        return df_wr
-    # Try persisted file under Streamlit/data
-    p = Path(__file__).resolve().parent / "data" / "df_word_rule.pkl"
-    try:
-        if p.exists():
-            return pd.read_pickle(p)
-    except Exception:
-        return None
-    return None
 
 if st.button("16355!!"):
     # Clear previous analysis output so the box shows only current results
     st.session_state["analysis_output"] = ""
-    # st.session_state.setdefault("analysis_output", "")
     # Run analysis
-    df_wr = load_df_word_rule()
-    
-    if df_wr is None:
-        st.error("df_word_rule が見つかりません。'Wording Rules' ページでルールを読み込んでください。")
+    matcher, rule_error = rules_for_check()
+    if rule_error:
+        st.error(rule_error)
     else:
-        # Ensure '誤表記' and '正表記' exist
-        if "誤表記" not in df_wr.columns or "正表記" not in df_wr.columns:
-            st.error("df_word_rule に '誤表記' または '正表記' 列が見つかりません")
+        # Check target: a TextDocument, or workbook bytes for Excel
+        current_doc = st.session_state.get("current_doc")
+        current_wb = st.session_state.get("current_workbook")
+        current_batch = st.session_state.get("current_batch")
+        if current_batch:
+            key = ("batch", tuple(content_digest(data) for _, data in current_batch), matcher.version or id(matcher))
+            st.session_state["check_target"] = (None, None, rule_registry().version)
+            start_job("check_job", key, run_batch_check, matcher, current_batch, label=f"{len(current_batch)}ファイルの確認")
+        elif current_doc is None and current_wb is None:
+            st.warning("解析対象のデータがありません。ファイルを開くかテキストを貼り付けてください。")
         else:
-            # Prepare target content string(s)
-            current_full = st.session_state.get("current_full_text")
-            current_df = st.session_state.get("current_df")
-            # Create a searchable text: prefer full_text, else join all df cells
-            if current_full:
-                haystack = current_full
-            elif current_df is not None:
-                try:
-                    haystack = "\n".join(current_df.astype(str).apply(lambda row: " ".join(row.values), axis=1).tolist())
-                except Exception:
-                    haystack = current_df.astype(str).to_string()
+            # The same target, rules and options already being checked (a second
+            # click) join that run instead of starting another. The job carries
+            # this session's previous findings and paragraph cache, so other
+            # sessions never join it
+            if current_wb is not None:
+                target_key = content_digest(current_wb[1])
             else:
-                st.warning("解析対象のデータがありません。ファイルを開くかテキストを貼り付けてください。")
-                haystack = None
-
-            if haystack is not None:
-                out_lines = []
-                for _, row in df_wr.iterrows():
-                    typo = str(row.get("誤表記", ""))
-                    corr = str(row.get("正表記", ""))
-                    if not typo:
-                        continue
-                    try:
-                        if typo in haystack:
-                            out_lines.append(f"{typo} → {corr}")
-                    except Exception:
-                        # fallback to simple substring test on stringified haystack
-                        if str(typo) in str(haystack):
-                            out_lines.append(f"{typo} → {corr}")
-
-                if out_lines:
-                    prev = st.session_state.get("analysis_output", "")
-                    new = prev + ("\n" if prev else "") + "\n".join(out_lines)
-                    st.session_state["analysis_output"] = new
-                    st.success("Analysis done — issues found and appended")
-                else:
-                    st.session_state["analysis_output"] = st.session_state.get("analysis_output", "")
-                    st.success("Analysis done — no issues found")
+                target_key = content_digest(current_doc.text.encode("utf-8"))
+            session_key = st.session_state.setdefault("session_key", uuid4().hex)
+            key = ("check", session_key, target_key, matcher.version or id(matcher), fuzzy_on)
+            prev = st.session_state["findings"] if current_wb is None and is_rule_edit_only(current_doc, matcher) else None
+            inc = st.session_state.setdefault("incremental_checker", IncrementalChecker())
+            prechecked = st.session_state.get("current_prechecked")
+            if current_wb is not None or prechecked is None or not matcher.version or prechecked[0] != matcher.version:
+                prechecked = (None, None)
+            st.session_state["check_target"] = (current_doc, current_wb, rule_registry().version)
+            start_job(
+                "check_job", key, run_check,
+                matcher, current_doc, current_wb, prev, st.session_state.get("doc_index"), fuzzy_on, inc, prechecked[1],
+                label="文章確認",
+            )
+
+check_job = st.session_state.get("check_job")
+if check_job is not None:
+    if check_job.finished:
+        apply_check(check_job)
+    else:
+        show_job_progress("check_job", "確認中")
 
 # Display analysis output after processing so the text area reflects changes immediately
 analysis_val = st.session_state.get("analysis_output", "")
-st.text_area("Analysis output", value=analysis_val, height=500, disabled=True)
+st.text_area("Analysis output", value=analysis_val, height=200, disabled=True)
+
+FINDINGS_PAGE_SIZE = 50
+SORT_LABELS = {"文中の位置": "position", "ルール表の順": "rule", "件数の多い順": "count"}
+
+
+def show_findings(findings, doc):
+    # Paginated table: snippets are built only for the rows on the current page
+    n = len(findings)
+    if not n:
+        return
+    col_sort, col_page = st.columns([2, 1])
+    with col_sort:
+        sort_label = st.radio("並び順", list(SORT_LABELS), horizontal=True)
+    n_pages = -(-n // FINDINGS_PAGE_SIZE)
+    with col_page:
+        page = st.number_input(f"ページ (全{n_pages})", min_value=1, max_value=n_pages, value=1, key="findings_page")
+    key = SORT_LABELS[sort_label]
+    order = findings.order(key, descending=(key == "count"))
+    st.dataframe(pd.DataFrame(findings.page(order, page, FINDINGS_PAGE_SIZE, doc)), hide_index=True, width="stretch")
+    st.caption(f"{n}件中 {(page - 1) * FINDINGS_PAGE_SIZE + 1}〜{min(page * FINDINGS_PAGE_SIZE, n)}件目")
 
+    # Export is generated only on request, then kept until the next check
+    col_fmt, col_make, col_dl = st.columns([1, 1, 1])
+    with col_fmt:
+        fmt = st.selectbox("形式", ["CSV", "JSON"], label_visibility="collapsed")
+    with col_make:
+        if st.button("ダウンロード用に作成"):
+            data = findings.to_csv(doc) if fmt == "CSV" else findings.to_json(doc)
+            st.session_state["findings_export"] = (fmt, data)
+    export = st.session_state.get("findings_export")
+    if export is not None:
+        with col_dl:
+            ext, mime = ("csv", "text/csv") if export[0] == "CSV" else ("json", "application/json")
+            st.download_button(f"ダウンロード({export[0]})", data=export[1], file_name=f"findings.{ext}", mime=mime, icon="📥")
 
+
+def show_batch(results):
+    # Findings grouped by file; each file shows its first page of rows
+    for r in results:
+        if r.error:
+            st.error(f"{r.name}: 読み込めませんでした（{r.error}）")
+            continue
+        n = len(r.findings)
+        with st.expander(f"{r.name}（{n}件）", expanded=n > 0 and len(results) <= 5):
+            if not n:
+                st.caption("指摘はありません。")
+                continue
+            order = r.findings.order()
+            st.dataframe(pd.DataFrame(r.findings.page(order, 1, FINDINGS_PAGE_SIZE, r.doc)), hide_index=True, width="stretch")
+            if n > FINDINGS_PAGE_SIZE:
+                st.caption(f"{n}件中 先頭{FINDINGS_PAGE_SIZE}件を表示（全件はダウンロードで確認できます）")
+
+    # One report for the whole batch, generated only on request
+    col_fmt, col_make, col_dl = st.columns([1, 1, 1])
+    with col_fmt:
+        fmt = st.selectbox("形式", ["CSV", "JSON"], label_visibility="collapsed", key="batch_format")
+    with col_make:
+        if st.button("ダウンロード用に作成", key="batch_make"):
+            data = report_csv(results) if fmt == "CSV" else report_json(results)
+            st.session_state["batch_export"] = (fmt, data)
+    export = st.session_state.get("batch_export")
+    if export is not None:
+        with col_dl:
+            ext, mime = ("csv", "text/csv") if export[0] == "CSV" else ("json", "application/json")
+            st.download_button(f"ダウンロード({export[0]})", data=export[1], file_name=f"findings_all.{ext}", mime=mime, icon="📥")
+
+
+if st.session_state.get("batch_results"):
+    show_batch(st.session_state["batch_results"])
+
+if st.session_state.get("findings") is not None:
+    show_findings(st.session_state["findings"], st.session_state.get("findings_doc"))
+
+    fuzzy_rows = st.session_state.get("fuzzy_rows")
+    if fuzzy_rows is not None:
+        st.markdown(f"**正表記に似た表記（誤字の可能性）: {len(fuzzy_rows)}件**")
+        if fuzzy_rows:
+            st.dataframe(pd.DataFrame(fuzzy_rows), hide_index=True, width="stretch")
+
+    with st.expander("ルール別の処理時間", expanded=False):
+        doc = st.session_state.get("findings_doc")
+        if doc is None:
+            st.caption("テキスト・Word・PDF の確認結果で計測できます。")
+        elif st.button("計測する"):
+            matcher, rule_error = rules_for_check()
+            if rule_error:
+                st.error(rule_error)
+            else:
+                # Each regex rule is timed on its own; the check itself runs them combined
+                rows = []
+                for t in sorted(matcher.profile(doc.text), key=lambda t: -t.seconds):
+                    rule = matcher.rules[t.rule_id] if t.rule_id >= 0 else None
+                    rows.append(
+                        {
+                            "誤表記": rule.typo if rule else f"（通常ルール {sum(not r.regex for r in matcher.rules)}件 まとめて）",
+                            "種別": "正規表現" if rule else "通常",
+                            "一致数": t.hits,
+                            "時間(ms)": round(t.seconds * 1000, 2),
+                            "打ち切り": "はい" if t.timed_out else "",
+                        }
+                    )
+                st.dataframe(pd.DataFrame(rows), hide_index=True, width="stretch")